@@ -0,0 +1,433 @@
+import asyncio
+import os
+import time
+
+import aiohttp
+from binance import AsyncClient
+from binance.exceptions import BinanceAPIException
+
+import main
+from endpoints import FAPI_URL
+from event_bus import bus, INDICATORS_UPDATED
+from execution import OrderPending, TERMINAL, filled
+from metrics import metrics
+from price_cache import prices, PNL_SOURCES, SIZING_SOURCES
+
+
+class AsyncTrader:
+    """ check_and_execute 의 asyncio 버전
+
+    - REST 는 keep-alive 연결 풀(aiohttp)을 쓰는 AsyncClient 하나로 보내고,
+      서로 무관한 요청(잔고, 시세, 레버리지가 다를 때의 변경)은 동시에 보낸다.
+      계좌/가격 캐시가 살아 있으면 주문 한 번만 왕복한다.
+    - 진입하면 거래소에 익절/손절 보호 주문을 함께 걸고, 보호 주문이 걸린 포지션은 반대 신호만 확인한다.
+    - 고정 sleep 대신 지표 갱신 이벤트와, 보호 주문 없는 포지션이 있으면 가격 변동에 바로 깨어난다.
+      (계좌 스트림이 동기화되지 않았으면 포지션 조회가 REST 라서 예전처럼 2초 주기로 확인)
+    - 요청 가중치는 main 의 RestScheduler 와 같이 세므로 한도에 가까워지면 조회보다 주문을 먼저 보낸다.
+    - 요청마다 timeout 을 두고 시간이 지나면 그 요청만 취소한다.
+      주문은 거래소에 이미 들어갔을 수 있으므로 취소하지 않고 응답을 끝까지 받아 로그로 남긴다.
+    - 진입/청산 주문 상태는 main.executor 와 같이 쓰므로 같은 신호로 두 번 주문하지 않고,
+      결과를 모르는 주문은 다시 보내지 않고 clientOrderId 로 조회한다.
+    """
+    POSITION_INTERVAL = 2  # 포지션이 있을 때 최대 대기 (초)
+    IDLE_INTERVAL = 15     # 포지션이 없을 때 최대 대기 (초)
+    SETTLE_TIMEOUT = 2     # 주문 후 계좌 캐시에 반영될 때까지 같은 심볼을 건드리지 않는 최대 시간 (초)
+
+    def __init__(self, symbols=('BTCUSDT',), timeout=3.0, order_timeout=5.0, pool_size=10,
+                 leverage=main.LEVERAGE, shared=False, poll=0.05):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.allocation = 1 / len(self.symbols)
+        self.timeout = timeout
+        self.order_timeout = order_timeout
+        self.pool_size = pool_size
+        self.leverage = leverage
+        self.shared = shared  # True 면 이벤트 버스 대신 공유 메모리 스냅샷 version 을 poll 간격으로 확인
+        self.poll = poll
+
+        self.client = None
+        self.events = None
+        self.wake = None
+        self.wake_pending = False
+        self.loop = None
+        self.tasks = []
+        self.final_signals = {}
+        self.watching = set()  # 보호 주문 없는 포지션이 있어 가격 변동에 깨어날 심볼
+        self.settling = {}     # 심볼 -> (주문 전 positionAmt, 기한)
+
+    # ---------- 연결 ----------
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+        self.client = AsyncClient(main.BINANCE_API_KEY, main.BINANCE_API_SECRET, session_params={"connector": connector})
+        self.client.FUTURES_URL = FAPI_URL + "/fapi"
+
+        self.wake = asyncio.Event()
+        self.events = bus.subscribe_async(INDICATORS_UPDATED, ready=self.wake)
+        prices.add_listener(self.on_price)
+        if self.shared:
+            self.tasks.append(asyncio.create_task(self.watch_shared()))
+
+        # 주문 필터/현재 레버리지를 미리 읽어 두고, 다른 레버리지만 맞추면서 연결 풀도 데워 둠
+        # (첫 주문이 TCP/TLS 연결 비용을 내지 않도록)
+        if main.exchange.stale():
+            try:
+                await asyncio.to_thread(main.exchange.refresh)
+            except Exception as e:
+                print(f"⚠️ 거래소 정보 조회 실패: {e!r}")
+        results = await asyncio.gather(*(self.set_leverage(symbol) for symbol in self.symbols), return_exceptions=True)
+        for symbol, result in zip(self.symbols, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ {symbol} 레버리지 설정 실패 (진입할 때 다시 시도): {result!r}")
+
+    async def close(self):
+        prices.remove_listener(self.on_price)
+        for task in self.tasks:
+            task.cancel()
+        if self.events is not None:
+            self.events.close()
+        if self.client is not None:
+            await self.client.close_connection()
+
+    # ---------- REST ----------
+    async def _request(self, method, params, sent=None):
+        async with main.rest.reserve_async(method, params, self.client):
+            if sent is not None:
+                sent.set()
+            with metrics.span("rest_seconds", endpoint=method):
+                return await getattr(self.client, method)(**params)
+
+    async def call(self, method, timeout=None, **params):
+        """ REST 요청 한 건. timeout 초 안에 응답이 없으면 이 요청만 취소하고 asyncio.TimeoutError """
+        return await asyncio.wait_for(self._request(method, params), timeout or self.timeout)
+
+    async def send_order(self, **params):
+        """ 주문. order_timeout 이 지나면 기다리기만 멈추고 요청은 끝까지 보내 응답을 로그로 남김 """
+        sent = asyncio.Event()
+        request = asyncio.ensure_future(self._request("futures_create_order", params, sent))
+        try:
+            return await asyncio.wait_for(asyncio.shield(request), self.order_timeout)
+        except asyncio.TimeoutError:
+            if sent.is_set():
+                request.add_done_callback(lambda task: self._late_order(task, params))
+            else:
+                request.cancel()  # 아직 한도를 기다리는 중이면 거래소로 나가지 않았으므로 취소
+            raise
+
+    @staticmethod
+    def _late_order(task, params):
+        if task.cancelled():
+            return
+        client_order_id = params.get('newClientOrderId')
+        if task.exception() is not None:
+            print(f"⚠️ 시간 초과된 주문 실패 {params}: {task.exception()!r}")
+        else:
+            print(f"⚠️ 시간 초과 뒤 주문 응답 도착 {params}: {task.result()}")
+            if client_order_id:
+                main.executor.on_response(client_order_id, task.result())
+
+    async def resolve(self, symbol):
+        """ 결과를 모르는 주문들을 allOrders 한 번으로 확인 (OrderExecutor.resolve 의 asyncio 버전) """
+        start = main.executor.since(symbol)
+        if start is None:
+            return
+        try:
+            main.executor.on_orders(symbol, await self.call("futures_get_all_orders", symbol=symbol, startTime=start))
+        except Exception as e:
+            print(f"⚠️ {symbol} 주문 확인 실패: {e!r}")
+
+    async def execute(self, kind, symbol, side, quantity, candle_ms=None, **params):
+        """ 시장가 주문을 한 번만 보내고 체결 확인까지 (OrderExecutor.submit 의 asyncio 버전, candle_ms: 신호를 만든 캔들) """
+        executor = main.executor
+        key = main.signal_key(symbol, candle_ms)
+        try:
+            record, order_params = executor.prepare(kind, symbol, side, quantity, key, **params)
+        except OrderPending:
+            record, order_params = None, None
+        if record is None or (order_params is None and record['status'] not in TERMINAL):
+            await self.resolve(symbol)
+            try:
+                record, order_params = executor.prepare(kind, symbol, side, quantity, key, **params)
+            except OrderPending as e:
+                return e.record
+        if order_params is None:
+            return record
+
+        client_order_id = record['clientOrderId']
+        try:
+            executor.on_response(client_order_id, await self.send_order(**order_params))
+        except Exception as e:
+            if not executor.on_error(client_order_id, e):
+                raise
+            print(f"⚠️ {symbol} 주문 전송 결과를 모릅니다. 다시 보내지 않고 조회합니다: {e!r}")
+            try:
+                executor.on_lookup(client_order_id, await self.call("futures_get_order", symbol=symbol,
+                                                                    origClientOrderId=client_order_id))
+            except BinanceAPIException as error:
+                executor.on_lookup(client_order_id, error=error)
+            except Exception as error:
+                print(f"⚠️ 주문 조회 실패 {client_order_id}: {error!r}")
+
+        record = executor.get(client_order_id)
+        if record['status'] not in TERMINAL:
+            record = await asyncio.to_thread(executor.wait, client_order_id, executor.confirm_timeout)
+        if record['status'] not in TERMINAL:
+            await self.resolve(symbol)
+            record = executor.get(client_order_id)
+        return record
+
+    async def set_leverage(self, symbol):
+        """ 캐시된 현재 레버리지가 다를 때만 변경 요청 """
+        if main.exchange.leverage(symbol) == self.leverage:
+            return
+        response = await self.call("futures_change_leverage", symbol=symbol, leverage=self.leverage)
+        main.exchange.record_leverage(symbol, response.get('leverage', self.leverage))
+
+    def account_synced(self):
+        return main.account is not None and main.account.synced
+
+    async def get_balance(self, asset='USDT'):
+        if self.account_synced():
+            balance = main.account.get_balance(asset)
+            if balance is not None:
+                return balance
+        balances = await self.call("futures_account_balance")
+        return float([x for x in balances if x['asset'] == asset][0]['balance'])
+
+    async def get_price(self, symbol, max_age=2.0, sources=SIZING_SOURCES):
+        price = prices.latest(symbol, max_age, sources)
+        if price is None:
+            price = float((await self.call("futures_symbol_ticker", symbol=symbol))['price'])
+            prices.update(symbol, price, 'rest')
+        return price
+
+    async def get_position(self, symbol):
+        if self.account_synced():
+            return main.account.get_position(symbol)
+        positions = await self.call("futures_position_information", symbol=symbol)
+        return next((pos for pos in positions if pos['symbol'] == symbol), None)
+
+    # ---------- 보호 주문 ----------
+    async def protect(self, symbol, side, quantity, entry_price):
+        """ 익절/손절 보호 주문 두 건을 동시에 걸음. 둘 다 걸렸으면 True (하나만 걸리면 취소하고 False) """
+        await self.cancel_protection(symbol)
+        filters = await asyncio.to_thread(main.exchange.filters, symbol)  # 캐시가 오래됐으면 REST 로 다시 읽음
+        params = main.protective.order_params(symbol, side, quantity, entry_price, self.leverage, main.TAKE_PROFIT_RATE,
+                                              main.STOP_LOSS_RATE, filters['tick_size'] if filters else 0)
+        results = await asyncio.gather(*(self.send_order(**order) for order in params.values()), return_exceptions=True)
+        placed = {}
+        for kind, result in zip(params, results):
+            if isinstance(result, BaseException):
+                print(f"⚠️ {symbol} {kind} 보호 주문 실패 (손익률을 직접 확인): {result!r}")
+            else:
+                placed[kind] = result
+        leftover = main.protective.track(symbol, placed)
+        await self.cancel_protection(symbol, leftover)
+        return not leftover and bool(placed)
+
+    async def cancel_protection(self, symbol, orders=None):
+        """ 보호 주문 취소 (orders 를 주지 않으면 추적 중인 주문). 이미 체결/취소된 주문의 거절은 무시 """
+        if orders is None:
+            orders = main.protective.release(symbol)
+        results = await asyncio.gather(*(self.call("futures_cancel_order", symbol=symbol, algoId=order['algoId'])
+                                         for order in orders.values()), return_exceptions=True)
+        for kind, result in zip(orders, results):
+            if isinstance(result, BaseException):
+                print(f"⚠️ {symbol} {kind} 보호 주문 취소 실패: {result!r}")
+
+    async def ensure_protection(self, symbol, position):
+        """ 보호 주문 없이 들고 있는 포지션이면 거래소에 남은 보호 주문을 찾고, 없으면 새로 걸음 (심볼당 한 번) """
+        if not main.protective.needs_check(symbol):
+            return main.protective.protected(symbol)
+        try:
+            open_orders = await self.call("futures_get_open_orders", symbol=symbol, conditional=True)
+            if await asyncio.to_thread(main.protective.adopt, symbol, open_orders):
+                return True
+            position_size = float(position['positionAmt'])
+            return await self.protect(symbol, 1 if position_size > 0 else -1, abs(position_size),
+                                      float(position['entryPrice']))
+        except Exception as e:
+            main.protective.mark_checked(symbol)
+            print(f"⚠️ {symbol} 보호 주문 확인 실패: {e!r}")
+            return False
+
+    # ---------- 깨움 ----------
+    def on_price(self, symbol, price):
+        """ 가격 캐시 콜백 (웹소켓 스레드). 지켜보는 심볼이면 루프를 한 번만 깨움 """
+        if symbol in self.watching and not self.wake_pending:
+            self.wake_pending = True
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self.wake_pending = False
+        self.wake.set()
+
+    async def watch_shared(self):
+        """ 다른 프로세스가 쓰는 공유 메모리 스냅샷이 새로 나오면 지표 갱신 이벤트로 넘김 """
+        versions = {symbol: 0 for symbol in self.symbols}
+        while True:
+            for symbol in self.symbols:
+                try:
+                    snapshot = main.load_shared(symbol, versions[symbol])
+                except FileNotFoundError:
+                    continue
+                if snapshot is None:
+                    continue
+                versions[symbol] = snapshot['version']
+                candle_ms = int(snapshot['candles']['timestamp'][-1]) if len(snapshot['candles']['timestamp']) else None
+                self.events.put({"symbol": symbol, "indicators": snapshot['indicators'],
+                                 "prices": snapshot['prices'], "candle_ms": candle_ms})
+            await asyncio.sleep(self.poll)
+
+    # ---------- 매매 ----------
+    async def open_position(self, final_signal, symbol, candle_ms=None):
+        if final_signal not in ("LONG", "SHORT"):
+            print(f"🟡 {symbol} HOLD 상태 유지")
+            return None
+
+        # 잔고/시세/레버리지는 서로 무관하므로 동시에 (하나가 실패하면 나머지 요청도 취소)
+        async with asyncio.TaskGroup() as group:
+            balance = group.create_task(self.get_balance('USDT'))
+            current_price = group.create_task(self.get_price(symbol))
+            if main.exchange.leverage(symbol) != self.leverage:
+                group.create_task(self.set_leverage(symbol))
+        balance, current_price = balance.result(), current_price.result()
+
+        filters = await asyncio.to_thread(main.exchange.filters, symbol)
+        quantity = main.order_quantity(balance, current_price, self.allocation, self.leverage, filters=filters)
+        side = 'BUY' if final_signal == "LONG" else 'SELL'
+        quantity = main.depth_limited_quantity(symbol, side, quantity, filters)
+        if main.below_min_notional(quantity, current_price, filters):
+            print(f"🟡 {symbol} 호가가 얇아 최소 주문 금액 안에서 슬리피지 예산을 맞출 수 없어 진입하지 않습니다.")
+            return None
+        order = await self.execute("en", symbol, side, quantity, candle_ms)
+        main.record_tick_to_order(symbol, candle_ms)
+        if order.get('duplicate'):
+            print(f"🟡 {symbol} 같은 신호의 진입 주문이 이미 나갔습니다 ({order['status']}).")
+            return None
+        if not filled(order):
+            print(f"⚠️ {symbol} 진입 주문 체결을 확인하지 못했습니다 ({order['status']}).")
+            main.protective.forget(symbol)  # 나중에 체결된 것으로 확인되면 close_position 이 보호 주문을 검
+            return None
+        print(f"✅ {final_signal} 진입: {order['executedQty']} {symbol} at {order['avgPrice'] or current_price} USDT")
+        await self.protect(symbol, 1 if side == 'BUY' else -1, order['executedQty'], order['avgPrice'] or current_price)
+        return order
+
+    async def close_position(self, symbol, position):
+        position_size = float(position['positionAmt'])
+        candle_ms, final_signal = self.final_signals.get(symbol, (None, None))
+        if final_signal is None:
+            try:
+                # 공유 메모리 스냅샷을 읽는 동기 호출이라 루프 밖에서
+                final_signal = await asyncio.to_thread(main.get_final_signal, symbol=symbol)
+                candle_ms = main.signal_candle(symbol)
+            except (FileNotFoundError, RuntimeError):
+                pass  # 지표가 아직 없으면 익절/손절만 판단
+
+        if await self.ensure_protection(symbol, position):
+            # 익절/손절은 거래소 보호 주문이 맡으므로 반대 신호만 확인 (시세 조회 없음)
+            if not main.is_reversal(position_size, final_signal):
+                return None
+            print(main.EXIT_MESSAGES["reverse"])
+        else:
+            current_price = await self.get_price(symbol, sources=PNL_SOURCES)
+            rate = main.profit_rate(position_size, float(position['entryPrice']), current_price, self.leverage)
+            if rate is None:
+                print(f"⚠️ {symbol} 진입 가격이 0입니다. 손익 비율 계산을 할 수 없습니다.")
+                return None
+            reason = main.exit_reason(position_size, rate, final_signal)
+            if reason is None:
+                return None
+            print(f"{main.EXIT_MESSAGES[reason]} (손익 비율 {rate:.2f}%)")
+
+        # 보호 주문을 먼저 취소하고, 그사이 보호 주문이 발동해도 반대 포지션이 생기지 않도록 reduce-only 로 청산
+        await self.cancel_protection(symbol)
+        order = await self.execute("ex", symbol, 'SELL' if position_size > 0 else 'BUY', abs(position_size), candle_ms,
+                                   reduceOnly='true')
+        if order.get('duplicate') or not filled(order):
+            print(f"🟡 {symbol} 청산 주문이 이미 나갔거나 체결을 확인하지 못했습니다 ({order['status']}).")
+            return None
+        print(f"✅ 포지션 클로즈: {order['executedQty']} {symbol}")
+        return order
+
+    def settled(self, symbol, position_amt):
+        """ 직전 주문이 계좌 캐시에 반영됐는지 (반영 전 같은 포지션에 주문을 또 보내지 않도록) """
+        before, deadline = self.settling.get(symbol, (None, 0))
+        if before is None or position_amt != before or time.monotonic() >= deadline:
+            self.settling.pop(symbol, None)
+            return True
+        return False
+
+    async def step(self):
+        positions = await asyncio.gather(*(self.get_position(symbol) for symbol in self.symbols))
+        amounts = {symbol: float(position['positionAmt']) if position else 0.0
+                   for symbol, position in zip(self.symbols, positions)}
+        held = {symbol for symbol, amount in amounts.items() if amount != 0}
+
+        # 보호 주문 없는 보유 심볼은 계좌 캐시가 있으면 가격이 바뀔 때마다, 없으면 REST 조회라 POSITION_INTERVAL 마다 확인
+        # (보호 주문이 걸린 심볼은 새 지표가 나올 때만)
+        unprotected = {symbol for symbol in held if not main.protective.protected(symbol)}
+        self.watching = unprotected if self.account_synced() else set()
+        self.wake.clear()
+        if not self.events.pending:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.POSITION_INTERVAL if unprotected else self.IDLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        latest = {}
+        for event in self.events.drain():
+            latest[event.get('symbol', 'BTCUSDT')] = event
+        updated = {symbol for symbol in latest if symbol in amounts}
+        for symbol in updated:
+            # 주문 의도 키로 쓸 신호 캔들을 신호와 같이 들고 다님
+            self.final_signals[symbol] = (latest[symbol].get('candle_ms'), main.get_final_signal(
+                latest[symbol]['indicators'], latest[symbol]['prices'], symbol))
+
+        actions = {}
+        for symbol, position in zip(self.symbols, positions):
+            if not self.settled(symbol, amounts[symbol]):
+                continue
+            if main.executor.unresolved(symbol):
+                actions[symbol] = self.resolve(symbol)  # 결과를 모르는 주문이 있으면 확인부터
+            elif symbol not in held:
+                if symbol in updated:
+                    candle_ms, final_signal = self.final_signals.get(symbol, (None, None))
+                    actions[symbol] = self.open_position(final_signal, symbol, candle_ms)
+            else:
+                actions[symbol] = self.close_position(symbol, position)
+
+        # 심볼별 주문은 서로 기다리지 않고 동시에
+        results = await asyncio.gather(*actions.values(), return_exceptions=True)
+        for symbol, result in zip(actions, results):
+            if isinstance(result, BaseException):
+                print(f"⚠️ {symbol} 주문 처리 오류: {result!r}")
+            elif result is not None:
+                self.settling[symbol] = (amounts[symbol], time.monotonic() + self.SETTLE_TIMEOUT)
+
+    async def run(self):
+        await self.start()
+        try:
+            while True:
+                try:
+                    await self.step()
+                except Exception as e:
+                    print(f"⚠️ 오류 발생: {e!r}")
+                    await asyncio.sleep(5)  # 오류 발생 시 5초 후 재시도
+        finally:
+            await self.close()
+
+
+def start_trading(symbols=('BTCUSDT',), shared=False):
+    # 매매 루프를 asyncio 로 실행 (같은 프로세스면 이벤트 버스로, 아니면 공유 메모리로 지표를 받음)
+    main.start_account_stream()
+    main.start_price_stream([symbol.lower() for symbol in symbols])
+    main.start_order_book([symbol.lower() for symbol in symbols])
+    main.start_exchange_info()
+    asyncio.run(AsyncTrader(symbols, shared=shared).run())
+
+
+if __name__ == "__main__":
+    # 사용법: python async_trading.py [BTCUSDT ETHUSDT ...] (지표는 report.py / multi_symbol.py 가 공유 메모리에 기록)
+    symbols = [arg.upper() for arg in os.sys.argv[1:]] or ['BTCUSDT']
+    metrics.serve(int(os.getenv("METRICS_PORT", 9109)))
+    start_trading(symbols, shared=True)
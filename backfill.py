@@ -0,0 +1,169 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from endpoints import FAPI_URL
+from rest_scheduler import scheduler as default_scheduler, PRIORITIES, BACKGROUND
+
+
+class BinanceBackfill:
+    """ 시작 시 REST 로 최근 이력을 한 번에 받아 캔들 저장소와 지표 상태를 채우는 워밍업 단계
+
+    - 기본 간격이 1분의 배수면 klines(1m), 아니면 aggTrades 를 받아 같은 CandleAggregator 로 다시 묶는다.
+    - 요청 구간을 나눠 여러 스레드에서 동시에 받고, 구간 안에서 limit 를 넘으면 이어서 페이지를 받는다.
+      aggTrades 는 먼저 최근 probe_ms 구간을 받아 체결 빈도를 재고, 나머지를 한 구간이 페이지 하나쯤
+      (PAGE_FILL) 되도록 나눈다 (최대 slice_ms = 거래소가 허용하는 1시간). 구간이 페이지보다 훨씬 길면
+      이어 받는 페이지가 순서대로 나가 병렬로 받을 수 없다.
+    - 모든 요청은 주문 경로와 같은 RestScheduler 에서 BACKGROUND 우선순위로 가중치를 잡으므로,
+      1분 한도의 BACKGROUND 몫을 넘기면 다음 창까지 기다린다 (그동안 실시간 체결은 링버퍼에 쌓임).
+    - base_url 만 바꾸면 로컬 스텁 서버에도 그대로 붙는다.
+    """
+    PAGE_FILL = 0.8  # 체결 빈도로 나눈 구간이 limit 의 이만큼 차도록 (빈도가 조금 올라도 이어 받는 페이지가 없게)
+
+    def __init__(self, base_url=FAPI_URL, workers=4, slice_ms=3_600_000, probe_ms=60_000, timeout=10, session=None,
+                 scheduler=None):
+        self.base_url = base_url.rstrip('/')
+        self.workers = workers
+        self.slice_ms = slice_ms
+        self.probe_ms = probe_ms
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.scheduler = scheduler or default_scheduler
+
+    def _get(self, name, path, params):
+        """ name(WEIGHTS 의 메서드 이름) 가중치를 스케줄러에서 잡고 요청, 응답 헤더로 사용량을 맞춤
+
+        429/418 이면 스케줄러가 Retry-After 동안 모든 요청을 멈추므로 그 뒤에 같은 요청을 다시 보낸다.
+        """
+        weight = self.scheduler.weight(name, params)
+        while True:
+            self.scheduler.acquire(PRIORITIES.get(name, BACKGROUND), weight)
+            try:
+                response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+            except BaseException:
+                self.scheduler.release(weight)
+                raise
+            self.scheduler.release(weight, response.headers, response.status_code)
+            if response.status_code not in (418, 429):
+                break
+        response.raise_for_status()
+        return response.json()
+
+    def _slices(self, start_ms, end_ms, slice_ms):
+        return [(start, min(start + slice_ms, end_ms)) for start in range(start_ms, end_ms, slice_ms)]
+
+    def _agg_trades_slice(self, symbol, start_ms, end_ms, limit=1000):
+        """ [start_ms, end_ms) 구간의 aggTrades. 꽉 찬 페이지는 마지막 체결 시각부터 이어서 받고 id 로 중복 제거 """
+        trades = {}
+        cursor = start_ms
+        while cursor < end_ms:
+            page = self._get("futures_aggregate_trades", "/fapi/v1/aggTrades", {
+                "symbol": symbol, "startTime": cursor, "endTime": end_ms - 1, "limit": limit,
+            })
+            for trade in page:
+                trades[trade['a']] = (trade['T'], float(trade['p']), float(trade['q']))
+            if len(page) < limit:
+                break
+            last = page[-1]['T']
+            cursor = last if last > cursor else cursor + 1
+        return list(trades.values())
+
+    def _rate_slice_ms(self, count, span_ms, limit=1000):
+        """ span_ms 동안 체결 count 개였으면 페이지 하나(limit x PAGE_FILL)에 드는 구간 길이 (1초 ~ slice_ms) """
+        if not count:
+            return self.slice_ms
+        return int(min(max(span_ms * limit * self.PAGE_FILL / count, 1000), self.slice_ms))
+
+    def fetch_agg_trades(self, symbol, start_ms, end_ms):
+        """ 최근 구간으로 잰 체결 빈도에 맞춰 나눠 동시에 받은 aggTrades 를 시간순 (timestamp, price, quantity) 배열로 반환 """
+        probe_start = max(start_ms, end_ms - self.probe_ms)
+        trades = self._agg_trades_slice(symbol, probe_start, end_ms)
+        slice_ms = self._rate_slice_ms(len(trades), end_ms - probe_start)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pages = pool.map(lambda bounds: self._agg_trades_slice(symbol, *bounds),
+                             self._slices(start_ms, probe_start, slice_ms))
+            trades += [trade for page in pages for trade in page]
+        trades.sort(key=lambda trade: trade[0])
+        if not trades:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+        timestamps, prices, quantities = zip(*trades)
+        return np.array(timestamps, dtype=np.int64), np.array(prices), np.array(quantities)
+
+    def fetch_klines(self, symbol, start_ms, end_ms, limit=1500):
+        """ 1분봉 klines 를 동시에 받아 (시작 시각, o, h, l, c, v) 행 배열로 반환 """
+        step = 60_000 * limit
+
+        def fetch(bounds):
+            return self._get("futures_klines", "/fapi/v1/klines", {
+                "symbol": symbol, "interval": "1m", "startTime": bounds[0], "endTime": bounds[1] - 1, "limit": limit,
+            })
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            rows = [row for page in pool.map(fetch, self._slices(start_ms, end_ms, step)) for row in page]
+        rows = {int(row[0]): row for row in rows if start_ms <= int(row[0]) < end_ms}
+        return np.array([[float(value) for value in rows[start][:6]] for start in sorted(rows)]).reshape(-1, 6)
+
+    @staticmethod
+    def resample(klines, interval):
+        """ 1분봉 행을 interval(ms) 캔들로 묶음 """
+        if not len(klines):
+            return klines
+        starts = klines[:, 0].astype(np.int64) // interval * interval
+        edges = np.flatnonzero(starts[1:] != starts[:-1]) + 1
+        groups = np.split(np.arange(len(klines)), edges)
+        return np.array([
+            [starts[g[0]], klines[g[0], 1], klines[g, 2].max(), klines[g, 3].min(), klines[g[-1], 4], klines[g, 5].sum()]
+            for g in groups
+        ])
+
+    @staticmethod
+    def _drop_open_buckets(aggregator, start_ms, end_ms):
+        """ 끊기기 전 체결로 만들다 만 버킷 중 백필 구간 안의 것은 버림 (REST 가 그 구간 체결을 전부 다시 줌) """
+        for start in [start for start in aggregator.buckets if start_ms <= start < end_ms]:
+            del aggregator.buckets[start]
+
+    def warm_up(self, ohlcv, candles=None):
+        """ BinanceWebSocket_ohlcv 의 저장소를 최근 candles 개 캔들로 채움 (이미 있는 캔들 이후 구간만)
+
+        현재 진행 중인 버킷은 실시간 체결로 만들도록 남기고, 그 이전 버킷까지만 백필한다.
+        집계기의 closed_until 이 백필 끝으로 옮겨지므로 그 사이 링버퍼에 쌓인 실시간 체결과 겹치지 않는다.
+        반환: 추가된 기본 간격 캔들 수
+        """
+        aggregator = ohlcv.aggregator
+        interval = aggregator.interval
+        candles = candles or ohlcv.store.capacity
+        symbol = ohlcv.symbol.upper()
+
+        end_ms = int(time.time() * 1000) // interval * interval
+        start_ms = end_ms - candles * interval
+        if len(ohlcv.store):
+            start_ms = max(start_ms, int(ohlcv.store.last(1)['timestamp'][0]) + interval)
+            aggregator.closed_until = max(aggregator.closed_until or 0, start_ms)
+        if start_ms >= end_ms:
+            return 0
+
+        before = ohlcv.store.count
+        started = time.perf_counter()
+        # REST 조회는 락 밖에서, 집계기 갱신만 drain 과 겹치지 않게 락 안에서 처리
+        if interval % 60_000 == 0:
+            rows = self.resample(self.fetch_klines(symbol, start_ms, end_ms), interval)
+            with ohlcv.aggregator_lock:
+                self._drop_open_buckets(aggregator, start_ms, end_ms)
+                for row in rows:
+                    aggregator.add_candle(int(row[0]), *row[1:].tolist())
+                aggregator.closed_until = max(aggregator.closed_until or 0, end_ms)
+        else:
+            timestamps, prices, quantities = self.fetch_agg_trades(symbol, start_ms, end_ms)
+            with ohlcv.aggregator_lock:
+                self._drop_open_buckets(aggregator, start_ms, end_ms)
+                if len(timestamps):
+                    aggregator.add_trades(timestamps, prices, quantities)
+                # 백필 구간의 마지막 버킷까지 마감
+                aggregator.flush(end_ms + aggregator.grace)
+                aggregator.closed_until = max(aggregator.closed_until or 0, end_ms)
+
+        added = ohlcv.store.count - before
+        print(f"✅ {symbol} 백필 완료: 캔들 {added}개 ({time.perf_counter() - started:.2f}초)")
+        return added
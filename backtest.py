@@ -0,0 +1,264 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore, epoch_ms_to_kst, kst_to_epoch_ms
+from protective_orders import trigger_prices
+from trading_info import registry, _rolling_sum
+
+LONG, HOLD, SHORT = 1, 0, -1
+
+
+def _snapshot_vwap(close, volume, history, lag):
+    """ 캔들 t 의 지표 스냅샷에서 vwap[0] 값
+
+    스냅샷의 VWAP 는 저장소에 남은 최근 history 개 캔들의 처음부터 누적하므로
+    vwap[0] 은 (t - history + 1) ~ (t - lag) 구간의 거래량 가중 평균이다.
+    """
+    offset = close[0] if len(close) else 0.0
+    cum_pv = np.concatenate(([0.0], np.cumsum((close - offset) * volume)))
+    cum_v = np.concatenate(([0.0], np.cumsum(volume)))
+    t = np.arange(len(close))
+    end = np.maximum(t - lag + 1, 0)
+    start = np.minimum(np.maximum(t - history + 1, 0), end)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (cum_pv[end] - cum_pv[start]) / (cum_v[end] - cum_v[start]) + offset
+
+
+def signal_inputs(close, volume, history=500, tail=15):
+    """ 전략 파라미터와 무관한 신호 계산 입력 배열 (파라미터 탐색에서는 한 번만 계산해 공유)
+
+    지표는 TradingIndicators 와 같은 정의(전략이 요구한 지표의 레지스트리 그래프)를 쓴다. 전략 함수는 지표 스냅샷(최근 tail 개)의
+    [0], 즉 tail-1 캔들 전 값을 쓰므로 그만큼 밀어 둔다. 현재가/직전가는 최근 두 종가다.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    volume = np.ascontiguousarray(volume, dtype=np.float64)
+    # VWAP 은 스냅샷 구간 기준으로 따로 계산하므로 그래프에서는 나머지만
+    indicators = registry.graph().compute({"close": close, "volume": volume},
+                                          ("rsi", "macd", "bb_upper", "bb_lower"))
+    n = len(close)
+    lag = tail - 1
+
+    def oldest(values):
+        shifted = np.full(n, np.nan)
+        shifted[lag:] = values[:n - lag]
+        return shifted
+
+    return {
+        "close": close,
+        "prev": np.concatenate(([np.nan], close[:-1])),
+        "rsi": oldest(indicators["rsi"]),
+        "macd_oldest": oldest(indicators["macd"]),
+        "macd": indicators["macd"],
+        "vwap": _snapshot_vwap(close, volume, history, lag),
+        "bb_upper": oldest(indicators["bb_upper"]),
+        "bb_lower": oldest(indicators["bb_lower"]),
+    }
+
+
+def signals_from_inputs(inputs, rsi_long=40, rsi_short=60, signal_window=15, signal_line=None):
+    """ signal_inputs 배열로 캔들마다 get_final_signal 과 같은 판단 (LONG=1, HOLD=0, SHORT=-1)
+
+    MACD 시그널선은 스냅샷의 최근 signal_window 개 MACD 평균이다 (signal_line 을 주면 그대로 사용).
+    """
+    close, prev = inputs["close"], inputs["prev"]
+    if signal_line is None:
+        signal_line = _rolling_sum(inputs["macd"], signal_window) / signal_window
+    histogram = inputs["macd_oldest"] - signal_line
+
+    # 전략 1
+    rsi = inputs["rsi"]
+    long_1 = (rsi <= rsi_long) & (histogram > 0)
+    short_1 = (rsi >= rsi_short) & (histogram < 0)
+
+    # 전략 2
+    vwap = inputs["vwap"]
+    long_2 = (close > vwap) & (prev <= inputs["bb_lower"]) & (close > prev)
+    short_2 = (close < vwap) & (prev >= inputs["bb_upper"]) & (close < prev)
+
+    # get_final_signal 의 조건식은 결과적으로 "한쪽이라도 long 이면 LONG, 아니면 한쪽이라도 short 이면 SHORT"
+    signals = np.zeros(len(close), dtype=np.int8)
+    signals[short_1 | short_2] = SHORT
+    signals[long_1 | long_2] = LONG
+    return signals
+
+
+def strategy_signals(close, volume, history=500, tail=15, **params):
+    """ 캔들마다 get_final_signal 과 같은 판단을 벡터로 계산 """
+    return signals_from_inputs(signal_inputs(close, volume, history, tail), **params)
+
+
+def _next_index(mask):
+    """ 각 위치에서 mask 가 참인 다음(자기 포함) 인덱스. 없으면 len(mask) """
+    n = len(mask)
+    index = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(index[::-1])[::-1]
+
+
+def _first_cross(high, low, start, stop, upper, lower):
+    """ [start, stop) 에서 고가가 upper 이상 또는 저가가 lower 이하가 되는 첫 인덱스 (없으면 stop)
+
+    보유 기간은 대부분 짧으므로 작은 구간부터 두 배씩 늘려 가며 벡터 비교한다.
+    """
+    block = 64
+    while start < stop:
+        end = min(start + block, stop)
+        hit = np.flatnonzero((high[start:end] >= upper) | (low[start:end] <= lower))
+        if len(hit):
+            return start + int(hit[0])
+        start = end
+        block *= 2
+    return stop
+
+
+def run_backtest(timestamps, close, volume, leverage=75, take_profit=11.8, stop_loss=9.25,
+                 fee_rate=0.0005, initial_balance=1000.0, allocation=0.9, history=500, tail=15,
+                 rsi_long=40, rsi_short=60, signal_window=15, high=None, low=None):
+    """ strategy_1/strategy_2 진입과 보호 주문/반대 신호 청산 규칙을 과거 캔들에 적용
+
+    반환: {"equity": 캔들별 평가 잔고 배열, "trades": DataFrame, "signals": 신호 배열, "stats": dict}
+    """
+    signals = strategy_signals(close, volume, history=history, tail=tail,
+                               rsi_long=rsi_long, rsi_short=rsi_short, signal_window=signal_window)
+    return simulate(timestamps, close, signals, leverage, take_profit, stop_loss, fee_rate, initial_balance, allocation,
+                    high=high, low=low)
+
+
+def simulate(timestamps, close, signals, leverage=75, take_profit=11.8, stop_loss=9.25,
+             fee_rate=0.0005, initial_balance=1000.0, allocation=0.9, high=None, low=None):
+    """ 신호 배열에 실거래와 같은 청산 규칙을 적용한 포지션 시뮬레이션
+
+    - 포지션이 없을 때 신호가 LONG/SHORT 인 캔들 종가에 잔고 * allocation * leverage 명목으로 진입
+    - 익절/손절은 실거래처럼 거래소 보호 주문(TAKE_PROFIT_MARKET/STOP_MARKET)으로 본다: 다음 캔들부터
+      고가/저가가 trigger_prices 의 발동가에 닿으면 그 캔들 안에서 발동가로 청산한다.
+      한 캔들에서 둘 다 닿으면 어느 쪽이 먼저인지 알 수 없으므로 손절로 본다.
+      high/low 를 주지 않으면 종가로 발동 여부만 판단한다 (청산가는 여전히 발동가).
+    - 반대 신호는 캔들 종가에 판단하므로 그 캔들에서 보호 주문이 발동하지 않았을 때만 종가로 청산
+    - 청산한 캔들에서는 다시 진입하지 않음 (실제 루프도 다음 지표 갱신 때 진입)
+    - 진입/청산 명목가에 fee_rate(시장가 수수료)를 부과
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    high = close if high is None else np.ascontiguousarray(high, dtype=np.float64)
+    low = close if low is None else np.ascontiguousarray(low, dtype=np.float64)
+    n = len(close)
+
+    next_signal = _next_index(signals != HOLD)
+    next_opposite = {LONG: _next_index(signals == SHORT), SHORT: _next_index(signals == LONG)}
+
+    equity = np.full(n, float(initial_balance))
+    trades = []
+    balance = float(initial_balance)
+    position_end = 0  # 마지막 청산 캔들 (평가 잔고를 채운 곳까지)
+    entry = next_signal[0] if n else 0
+
+    while entry < n:
+        side = int(signals[entry])
+        entry_price = close[entry]
+        notional = balance * allocation * leverage
+        take_price, stop_price = trigger_prices(entry_price, side, leverage, take_profit, -stop_loss)
+        upper, lower = (take_price, stop_price) if side == LONG else (stop_price, take_price)
+
+        reverse = int(next_opposite[side][entry + 1]) if entry + 1 < n else n
+        # 보호 주문은 캔들 안에서 발동하므로 반대 신호가 나온 캔들(종가에 판단)까지 포함해서 찾음
+        cross = _first_cross(high, low, entry + 1, min(reverse + 1, n), upper, lower)
+        exit_index = min(cross, reverse)
+        if exit_index >= n:
+            exit_index, reason = n - 1, "end"
+            exit_price = close[exit_index]
+        elif exit_index == cross:
+            hit_stop = low[cross] <= lower if side == LONG else high[cross] >= upper
+            reason = "stop_loss" if hit_stop else "take_profit"
+            exit_price = stop_price if hit_stop else take_price
+        else:
+            reason = "reverse"
+            exit_price = close[exit_index]
+
+        # 보유 구간 평가 잔고 (진입 수수료 포함, 청산 캔들에서 청산 수수료까지 반영)
+        entry_fee = notional * fee_rate
+        equity[position_end:entry] = balance
+        held = close[entry:exit_index + 1]
+        equity[entry:exit_index + 1] = balance - entry_fee + notional * side * (held / entry_price - 1)
+        exit_fee = notional * exit_price / entry_price * fee_rate
+        pnl = notional * side * (exit_price / entry_price - 1) - entry_fee - exit_fee
+        balance += pnl
+        equity[exit_index] = balance
+        position_end = exit_index + 1
+
+        trades.append((
+            int(timestamps[entry]), int(timestamps[exit_index]), "LONG" if side == LONG else "SHORT",
+            entry_price, exit_price, notional, entry_fee + exit_fee, pnl,
+            side * (exit_price / entry_price - 1) * leverage * 100, reason, balance,
+        ))
+        if reason == "end" or exit_index + 1 >= n:
+            break
+        entry = int(next_signal[exit_index + 1])
+
+    equity[position_end:] = balance
+    trades = pd.DataFrame(trades, columns=[
+        "entry_time", "exit_time", "side", "entry_price", "exit_price",
+        "notional", "fees", "pnl", "profit_rate", "reason", "balance",
+    ])
+    return {"equity": equity, "trades": trades, "signals": signals, "stats": summarize(equity, trades, initial_balance)}
+
+
+def summarize(equity, trades, initial_balance):
+    """ 최종 잔고, 수익률, 최대 낙폭, 승률, 청산 사유별 횟수 """
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    drawdown = float(((peak - equity) / peak).max()) if len(equity) else 0.0
+    final = float(equity[-1]) if len(equity) else float(initial_balance)
+    return {
+        "final_balance": final,
+        "return_pct": (final / initial_balance - 1) * 100,
+        "max_drawdown_pct": drawdown * 100,
+        "trades": len(trades),
+        "win_rate_pct": float((trades["pnl"] > 0).mean() * 100) if len(trades) else 0.0,
+        "fees": float(trades["fees"].sum()) if len(trades) else 0.0,
+        "reasons": trades["reason"].value_counts().to_dict() if len(trades) else {},
+    }
+
+
+def load_candles(path):
+    """ 캔들 파일을 (timestamp ms, close, volume, high, low) 배열로 읽음
+
+    .bin: CandleStore, .json: 기존 JSON 캔들 파일, .csv: 바이낸스 kline CSV (open_time, open, high, low, close, volume, ...)
+    """
+    if path.endswith('.bin'):
+        store = CandleStore(path, readonly=True)
+        candles = {name: values.copy() for name, values in store.last().items()}
+        store.close()
+        return candles['timestamp'], candles['close'], candles['volume'], candles['high'], candles['low']
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as file:
+            data = [candle for candle in json.load(file) if candle]
+        timestamps = np.array([kst_to_epoch_ms(str(candle['timestamp'])) for candle in data], dtype=np.int64)
+        columns = [np.array([candle[key] for candle in data], dtype=np.float64) for key in ("close", "volume", "high", "low")]
+        return (timestamps, *columns)
+    frame = pd.read_csv(path, header=None, usecols=[0, 2, 3, 4, 5])
+    if not str(frame.iloc[0, 0]).isdigit():
+        frame = frame.iloc[1:]
+    return (frame[0].to_numpy(np.int64), *(frame[column].to_numpy(np.float64) for column in (4, 5, 2, 3)))
+
+
+if __name__ == "__main__":
+    # 사용법: python backtest.py 캔들파일(.bin/.json/.csv) [출력 접두사]
+    path = os.sys.argv[1]
+    prefix = os.sys.argv[2] if len(os.sys.argv) > 2 else "backtest"
+
+    timestamps, close, volume, high, low = load_candles(path)
+    started = time.perf_counter()
+    result = run_backtest(timestamps, close, volume, high=high, low=low)
+    elapsed = time.perf_counter() - started
+
+    trades = result["trades"]
+    trades["entry_time"] = trades["entry_time"].map(epoch_ms_to_kst)
+    trades["exit_time"] = trades["exit_time"].map(epoch_ms_to_kst)
+    trades.to_csv(f"{prefix}_trades.csv", index=False)
+    pd.DataFrame({"timestamp": timestamps, "equity": result["equity"]}).to_csv(f"{prefix}_equity.csv", index=False)
+
+    print(f"✅ 캔들 {len(close)}개 백테스트 완료 ({elapsed:.2f}초)")
+    for key, value in result["stats"].items():
+        print(f"  {key}: {value}")
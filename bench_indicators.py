@@ -0,0 +1,68 @@
+import time
+import sys
+
+import numpy as np
+import pandas as pd
+
+from trading_info import compute_indicators
+
+
+def pandas_indicators(data, window=14, fast=12, slow=26, bb_window=20, num_std_dev=2):
+    """ 기존 save_indicators 의 pandas 계산 경로 (rolling.apply WMA 포함) 그대로 """
+    close = data['close'].astype(float)
+    sma = data['close'].astype(float).rolling(window=window).mean()
+    weights = np.arange(1, window + 1)
+    wma = close.rolling(window=window).apply(lambda prices: np.dot(prices, weights) / weights.sum(), raw=True)
+    ema = data['close'].astype(float).ewm(span=window, adjust=False).mean()
+
+    delta = data['close'].astype(float).diff()
+    gain = delta.where(delta > 0, 0).rolling(window=window).mean()
+    loss = -delta.where(delta < 0, 0).rolling(window=window).mean()
+    rsi = 100 - (100 / (1 + gain / loss))
+
+    macd = (data['close'].astype(float).ewm(span=fast, adjust=False).mean()
+            - data['close'].astype(float).ewm(span=slow, adjust=False).mean())
+
+    bb_sma = data['close'].astype(float).rolling(window=bb_window).mean()
+    rolling_std = data['close'].rolling(window=bb_window).std()
+    upper = (bb_sma + rolling_std * num_std_dev).bfill()
+    lower = (bb_sma - rolling_std * num_std_dev).bfill()
+    bb_sma = bb_sma.bfill()
+
+    price_volume = data['close'].astype(float) * data['volume'].astype(float)
+    vwap = price_volume.cumsum() / data['volume'].astype(float).cumsum()
+    return sma, wma, ema, rsi, macd, upper, bb_sma, lower, vwap
+
+
+def make_candles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 60000 + np.cumsum(rng.normal(0, 20, n))
+    volume = rng.uniform(0, 5, n)
+    return pd.DataFrame({"close": close, "volume": volume})
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes=(500, 1_000_000)):
+    print(f"{'candles':>10} {'pandas(ms)':>12} {'numpy(ms)':>12} {'speedup':>9}")
+    for n in sizes:
+        data = make_candles(n)
+        close = data['close'].to_numpy()
+        volume = data['volume'].to_numpy()
+        repeat = 20 if n <= 10_000 else 2
+
+        pandas_time = best_of(lambda: pandas_indicators(data), repeat)
+        numpy_time = best_of(lambda: compute_indicators(close, volume), repeat)
+        print(f"{n:>10} {pandas_time * 1000:>12.2f} {numpy_time * 1000:>12.2f} {pandas_time / numpy_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(arg) for arg in sys.argv[1:]) or (500, 1_000_000)
+    run(sizes)
@@ -0,0 +1,117 @@
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from ohlcv_update import BinanceWebSocket_ohlcv
+
+
+def synthetic_messages(n, seed=0):
+    """ 바이낸스 선물 @trade 형식의 메시지 n개 생성 """
+    rng = np.random.default_rng(seed)
+    prices = 60000 + np.cumsum(rng.normal(0, 0.5, n))
+    quantities = rng.uniform(0.001, 0.5, n)
+    start = 1_700_000_000_000
+    return [
+        json.dumps({
+            "e": "trade", "E": start + i * 5 + 1, "T": start + i * 5, "s": "BTCUSDT", "t": 5_000_000_000 + i,
+            "p": f"{prices[i]:.1f}", "q": f"{quantities[i]:.3f}", "X": "MARKET", "m": bool(i % 2),
+        }, separators=(',', ':'))
+        for i in range(n)
+    ]
+
+
+def load_messages(path):
+    """ 녹화된 원본 메시지 파일 (한 줄에 메시지 하나) """
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+class LegacyIngest:
+    """ 기존 on_message 경로: json.loads -> dict -> 락 -> 리스트 두 개에 추가 (data_buffer 는 비우지 않음) """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data_buffer = []
+        self.candle_buffer = []
+
+    def on_message(self, message):
+        data = json.loads(message)
+        with self.lock:
+            trade_data = {"timestamp": data['T'], "price": float(data['p']), "quantity": float(data['q'])}
+            self.data_buffer.append(trade_data)
+            self.candle_buffer.append(trade_data)
+
+    def close_candle(self):
+        with self.lock:
+            trades = [data for data in self.candle_buffer if data['price'] > 0]
+            if trades:
+                max(data['price'] for data in trades)
+                min(data['price'] for data in trades)
+                sum(data['quantity'] for data in trades)
+            self.candle_buffer = []
+
+
+class RingIngest:
+    """ 링버퍼 경로: parse_trade -> TradeRingBuffer.push, 주기적으로 구간 배열을 집계기에 넘김 """
+    def __init__(self, tmp):
+        self.ohlcv = BinanceWebSocket_ohlcv(
+            data_file=os.path.join(tmp, "bench.bin"), legacy_json=None,
+            rollup_files={60_000: os.path.join(tmp, "bench_1m.bin")},
+        )
+        self.ohlcv.timer.cancel()
+        self.ohlcv.aggregator.on_candle = None
+
+    def on_message(self, message):
+        self.ohlcv.on_message(None, message)
+
+    def close_candle(self):
+        trades = self.ohlcv.trades
+        end = trades.head
+        if end > trades.tail:
+            self.ohlcv.aggregator.add_trades(*trades.peek(end))
+        trades.release(end)
+
+
+def replay(ingest, messages, ticks_per_candle):
+    start = time.perf_counter()
+    for i, message in enumerate(messages, 1):
+        ingest.on_message(message)
+        if i % ticks_per_candle == 0:
+            ingest.close_candle()
+    ingest.close_candle()
+    return len(messages) / (time.perf_counter() - start)
+
+
+def measure(name, make_ingest, messages, ticks_per_candle):
+    rate = replay(make_ingest(), messages, ticks_per_candle)
+
+    # 파이썬 할당 최대치는 별도 실행에서 측정 (tracemalloc 이 처리량을 떨어뜨리므로)
+    tracemalloc.start()
+    replay(make_ingest(), messages, ticks_per_candle)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:>8} {rate:>14,.0f} {peak / 1024 / 1024:>16.1f}")
+
+
+def run(messages, ticks_per_candle=2000):
+    print(f"replay: {len(messages):,} messages, candle close every {ticks_per_candle} ticks")
+    print(f"{'path':>8} {'ticks/s':>14} {'peak alloc(MB)':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        measure("legacy", LegacyIngest, messages, ticks_per_candle)
+        measure("ring", lambda: RingIngest(tmp), messages, ticks_per_candle)
+    # ru_maxrss: 리눅스는 KB 단위
+    print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(load_messages(sys.argv[1]))
+    else:
+        run(synthetic_messages(500_000))
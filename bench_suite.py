@@ -0,0 +1,225 @@
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# 벤치마크는 주문을 보내지 않으므로 main 의 Client 가 실제 거래소에 ping 하지 않도록 로컬 주소로 돌려 둠
+os.environ["BINANCE_FAPI_URL"] = "http://127.0.0.1:9"
+
+from bench_indicators import make_candles
+from candle_aggregator import CandleAggregator
+from candle_store import CandleStore
+from ohlcv_update import BinanceWebSocket_ohlcv
+from trading_info import TradingIndicators
+
+SIZES = (500, 10_000, 1_000_000)
+TICK_RATES = (10, 100, 1_000)  # 초당 체결 수 (10초 캔들 하나에 rate x 10 체결)
+GETTERS = ("get_sma", "get_wma", "get_ema", "get_rsi", "get_macd", "get_bb", "get_vwap")
+SYMBOL = "BENCHUSDT"
+
+
+def measure(func, repeat=7, min_sample=0.02, budget=3.0):
+    """ 호출 한 번당 시간(ms)의 중앙값/최솟값
+
+    빠른 함수는 한 샘플이 min_sample 초 이상이 되도록 여러 번 묶어서 재고,
+    느린 함수는 전체 측정이 budget 초 안에 끝나도록 반복 횟수를 줄인다 (최소 3번).
+    """
+    start = time.perf_counter()
+    func()
+    once = max(time.perf_counter() - start, 1e-9)
+    loops = max(1, int(min_sample / once))
+    repeat = max(3, min(repeat, int(budget / (once * loops))))
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops * 1000)
+    return {"median_ms": statistics.median(samples), "best_ms": min(samples), "loops": loops, "repeat": repeat}
+
+
+def fill_store(store, n, seed=0):
+    """ 결정적인 합성 10초 캔들 n개를 캔들 저장소에 기록 """
+    data = make_candles(n, seed)
+    close = data['close'].to_numpy()
+    start = 1_700_000_000_000
+    for i in range(n):
+        open_price = close[i - 1] if i else close[0]
+        store.append(start + i * 10_000, open_price, max(open_price, close[i]) + 5,
+                     min(open_price, close[i]) - 5, close[i], data['volume'].iat[i])
+
+
+def load_json(file_path):
+    """ 예전 매매 루프의 JSON 지표/캔들 파일 읽기 (공유 메모리 경로와 비교용) """
+    with open(file_path, 'r') as file:
+        return json.load(file)
+
+
+def latest_prices(store):
+    """ 예전 매매 루프처럼 캔들 저장소에서 (최신 종가, 직전 종가) 읽기 """
+    close = store.last(2)['close'].tolist()
+    return close[-1], close[-2]
+
+
+def make_trades(count, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = 1_700_000_000_000 + np.sort(rng.integers(0, 10_000, count))
+    trade_prices = 60000 + np.cumsum(rng.normal(0, 0.5, count))
+    quantities = rng.uniform(0.001, 0.5, count)
+    return timestamps.astype(np.int64), trade_prices, quantities
+
+
+def cases(sizes=SIZES, tick_rates=TICK_RATES):
+    """ (이름, 함수) 목록. 현재 디렉터리(임시 디렉터리)에 픽스처 파일을 만든다 """
+    import main
+
+    indicators = TradingIndicators("bench_indicators.bin", "bench_indicators.json", SYMBOL, dump_json=True)
+    for n in sizes:
+        data = make_candles(n)
+        for getter in GETTERS:
+            yield f"{getter}[{n}]", lambda getter=getter, data=data: getattr(indicators, getter)(data)
+        yield f"save_indicators[{n}]", lambda data=data: indicators.save_indicators(data)
+
+    ohlcv = BinanceWebSocket_ohlcv(symbol=SYMBOL.lower(), data_file="bench_ohlcv.bin", legacy_json=None,
+                                   rollup_files={}, start_timer=False)
+    def aggregate(timestamps, trade_prices, quantities):
+        # 10초 분량 체결을 새 집계기에 넣고 그 버킷을 마감 (롤업 포함, 실제 drain 과 같은 경로)
+        aggregator = CandleAggregator()
+        aggregator.add_trades(timestamps, trade_prices, quantities)
+        aggregator.flush(int(timestamps[-1]) + aggregator.interval + aggregator.grace)
+
+    for rate in tick_rates:
+        trades = make_trades(rate * 10)
+        yield f"add_trades[{rate}/s]", lambda trades=trades: aggregate(*trades)
+
+    # 픽스처: 캔들 500개 저장소 + 그 캔들로 계산한 지표 (공유 메모리, JSON)
+    fill_store(ohlcv.store, ohlcv.store.capacity)
+    fill_store(indicators.store, indicators.store.capacity)
+    indicators.save_indicators(indicators.load_data())
+
+    def json_roundtrip():
+        ohlcv.save_to_json("bench_candles.json")
+        return load_json("bench_candles.json")
+
+    yield "save_to_json+load_data", json_roundtrip
+    yield "store_load_data", indicators.load_data
+
+    def shared_signal():
+        main._last_signals.pop(SYMBOL, None)  # 캐시된 신호 대신 매번 스냅샷을 읽어 다시 판단
+        return main.get_final_signal(symbol=SYMBOL)
+
+    candles = CandleStore(indicators.data_file, readonly=True)
+
+    def json_signal():
+        data = load_json(indicators.output_file)
+        return main.get_final_signal(data, latest_prices(candles), SYMBOL)
+
+    yield "get_final_signal[shared]", shared_signal
+    yield "get_final_signal[json]", json_signal
+
+
+def run(sizes=SIZES, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            # 측정 대상의 print 는 버림 (print 비용 자체는 그대로 포함)
+            with contextlib.redirect_stdout(devnull):
+                for name, func in cases(sizes):
+                    if only and only not in name:
+                        continue
+                    results[name] = measure(func)
+                    print(f"{name:<28} {results[name]['median_ms']:>12.4f} ms", file=sys.__stdout__)
+        finally:
+            os.chdir(cwd)
+    return {
+        "meta": {
+            "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.2, floor_ms=0.005, key="best_ms"):
+    """ 기준 결과와 비교해 (이름, 기준 ms, 현재 ms, 비율, 상태) 목록 반환
+
+    다른 프로세스의 간섭은 시간을 늘리기만 하므로 기본으로 중앙값보다 흔들림이 적은 최솟값(best_ms)을 비교한다.
+    threshold 보다 느려졌고 차이가 floor_ms 이상이면 REGRESSION (타이머 잡음으로 인한 오탐 방지).
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append((name, None, result[key], None, "new"))
+            continue
+        ratio = result[key] / base[key]
+        if ratio > 1 + threshold and result[key] - base[key] >= floor_ms:
+            status = "REGRESSION"
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, base[key], result[key], ratio, status))
+    return rows
+
+
+def print_comparison(rows, current, baseline):
+    for key in ("python", "numpy", "pandas", "machine", "cpus"):
+        if current["meta"].get(key) != baseline["meta"].get(key):
+            print(f"⚠️ 기준과 환경이 다릅니다 ({key}: {baseline['meta'].get(key)} -> {current['meta'].get(key)})")
+    print(f"{'benchmark':<28} {'baseline(ms)':>13} {'current(ms)':>13} {'ratio':>7}  status")
+    for name, base, value, ratio, status in rows:
+        base = f"{base:.4f}" if base is not None else "-"
+        ratio = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<28} {base:>13} {value:>13.4f} {ratio:>7}  {status}")
+
+
+if __name__ == "__main__":
+    # 사용법: python bench_suite.py [--quick] [--only 이름일부] [--out bench_results.json]
+    #                               [--baseline bench_baseline.json] [--threshold 0.2] [--save-baseline]
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return type(default)(args[args.index(name) + 1]) if name in args else default
+
+    sizes = SIZES[:-1] if "--quick" in args else SIZES  # --quick: 100만 캔들 제외
+    output = os.path.abspath(option("--out", "bench_results.json"))
+    baseline_path = os.path.abspath(option("--baseline", "bench_baseline.json"))
+    threshold = option("--threshold", 0.2)
+
+    current = run(sizes, option("--only", ""))
+    with open(output, 'w') as file:
+        json.dump(current, file, indent=2)
+    print(f"✅ 결과 저장: {output}")
+
+    if "--save-baseline" in args:
+        with open(baseline_path, 'w') as file:
+            json.dump(current, file, indent=2)
+        print(f"📌 기준 결과 갱신: {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        rows = compare(current, baseline, threshold)
+        print_comparison(rows, current, baseline)
+        regressions = [row[0] for row in rows if row[4] == "REGRESSION"]
+        if regressions:
+            print(f"❌ 성능 회귀 {len(regressions)}건: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ 성능 회귀 없음")
+    else:
+        print(f"기준 결과가 없습니다. --save-baseline 으로 {baseline_path} 를 만드세요.")
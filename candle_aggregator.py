@@ -0,0 +1,126 @@
+import numpy as np
+
+from candle_store import epoch_ms_to_kst
+
+
+class CandleAggregator:
+    """ 거래소 체결 시각(T) 기준으로 캔들을 만드는 집계기
+
+    - 체결은 T // interval 버킷에 들어가고, OHLCV 는 체결이 들어올 때마다 누적 갱신한다.
+    - 버킷은 (버킷 끝 + grace) 시각이 지나야 마감되므로 조금 늦게 도착한 체결도 제 버킷에 들어간다.
+      이미 마감된 버킷의 체결은 late_trades 로 세고 버린다.
+    - 기본 캔들이 마감될 때 같은 패스에서 rollups(예: 1분/5분/15분) 캔들에도 합쳐진다.
+    on_candle(interval_ms, candle) 로 마감된 캔들을 넘긴다 (candle 은 한국시간 문자열 timestamp 와 open/high/low/close/volume 을 담은 dict).
+    """
+    def __init__(self, interval=10_000, rollups=(60_000, 300_000, 900_000), grace=1_000, on_candle=None):
+        for timeframe in rollups:
+            if timeframe % interval:
+                raise ValueError(f"rollup {timeframe}ms 는 기본 간격 {interval}ms 의 배수여야 합니다.")
+        self.interval = interval
+        self.rollups = tuple(sorted(rollups))
+        self.grace = grace
+        self.on_candle = on_candle
+
+        self.buckets = {}  # 버킷 시작(ms) -> [open, high, low, close, volume]
+        self.rollup_buckets = {timeframe: None for timeframe in self.rollups}  # timeframe -> (시작, [o, h, l, c, v])
+        self.closed_until = None  # 이 시각 이전 버킷은 모두 마감됨
+        self.watermark = 0  # 지금까지 본 가장 늦은 체결 시각
+        self.late_trades = 0
+
+    def _merge(self, buckets, start, open_price, high, low, close, volume):
+        bucket = buckets.get(start)
+        if bucket is None:
+            buckets[start] = [open_price, high, low, close, volume]
+        else:
+            if high > bucket[1]:
+                bucket[1] = high
+            if low < bucket[2]:
+                bucket[2] = low
+            bucket[3] = close
+            bucket[4] += volume
+
+    def add_trade(self, timestamp, price, quantity):
+        """ 체결 하나를 반영 """
+        if price <= 0:
+            return
+        start = timestamp // self.interval * self.interval
+        if self.closed_until is not None and start < self.closed_until:
+            self.late_trades += 1
+            return
+        self._merge(self.buckets, start, price, price, price, price, quantity)
+        if timestamp > self.watermark:
+            self.watermark = timestamp
+            self.flush(timestamp)
+
+    def add_trades(self, timestamps, prices, quantities):
+        """ 체결 배열(링버퍼 구간)을 반영. 같은 버킷이 이어지는 구간마다 한 번에 갱신 """
+        valid = prices > 0
+        if not valid.all():
+            timestamps, prices, quantities = timestamps[valid], prices[valid], quantities[valid]
+        if not len(timestamps):
+            return
+
+        starts = timestamps // self.interval * self.interval
+        edges = np.flatnonzero(starts[1:] != starts[:-1]) + 1
+        for begin, end in zip([0] + edges.tolist(), edges.tolist() + [len(starts)]):
+            start = int(starts[begin])
+            if self.closed_until is not None and start < self.closed_until:
+                self.late_trades += end - begin
+                continue
+            segment = prices[begin:end]
+            self._merge(self.buckets, start, float(segment[0]), float(segment.max()), float(segment.min()),
+                        float(segment[-1]), float(quantities[begin:end].sum()))
+
+        latest = int(timestamps.max())
+        if latest > self.watermark:
+            self.watermark = latest
+        self.flush(self.watermark)
+
+    def add_candle(self, start, open_price, high, low, close, volume):
+        """ 이미 완성된 기본 간격 캔들(예: 백필)을 바로 마감 처리하고 롤업에 합침 """
+        if self.closed_until is not None and start < self.closed_until:
+            return
+        bucket = [open_price, high, low, close, volume]
+        self.closed_until = start + self.interval
+        self._emit(self.interval, start, bucket)
+        self._roll(start, bucket)
+
+    def flush(self, now):
+        """ 거래소 시각 now 기준으로 (끝 + grace) 가 지난 버킷과 롤업 캔들을 마감 """
+        ready = sorted(start for start in self.buckets if start + self.interval + self.grace <= now)
+        for start in ready:
+            bucket = self.buckets.pop(start)
+            self.closed_until = start + self.interval
+            self._emit(self.interval, start, bucket)
+            self._roll(start, bucket)
+
+        for timeframe in self.rollups:
+            current = self.rollup_buckets[timeframe]
+            if current is not None and current[0] + timeframe + self.grace <= now:
+                self._emit(timeframe, *current)
+                self.rollup_buckets[timeframe] = None
+
+    def _roll(self, start, bucket):
+        for timeframe in self.rollups:
+            rollup_start = start // timeframe * timeframe
+            current = self.rollup_buckets[timeframe]
+            if current is not None and current[0] != rollup_start:
+                self._emit(timeframe, *current)
+                current = None
+            if current is None:
+                self.rollup_buckets[timeframe] = (rollup_start, list(bucket))
+            else:
+                self._merge({rollup_start: current[1]}, rollup_start, *bucket)
+
+    def _emit(self, interval, start, bucket):
+        if self.on_candle is None:
+            return
+        open_price, high, low, close, volume = bucket
+        self.on_candle(interval, {
+            "timestamp": epoch_ms_to_kst(start),
+            "open": float(open_price),
+            "high": float(high),
+            "low": float(low),
+            "close": float(close),
+            "volume": float(volume)
+        })
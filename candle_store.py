@@ -0,0 +1,166 @@
+import json
+import mmap
+import os
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+
+KST = timezone(timedelta(hours=9))
+
+MAGIC = 0x31444C4E41434B42  # "BKCANDL1"
+HEADER_SLOTS = 8  # magic, capacity, count, 예비
+HEADER_SIZE = HEADER_SLOTS * 8
+COLUMNS = (
+    ("timestamp", np.int64),  # 캔들 시작 시각 (epoch ms)
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+)
+
+
+def kst_to_epoch_ms(text):
+    """ '%Y-%m-%d %H:%M:%S' 형식의 한국시간 문자열을 epoch ms 로 변환 """
+    dt = datetime.strptime(text, '%Y-%m-%d %H:%M:%S').replace(tzinfo=KST)
+    return int(dt.timestamp() * 1000)
+
+
+def epoch_ms_to_kst(ms):
+    """ epoch ms 를 기존 JSON 캔들 파일과 같은 한국시간 문자열로 변환 """
+    return datetime.fromtimestamp(ms / 1000, KST).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def candle_file(symbol):
+    """ 심볼별 10초 캔들 저장소 파일 이름 (BTCUSDT 는 기존 파일 이름을 유지) """
+    symbol = symbol.upper()
+    if symbol == 'BTCUSDT':
+        return "1min_BTC_OHLCV.bin"
+    return f"10s_{symbol}_OHLCV.bin"
+
+
+class CandleStore:
+    """ 고정 길이 레코드로 된 메모리 맵 캔들 링버퍼
+
+    파일 구조: [헤더 8 x int64][컬럼별 2 x capacity 배열] (timestamp int64, OHLCV float64)
+    각 캔들은 i 와 i + capacity 두 곳에 같이 기록되므로 최근 N개는 항상 연속 구간이 되고,
+    last() 는 복사 없이 NumPy 뷰를 돌려준다. 헤더의 count(누적 추가 개수)는 데이터를 모두
+    쓴 다음에 갱신하므로 읽는 쪽은 count 이하의 캔들만 보게 된다.
+    """
+    def __init__(self, path, capacity=500, readonly=False):
+        self.path = path
+        self.readonly = readonly
+
+        if readonly:
+            self._file = open(path, 'rb')
+            capacity = int(np.frombuffer(self._file.read(HEADER_SIZE), dtype=np.int64)[1])
+        else:
+            self._file = open(path, 'a+b')
+            existing = os.path.getsize(path)
+            if existing >= HEADER_SIZE:
+                self._file.seek(0)
+                header = np.frombuffer(self._file.read(HEADER_SIZE), dtype=np.int64)
+                if header[0] == MAGIC:
+                    capacity = int(header[1])
+
+        self.capacity = capacity
+        size = HEADER_SIZE + sum(np.dtype(dtype).itemsize for _, dtype in COLUMNS) * 2 * capacity
+
+        if readonly:
+            self._mm = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        else:
+            if os.path.getsize(path) < size:
+                self._file.truncate(size)
+            self._mm = mmap.mmap(self._file.fileno(), size)
+
+        self._header = np.frombuffer(self._mm, dtype=np.int64, count=HEADER_SLOTS, offset=0)
+        self._columns = {}
+        offset = HEADER_SIZE
+        for name, dtype in COLUMNS:
+            self._columns[name] = np.frombuffer(self._mm, dtype=dtype, count=2 * capacity, offset=offset)
+            offset += np.dtype(dtype).itemsize * 2 * capacity
+
+        if not readonly and self._header[0] != MAGIC:
+            self._header[1] = capacity
+            self._header[2] = 0
+            self._header[0] = MAGIC
+
+    @property
+    def count(self):
+        """ 지금까지 추가된 캔들 수 (링버퍼가 돌아도 계속 증가) """
+        return int(self._header[2])
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, open_price, high, low, close, volume):
+        """ 캔들 하나를 O(1)로 추가 (timestamp: epoch ms) """
+        count = self.count
+        index = count % self.capacity
+        values = (timestamp, open_price, high, low, close, volume)
+        for (name, _), value in zip(COLUMNS, values):
+            column = self._columns[name]
+            column[index] = value
+            column[index + self.capacity] = value
+        # 데이터를 다 쓴 뒤에 count 를 올려서 읽는 쪽이 덜 쓴 캔들을 보지 않도록 함
+        self._header[2] = count + 1
+
+    def append_candle(self, candle):
+        """ 캔들 dict(한국시간 문자열 timestamp + open/high/low/close/volume)를 추가 """
+        timestamp = candle['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = kst_to_epoch_ms(timestamp)
+        self.append(timestamp, candle['open'], candle['high'], candle['low'], candle['close'], candle['volume'])
+
+    def last(self, n=None):
+        """ 최근 n개 캔들의 컬럼별 NumPy 뷰 (복사 없음, 오래된 것 -> 최신 순)
+
+        뷰는 파일을 직접 가리키므로 capacity 에 가까운 구간을 오래 들고 있을 경우
+        쓰는 쪽이 덮어쓸 수 있다. 오래 보관하려면 copy() 해서 사용한다.
+        """
+        count = self.count
+        size = min(count, self.capacity) if n is None else min(n, count, self.capacity)
+        if count == 0:
+            end = 0
+        else:
+            end = (count - 1) % self.capacity + self.capacity + 1
+        return {name: column[end - size:end] for name, column in self._columns.items()}
+
+    def records(self, n=None):
+        """ 기존 JSON 캔들 파일과 같은 형식의 dict 리스트 """
+        columns = {name: values.tolist() for name, values in self.last(n).items()}
+        return [
+            {
+                "timestamp": epoch_ms_to_kst(columns['timestamp'][i]),
+                "open": columns['open'][i],
+                "high": columns['high'][i],
+                "low": columns['low'][i],
+                "close": columns['close'][i],
+                "volume": columns['volume'][i],
+            }
+            for i in range(len(columns['timestamp']))
+        ]
+
+    def export_json(self, json_path, n=None):
+        """ 디버깅용으로 기존 형식의 JSON 파일로 내보내기 """
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(self.records(n), file, indent=4)
+
+    def import_json(self, json_path):
+        """ 기존 JSON 캔들 파일을 옮겨옴. 옮긴 캔들 수를 반환 """
+        try:
+            with open(json_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+
+        data = [candle for candle in data if candle]
+        for candle in data[-self.capacity:]:
+            self.append_candle(candle)
+        return min(len(data), self.capacity)
+
+    def close(self):
+        self._header = None
+        self._columns = {}
+        self._mm.close()
+        self._file.close()
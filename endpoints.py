@@ -0,0 +1,10 @@
+import os
+
+from dotenv import load_dotenv
+
+# 환경 변수(.env 포함)로 바이낸스 대신 로컬 거래소 시뮬레이터 등에 붙일 수 있음
+load_dotenv()
+
+DEFAULT_FAPI_URL = "https://fapi.binance.com"
+FAPI_URL = os.getenv("BINANCE_FAPI_URL", DEFAULT_FAPI_URL).rstrip('/')
+STREAM_URL = os.getenv("BINANCE_STREAM_URL", "wss://fstream.binance.com").rstrip('/')
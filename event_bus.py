@@ -0,0 +1,138 @@
+import asyncio
+import queue
+import threading
+from collections import defaultdict
+
+from metrics import metrics
+
+# 이벤트 토픽
+CANDLE_CLOSED = "candle_closed"            # payload: 집계기가 마감한 캔들 dict + "symbol"
+ROLLUP_CLOSED = "rollup_closed"            # payload: {"symbol", "interval": 롤업 간격(ms), "candle": 캔들 dict}
+INDICATORS_UPDATED = "indicators_updated"  # payload: {"symbol", "indicators": 지표 dict, "prices": (최신 종가, 직전 종가), "candle_ms": 마지막 캔들 시작 시각}
+
+
+class Subscription:
+    """ 한 토픽에 대한 구독. 쌓인 이벤트 중 가장 최신 것만 꺼내 쓴다 """
+    def __init__(self, bus, topic):
+        self.bus = bus
+        self.topic = topic
+        self.queue = queue.Queue()
+
+    def get(self, timeout=None):
+        """ 이벤트가 올 때까지 기다렸다가 가장 최신 이벤트를 반환 (timeout 이 지나면 None) """
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        # 처리하는 사이 밀린 이벤트는 버리고 최신 값만 사용
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                return event
+
+    def get_all(self, timeout=None):
+        """ 이벤트가 올 때까지 기다렸다가 쌓인 이벤트를 모두 반환 (timeout 이 지나면 빈 리스트) """
+        try:
+            events = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def put(self, payload):
+        self.queue.put(payload)
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class AsyncSubscription:
+    """ asyncio 루프에서 쓰는 구독. 발행 스레드는 call_soon_threadsafe 로 루프에 넘기므로 이벤트가 오면 바로 깨어난다
+
+    ready 로 asyncio.Event 를 넘기면 다른 깨움 원인(가격 변동 등)과 같은 Event 를 공유할 수 있다.
+    """
+    def __init__(self, bus, topic, loop, ready=None):
+        self.bus = bus
+        self.topic = topic
+        self.loop = loop
+        self.ready = ready or asyncio.Event()
+        self.pending = []
+
+    def put(self, payload):
+        self.loop.call_soon_threadsafe(self._deliver, payload)
+
+    def _deliver(self, payload):
+        self.pending.append(payload)
+        self.ready.set()
+
+    def qsize(self):
+        return len(self.pending)
+
+    def drain(self):
+        """ 쌓인 이벤트를 모두 꺼냄 (기다리지 않음) """
+        events, self.pending = self.pending, []
+        return events
+
+    async def get_all(self, timeout=None):
+        """ 이벤트가 올 때까지 기다렸다가 쌓인 이벤트를 모두 반환 (timeout 이 지나면 빈 리스트) """
+        if not self.pending:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return self.drain()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """ 같은 프로세스 안의 단계들(캔들 -> 지표 -> 매매)을 잇는 발행/구독 버스 """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(list)
+
+    def subscribe(self, topic):
+        subscription = Subscription(self, topic)
+        with self.lock:
+            self.subscribers[topic].append(subscription)
+        return subscription
+
+    def subscribe_async(self, topic, ready=None):
+        """ 실행 중인 asyncio 루프에서 받는 구독 """
+        subscription = AsyncSubscription(self, topic, asyncio.get_running_loop(), ready)
+        with self.lock:
+            self.subscribers[topic].append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscribers[subscription.topic]:
+                self.subscribers[subscription.topic].remove(subscription)
+
+    def publish(self, topic, payload):
+        with self.lock:
+            subscribers = list(self.subscribers[topic])
+        for subscription in subscribers:
+            subscription.put(payload)
+
+
+    def pending(self, topic):
+        """ 토픽 구독들에 쌓여 아직 꺼내지 않은 이벤트 수 (메트릭 게이지용) """
+        with self.lock:
+            subscribers = list(self.subscribers[topic])
+        return sum(subscription.qsize() for subscription in subscribers)
+
+
+# 프로세스 기본 버스
+bus = EventBus()
+for _topic in (CANDLE_CLOSED, ROLLUP_CLOSED, INDICATORS_UPDATED):
+    metrics.gauge("bus_pending_events", lambda topic=_topic: bus.pending(topic), topic=_topic)
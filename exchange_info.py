@@ -0,0 +1,108 @@
+import math
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+
+
+def round_step(value, step, rounding=ROUND_DOWN):
+    """ value 를 step 의 배수로 맞춤 (Decimal 로 계산해 0.1 + 0.2 같은 부동소수 오차가 주문 수량에 남지 않도록) """
+    if not step:
+        return float(value)
+    step = Decimal(str(step))
+    return float((Decimal(str(value)) / step).to_integral_value(rounding) * step)
+
+
+class ExchangeInfo:
+    """ exchangeInfo 의 심볼별 주문 필터와 심볼별 현재 레버리지 캐시
+
+    filters(symbol) -> {"step_size", "min_qty", "max_qty", "market_step_size", "max_market_qty", "tick_size", "min_notional"}
+    필터는 처음 쓸 때 한 번 읽고 ttl 초가 지나면 다시 읽는다 (start() 를 부르면 백그라운드에서 ttl / 2 마다 갱신).
+    레버리지는 symbolConfig 로 읽은 뒤 직접 바꾼 값과 user-data 스트림의 ACCOUNT_CONFIG_UPDATE 로 갱신하므로
+    이미 원하는 값이면 futures_change_leverage 를 보내지 않는다.
+    """
+    def __init__(self, client, ttl=3600):
+        self.client = client
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.symbols = {}    # symbol -> 필터 dict
+        self.leverages = {}  # symbol -> 현재 레버리지
+        self.loaded_at = None
+
+    @staticmethod
+    def _parse(item):
+        filters = {f['filterType']: f for f in item.get('filters', [])}
+        lot = filters.get('LOT_SIZE', {})
+        market = filters.get('MARKET_LOT_SIZE', lot)
+        return {
+            "step_size": float(lot.get('stepSize', 0)),
+            "min_qty": float(lot.get('minQty', 0)),
+            "max_qty": float(lot.get('maxQty', math.inf)),
+            "market_step_size": float(market.get('stepSize', lot.get('stepSize', 0))),
+            "max_market_qty": float(market.get('maxQty', lot.get('maxQty', math.inf))),
+            "tick_size": float(filters.get('PRICE_FILTER', {}).get('tickSize', 0)),
+            "min_notional": float(filters.get('MIN_NOTIONAL', {}).get('notional', 0)),
+        }
+
+    def refresh(self):
+        """ exchangeInfo 와 symbolConfig 를 다시 읽음 """
+        info = self.client.futures_exchange_info()
+        symbols = {item['symbol']: self._parse(item) for item in info['symbols']}
+        try:
+            leverages = {item['symbol']: int(item['leverage']) for item in self.client.futures_symbol_config()}
+        except Exception as e:
+            # 레버리지를 모르면 처음 진입할 때 한 번 설정하게 될 뿐이므로 필터만 갱신
+            print(f"⚠️ 심볼 레버리지 설정 조회 실패: {e}")
+            leverages = {}
+        with self.lock:
+            self.symbols = symbols
+            self.leverages.update(leverages)
+            self.loaded_at = time.monotonic()
+        print(f"✅ 거래소 정보 갱신: 심볼 {len(symbols)}개")
+
+    def stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def filters(self, symbol):
+        """ 심볼 주문 필터. 캐시가 오래됐으면 다시 읽고, 읽지 못하면 직전 값 (처음부터 없으면 None) """
+        if self.stale():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ 거래소 정보 조회 실패: {e}")
+        with self.lock:
+            return self.symbols.get(symbol.upper())
+
+    def leverage(self, symbol):
+        """ 캐시된 현재 레버리지 (모르면 None) """
+        with self.lock:
+            return self.leverages.get(symbol.upper())
+
+    def record_leverage(self, symbol, leverage):
+        with self.lock:
+            self.leverages[symbol.upper()] = int(leverage)
+
+    def ensure_leverage(self, symbol, leverage):
+        """ 현재 레버리지가 다를 때만 변경 요청. 요청을 보냈으면 True """
+        if self.loaded_at is None:
+            self.filters(symbol)  # 처음이면 symbolConfig 로 현재 레버리지부터 확인
+        if self.leverage(symbol) == leverage:
+            return False
+        response = self.client.futures_change_leverage(symbol=symbol, leverage=leverage)
+        self.record_leverage(symbol, response.get('leverage', leverage))
+        return True
+
+    def run(self):
+        while True:
+            time.sleep(self.ttl / 2)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ 거래소 정보 갱신 실패 (다음 주기에 재시도): {e}")
+
+    def start(self):
+        """ 처음 한 번 읽고 백그라운드에서 주기적으로 갱신 (주문 경로에서는 조회 비용이 들지 않도록) """
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"⚠️ 거래소 정보 조회 실패: {e}")
+        threading.Thread(target=self.run, daemon=True).start()
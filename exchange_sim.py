@@ -0,0 +1,768 @@
+import asyncio
+import bisect
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from aiohttp import web, WSMsgType
+
+
+class SimulatorError(Exception):
+    """ 바이낸스 오류 응답({"code", "msg"})으로 돌려줄 주문 거절 """
+    def __init__(self, code, msg):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+
+
+class ExchangeSimulator:
+    """ 바이낸스 선물 대신 쓰는 로컬 거래소 (체결 재생 웹소켓 + 주문 REST)
+
+    - 녹화된 @trade 메시지를 speed 배속으로 재생한다 (speed=0 이면 최대 속도).
+      체결 시각(T/E)은 재생 시작 시각에 맞춰 옮기고, 간격은 녹화 그대로 둔다.
+    - /ws/<stream>, /stream?streams=a/b 로 @trade, @bookTicker, @markPrice@1s, @depth@100ms 와 user-data(listenKey) 스트림을 제공한다.
+      호가는 마지막 체결가 양쪽으로 틱 간격 book_levels 단계 (k 번째 단계 수량 level_quantity * k) 인 합성 호가이고,
+      /fapi/v1/depth 스냅샷(lastUpdateId)과 U/u/pu 가 붙은 diff 로 내보낸다.
+    - REST 는 코드가 쓰는 엔드포인트만 흉내 낸다: 잔고, 현재가, 레버리지, 포지션, 주문(조회/취소/목록), 조건부 주문, listenKey, aggTrades,
+      exchangeInfo/symbolConfig, depth. 주문 수량 단위와 최소 명목가(FILTERS)를 검사한다.
+    - 요청 가중치/주문 수를 X-MBX-USED-WEIGHT-1M, X-MBX-ORDER-COUNT-10S/1M 헤더로 돌려주고,
+      1분 가중치가 weight_limit 을 넘으면 429 와 Retry-After 로 거절한다.
+    - 체결 모델: MARKET 은 마지막 체결가(± slippage_bps)에 전량 체결, LIMIT 은 체결가가 지정가에 닿으면 지정가로 체결,
+      조건부 주문(STOP_MARKET / TAKE_PROFIT_MARKET, /fapi/v1/algoOrder)은 체결가가 triggerPrice 에 닿으면
+      그 체결가로 시장가 주문을 내고 ALGO_UPDATE 를 보낸다.
+      수수료는 체결 명목가 * fee_rate 를 지갑 잔고에서 뺀다.
+    - 주문 도착 시각(time.perf_counter)을 order_log 에 남겨 체결 -> 주문 지연을 잴 수 있게 한다.
+    """
+    # 모든 심볼에 같은 주문 필터 (BTCUSDT 기준)
+    FILTERS = {"step_size": "0.001", "tick_size": "0.1", "min_notional": "100"}
+    CONDITIONAL = ("STOP_MARKET", "TAKE_PROFIT_MARKET")
+
+    def __init__(self, messages, speed=1.0, host="127.0.0.1", port=8765, balance=10_000.0,
+                 fee_rate=0.0005, slippage_bps=0.0, leverage=20, weight_limit=2400, book_levels=50, level_quantity=0.5):
+        self.trades = [json.loads(message) for message in messages]
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.fee_rate = fee_rate
+        self.slippage_bps = slippage_bps
+        self.default_leverage = leverage
+        self.weight_limit = weight_limit
+        self.book_levels = book_levels
+        self.level_quantity = level_quantity
+
+        # 요청 가중치 / 주문 수 (1분, 10초 창). 한도를 넘으면 429 + Retry-After
+        self.weight_minute = None
+        self.order_window = None
+        self.used_weight = 0
+        self.orders_10s = 0
+        self.orders_1m = 0
+        self.rejected = 0
+
+        # 계정 상태 (이벤트 루프 스레드에서만 변경)
+        self.balance = float(balance)
+        self.positions = {}  # symbol -> {"amt", "entry"}
+        self.leverage = {}
+        self.orders = {}     # orderId -> 주문 dict
+        self.open_orders = []
+        self.algo_orders = {}  # algoId -> 조건부 주문 dict
+        self.open_algo_orders = []
+        self.order_ids = itertools.count(1)
+        self.listen_keys = set()
+        self.last_prices = {}
+        self.books = {}       # symbol -> (매수 호가, 매도 호가) {가격 문자열: 수량 문자열}
+        self.update_ids = {}  # symbol -> 마지막 호가 업데이트 ID
+
+        # 재생 기록 (지연 측정용)
+        self.first_time = int(self.trades[0]['T']) if self.trades else 0
+        self.shift = 0
+        self.sent_times = []   # 옮긴 체결 시각(ms)
+        self.sent_at = []      # 보낸 시각(perf_counter)
+        self.order_log = []    # (도착 시각(perf_counter), symbol, side, type)
+        self.replay_started = None
+        self.replay_finished = None
+        self.finished = threading.Event()
+
+        self.subscribers = {}  # 스트림 이름 -> [(ws, combined)]
+        self.loop = None
+        self.app = self._build_app()
+
+    # ---------- 서버 ----------
+    def _build_app(self):
+        app = web.Application()
+        app.add_routes([
+            web.get('/ws/{name}', self._ws_handler),
+            web.get('/stream', self._ws_handler),
+            web.get('/api/v3/ping', self._ping),
+            web.get('/fapi/v1/ping', self._ping),
+            web.get('/fapi/v1/time', self._time),
+            web.get('/fapi/{version}/balance', self._rest(self.get_balance, weight=5)),
+            web.get('/fapi/{version}/ticker/price', self._rest(self.get_ticker)),
+            web.post('/fapi/v1/leverage', self._rest(self.change_leverage)),
+            web.get('/fapi/{version}/positionRisk', self._rest(self.get_positions, weight=5)),
+            web.post('/fapi/v1/order', self._rest(self.create_order, weight=0, order=True)),
+            web.get('/fapi/v1/order', self._rest(self.get_order)),
+            web.delete('/fapi/v1/order', self._rest(self.cancel_order)),
+            web.get('/fapi/v1/openOrders', self._rest(self.get_open_orders)),
+            web.get('/fapi/v1/allOrders', self._rest(self.get_all_orders, weight=5)),
+            web.post('/fapi/v1/algoOrder', self._rest(self.create_algo_order, weight=0, order=True)),
+            web.delete('/fapi/v1/algoOrder', self._rest(self.cancel_algo_order)),
+            web.get('/fapi/v1/openAlgoOrders', self._rest(self.get_open_algo_orders)),
+            web.post('/fapi/v1/listenKey', self._rest(self.new_listen_key)),
+            web.put('/fapi/v1/listenKey', self._rest(lambda params: {})),
+            web.get('/fapi/v1/aggTrades', self._rest(self.get_agg_trades, weight=20)),
+            web.get('/fapi/v1/klines', self._rest(lambda params: [], weight=5)),
+            web.get('/fapi/v1/exchangeInfo', self._rest(self.get_exchange_info)),
+            web.get('/fapi/v1/symbolConfig', self._rest(self.get_symbol_config, weight=5)),
+            web.get('/fapi/v1/depth', self._rest(self.get_depth, weight=10)),
+        ])
+        return app
+
+    def _rest(self, handler, weight=1, order=False):
+        async def route(request):
+            now = time.time()
+            if int(now // 60) != self.weight_minute:
+                self.weight_minute, self.used_weight, self.orders_1m = int(now // 60), 0, 0
+            if int(now // 10) != self.order_window:
+                self.order_window, self.orders_10s = int(now // 10), 0
+            self.used_weight += weight
+            if order:
+                self.orders_10s += 1
+                self.orders_1m += 1
+            headers = {"X-MBX-USED-WEIGHT-1M": str(self.used_weight),
+                       "X-MBX-ORDER-COUNT-10S": str(self.orders_10s), "X-MBX-ORDER-COUNT-1M": str(self.orders_1m)}
+            if self.used_weight > self.weight_limit:
+                self.rejected += 1
+                headers["Retry-After"] = str(int(60 - now % 60) + 1)
+                return web.json_response({"code": -1003, "msg": "Too many requests."}, status=429, headers=headers)
+
+            params = dict(request.query)
+            if request.method != 'GET' and request.can_read_body:
+                params.update(await request.post())
+            try:
+                return web.json_response(handler(params), headers=headers)
+            except SimulatorError as e:
+                return web.json_response({"code": e.code, "msg": e.msg}, status=400, headers=headers)
+        return route
+
+    async def _ping(self, request):
+        return web.json_response({})
+
+    async def _time(self, request):
+        return web.json_response({"serverTime": self._now_ms()})
+
+    async def _ws_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        if 'name' in request.match_info:
+            names, combined = [request.match_info['name']], False
+        else:
+            names, combined = request.query.get('streams', '').split('/'), True
+        for name in names:
+            self.subscribers.setdefault(name, []).append((ws, combined))
+        try:
+            async for message in ws:
+                if message.type in (WSMsgType.CLOSE, WSMsgType.ERROR):
+                    break
+        finally:
+            for name in names:
+                subscribers = self.subscribers.get(name, [])
+                if (ws, combined) in subscribers:
+                    subscribers.remove((ws, combined))
+        return ws
+
+    async def _publish(self, name, payload):
+        subscribers = self.subscribers.get(name)
+        if not subscribers:
+            return
+        for ws, combined in list(subscribers):
+            message = f'{{"stream":"{name}","data":{payload}}}' if combined else payload
+            try:
+                await ws.send_str(message)
+            except (ConnectionResetError, RuntimeError):
+                subscribers.remove((ws, combined))
+
+    def has_subscriber(self, name):
+        return bool(self.subscribers.get(name))
+
+    def start(self):
+        """ 별도 스레드의 이벤트 루프에서 서버 시작 (포트가 열릴 때까지 기다림) """
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            runner = web.AppRunner(self.app)
+            self.loop.run_until_complete(runner.setup())
+            self.loop.run_until_complete(web.TCPSite(runner, self.host, self.port).start())
+            ready.set()
+            self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        print(f"✅ 거래소 시뮬레이터 시작: http://{self.host}:{self.port} (체결 {len(self.trades)}개, {self.speed or '최대'}배속)")
+
+    def start_replay(self):
+        asyncio.run_coroutine_threadsafe(self._replay(), self.loop)
+
+    # ---------- 체결 재생 ----------
+    def _now_ms(self):
+        return int(time.time() * 1000)
+
+    async def _replay(self):
+        self.replay_started = time.perf_counter()
+        self.shift = self._now_ms() - self.first_time
+        last_mark = {}
+        for i, trade in enumerate(self.trades):
+            if self.speed:
+                delay = self.replay_started + (int(trade['T']) - self.first_time) / 1000 / self.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % 256 == 0:
+                # 최대 속도에서도 REST 요청을 처리할 틈을 줌
+                await asyncio.sleep(0)
+
+            symbol = trade['s']
+            stream = symbol.lower()
+            timestamp = int(trade['T']) + self.shift
+            price = float(trade['p'])
+            self.last_prices[symbol] = price
+
+            await self._publish(f"{stream}@trade", json.dumps(
+                {**trade, "E": timestamp + 1, "T": timestamp}, separators=(',', ':')))
+            self.sent_times.append(timestamp)
+            self.sent_at.append(time.perf_counter())
+
+            await self._publish(f"{stream}@bookTicker", json.dumps(
+                {"e": "bookTicker", "s": symbol, "b": trade['p'], "a": trade['p'], "T": timestamp, "E": timestamp},
+                separators=(',', ':')))
+            if last_mark.get(symbol) != timestamp // 1000:
+                last_mark[symbol] = timestamp // 1000
+                await self._publish(f"{stream}@markPrice@1s", json.dumps(
+                    {"e": "markPriceUpdate", "E": timestamp, "s": symbol, "p": trade['p']}, separators=(',', ':')))
+
+            if self.has_subscriber(f"{stream}@depth@100ms"):
+                await self._publish_depth(symbol, timestamp)
+
+            if self.open_orders or self.open_algo_orders:
+                await self._match_limits(symbol, price)
+
+        self.replay_finished = time.perf_counter()
+        self.finished.set()
+        elapsed = self.replay_finished - self.replay_started
+        print(f"✅ 재생 완료: 체결 {len(self.trades)}개, {elapsed:.2f}초 ({len(self.trades) / max(elapsed, 1e-9):,.0f} ticks/s)")
+
+    # ---------- 호가 ----------
+    def _synthetic_book(self, symbol):
+        if symbol not in self.last_prices:
+            return {}, {}
+        tick = self.FILTERS["tick_size"]
+        digits = len(tick.split('.')[1]) if '.' in tick else 0
+        tick = float(tick)
+        mid = round(self.last_prices[symbol] / tick)
+        bids = {f"{(mid - k) * tick:.{digits}f}": f"{self.level_quantity * k:.3f}" for k in range(1, self.book_levels + 1)}
+        asks = {f"{(mid + k) * tick:.{digits}f}": f"{self.level_quantity * k:.3f}" for k in range(1, self.book_levels + 1)}
+        return bids, asks
+
+    @staticmethod
+    def _book_diff(old, new):
+        changed = [[price, quantity] for price, quantity in new.items() if old.get(price) != quantity]
+        return changed + [[price, "0"] for price in old if price not in new]
+
+    async def _publish_depth(self, symbol, timestamp):
+        """ 합성 호가가 바뀌었으면 diff 이벤트 하나를 보냄 (업데이트 ID 는 1~3 씩 증가) """
+        old_bids, old_asks = self.books.get(symbol, ({}, {}))
+        bids, asks = self._synthetic_book(symbol)
+        bid_diff, ask_diff = self._book_diff(old_bids, bids), self._book_diff(old_asks, asks)
+        if not bid_diff and not ask_diff:
+            return
+        self.books[symbol] = (bids, asks)
+        previous = self.update_ids.get(symbol, 1000)
+        last = previous + 1 + timestamp % 3
+        self.update_ids[symbol] = last
+        await self._publish(f"{symbol.lower()}@depth@100ms", json.dumps(
+            {"e": "depthUpdate", "E": timestamp, "T": timestamp, "s": symbol, "U": previous + 1, "u": last,
+             "pu": previous, "b": bid_diff, "a": ask_diff}, separators=(',', ':')))
+
+    def get_depth(self, params):
+        symbol = params['symbol']
+        if symbol not in self.books:
+            self.books[symbol] = self._synthetic_book(symbol)
+        self.update_ids.setdefault(symbol, 1000)
+        limit = int(params.get('limit', 500))
+        bids, asks = self.books[symbol]
+        now = self._now_ms()
+        return {"lastUpdateId": self.update_ids[symbol], "E": now, "T": now,
+                "bids": [[price, quantity] for price, quantity in list(bids.items())[:limit]],
+                "asks": [[price, quantity] for price, quantity in list(asks.items())[:limit]]}
+
+    # ---------- 계정 ----------
+    def _position(self, symbol):
+        return self.positions.setdefault(symbol, {"amt": 0.0, "entry": 0.0})
+
+    def _unrealized(self, symbol):
+        position = self.positions.get(symbol)
+        if not position or not position['amt']:
+            return 0.0
+        return (self.last_prices.get(symbol, position['entry']) - position['entry']) * position['amt']
+
+    def _available(self):
+        margin = sum(abs(p['amt']) * p['entry'] / self.leverage.get(s, self.default_leverage)
+                     for s, p in self.positions.items())
+        return self.balance + sum(self._unrealized(s) for s in self.positions) - margin
+
+    def get_balance(self, params):
+        return [{
+            "asset": "USDT",
+            "balance": str(self.balance),
+            "crossUnPnl": str(sum(self._unrealized(s) for s in self.positions)),
+            "availableBalance": str(self._available()),
+        }]
+
+    def get_ticker(self, params):
+        symbol = params.get('symbol', 'BTCUSDT')
+        if symbol not in self.last_prices:
+            raise SimulatorError(-1121, "Invalid symbol.")
+        return {"symbol": symbol, "price": str(self.last_prices[symbol]), "time": self._now_ms()}
+
+    def change_leverage(self, params):
+        symbol = params['symbol']
+        self.leverage[symbol] = int(params['leverage'])
+        now = self._now_ms()
+        self._emit_user({"e": "ACCOUNT_CONFIG_UPDATE", "E": now, "T": now, "ac": {"s": symbol, "l": self.leverage[symbol]}})
+        return {"symbol": symbol, "leverage": self.leverage[symbol], "maxNotionalValue": "1000000"}
+
+    def _symbols(self):
+        return sorted(set(self.last_prices) | {trade.get('s', 'BTCUSDT') for trade in self.trades[:1000]})
+
+    def get_exchange_info(self, params):
+        return {"serverTime": self._now_ms(), "rateLimits": [
+            {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": self.weight_limit},
+            {"rateLimitType": "ORDERS", "interval": "MINUTE", "intervalNum": 1, "limit": 1200},
+            {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 300},
+        ], "symbols": [{
+            "symbol": symbol, "status": "TRADING", "contractType": "PERPETUAL",
+            "filters": [
+                {"filterType": "PRICE_FILTER", "tickSize": self.FILTERS["tick_size"], "minPrice": "0.1", "maxPrice": "1000000"},
+                {"filterType": "LOT_SIZE", "stepSize": self.FILTERS["step_size"], "minQty": self.FILTERS["step_size"], "maxQty": "1000"},
+                {"filterType": "MARKET_LOT_SIZE", "stepSize": self.FILTERS["step_size"], "minQty": self.FILTERS["step_size"], "maxQty": "120"},
+                {"filterType": "MIN_NOTIONAL", "notional": self.FILTERS["min_notional"]},
+            ],
+        } for symbol in self._symbols()]}
+
+    def get_symbol_config(self, params):
+        symbols = [params['symbol']] if 'symbol' in params else self._symbols()
+        return [{"symbol": symbol, "marginType": "CROSSED", "isAutoAddMargin": "false",
+                 "leverage": self.leverage.get(symbol, self.default_leverage), "maxNotionalValue": "1000000"}
+                for symbol in symbols]
+
+    def _position_info(self, symbol):
+        position = self._position(symbol)
+        return {
+            "symbol": symbol,
+            "positionAmt": str(position['amt']),
+            "entryPrice": str(position['entry']),
+            "markPrice": str(self.last_prices.get(symbol, 0.0)),
+            "unRealizedProfit": str(self._unrealized(symbol)),
+            "leverage": str(self.leverage.get(symbol, self.default_leverage)),
+            "positionSide": "BOTH",
+        }
+
+    def get_positions(self, params):
+        symbols = [params['symbol']] if 'symbol' in params else sorted(set(self.positions) | set(self.last_prices))
+        return [self._position_info(symbol) for symbol in symbols]
+
+    def new_listen_key(self, params):
+        key = uuid.uuid4().hex
+        self.listen_keys.add(key)
+        return {"listenKey": key}
+
+    def get_agg_trades(self, params):
+        """ 지금까지 재생한 체결을 aggTrades 형식으로 (재연결 백필용) """
+        start = int(params.get('startTime', 0))
+        end = int(params.get('endTime', 2 ** 62))
+        limit = int(params.get('limit', 500))
+        first = bisect.bisect_left(self.sent_times, start)
+        last = min(bisect.bisect_right(self.sent_times, end), first + limit)
+        return [
+            {"a": i, "p": self.trades[i]['p'], "q": self.trades[i]['q'], "T": self.sent_times[i], "m": self.trades[i].get('m', False)}
+            for i in range(first, last)
+        ]
+
+    # ---------- 주문 ----------
+    def create_order(self, params):
+        self.order_log.append((time.perf_counter(), params.get('symbol'), params.get('side'), params.get('type')))
+        symbol = params['symbol']
+        side = params['side']
+        order_type = params.get('type', 'MARKET')
+        quantity = float(params['quantity'])
+        reduce_only = str(params.get('reduceOnly', 'false')).lower() == 'true'
+        if symbol not in self.last_prices:
+            raise SimulatorError(-1121, "Invalid symbol.")
+        if quantity <= 0:
+            raise SimulatorError(-4003, "Quantity less than or equal to zero.")
+        step = float(self.FILTERS["step_size"])
+        if abs(quantity / step - round(quantity / step)) > 1e-9:
+            raise SimulatorError(-1111, "Precision is over the maximum defined for this asset.")
+        min_notional = float(self.FILTERS["min_notional"])
+        if not reduce_only and quantity * self.last_prices[symbol] < min_notional:
+            raise SimulatorError(-4164, f"Order's notional must be no smaller than {min_notional}")
+
+        client_order_id = params.get('newClientOrderId') or f"sim_{uuid.uuid4().hex[:16]}"
+        if any(order['clientOrderId'] == client_order_id for order in self.orders.values()):
+            raise SimulatorError(-4116, "ClientOrderId is duplicated.")
+
+        position = self._position(symbol)
+        signed = quantity if side == 'BUY' else -quantity
+        if reduce_only:
+            if not position['amt'] or (position['amt'] > 0) == (signed > 0):
+                raise SimulatorError(-2022, "ReduceOnly Order is rejected.")
+            quantity = min(quantity, abs(position['amt']))
+
+        order = {
+            "orderId": next(self.order_ids), "symbol": symbol, "clientOrderId": client_order_id,
+            "side": side, "type": order_type, "origQty": str(quantity), "executedQty": "0",
+            "price": params.get('price', "0"), "avgPrice": "0", "cumQuote": "0",
+            "reduceOnly": reduce_only, "status": "NEW", "timeInForce": params.get('timeInForce', 'GTC'),
+            "updateTime": self._now_ms(),
+        }
+
+        if order_type == 'MARKET':
+            slip = self.slippage_bps / 10_000 * (1 if side == 'BUY' else -1)
+            price = self.last_prices[symbol] * (1 + slip)
+            self._check_margin(symbol, signed, price, reduce_only)
+            self.orders[order['orderId']] = order
+            self._fill(order, price)
+        elif order_type == 'LIMIT':
+            self.orders[order['orderId']] = order
+            self.open_orders.append(order)
+            self._emit_order(order, "NEW", 0.0, 0.0, 0.0, 0.0)
+        else:
+            raise SimulatorError(-1116, "Invalid orderType.")
+        return dict(order)
+
+    def _check_margin(self, symbol, signed, price, reduce_only):
+        amt = self._position(symbol)['amt']
+        opening = abs(amt + signed) - abs(amt)
+        if not reduce_only and opening > 0:
+            needed = opening * price / self.leverage.get(symbol, self.default_leverage)
+            if needed > self._available():
+                raise SimulatorError(-2019, "Margin is insufficient.")
+
+    async def _match_limits(self, symbol, price):
+        for order in list(self.open_orders):
+            if order['symbol'] != symbol:
+                continue
+            limit = float(order['price'])
+            if (order['side'] == 'BUY' and price <= limit) or (order['side'] == 'SELL' and price >= limit):
+                self.open_orders.remove(order)
+                self._fill(order, limit)
+        for algo in list(self.open_algo_orders):
+            if algo['symbol'] == symbol and self._triggered(algo, price):
+                self.open_algo_orders.remove(algo)
+                self._trigger(algo)
+
+    def _fill(self, order, price):
+        """ 주문 전량을 price 에 체결하고 포지션/잔고를 갱신, user-data 이벤트 발행 """
+        symbol = order['symbol']
+        quantity = float(order['origQty'])
+        signed = quantity if order['side'] == 'BUY' else -quantity
+        position = self._position(symbol)
+        amt, realized = position['amt'], 0.0
+
+        if amt == 0 or (amt > 0) == (signed > 0):
+            new = amt + signed
+            position['entry'] = (position['entry'] * abs(amt) + price * quantity) / abs(new)
+        else:
+            closing = min(quantity, abs(amt))
+            realized = (price - position['entry']) * closing * (1 if amt > 0 else -1)
+            new = amt + signed
+            if abs(new) < 1e-12:
+                new, position['entry'] = 0.0, 0.0
+            elif (new > 0) != (amt > 0):
+                position['entry'] = price
+        position['amt'] = round(new, 8)
+
+        fee = price * quantity * self.fee_rate
+        self.balance += realized - fee
+        order.update({
+            "status": "FILLED", "executedQty": str(quantity), "avgPrice": str(price),
+            "cumQuote": str(price * quantity), "updateTime": self._now_ms(),
+        })
+        self._emit_order(order, "TRADE", quantity, price, realized, fee)
+        self._emit_account(symbol)
+
+    def get_order(self, params):
+        order = self._find_order(params)
+        return dict(order)
+
+    def get_open_orders(self, params):
+        return [dict(order) for order in self.open_orders if 'symbol' not in params or order['symbol'] == params['symbol']]
+
+    def get_all_orders(self, params):
+        start = int(params.get('startTime', 0))
+        return [dict(order) for order in self.orders.values()
+                if order['symbol'] == params['symbol'] and order['updateTime'] >= start]
+
+    # ---------- 조건부(algo) 주문 ----------
+    def create_algo_order(self, params):
+        self.order_log.append((time.perf_counter(), params.get('symbol'), params.get('side'), params.get('type')))
+        symbol = params['symbol']
+        if symbol not in self.last_prices:
+            raise SimulatorError(-1121, "Invalid symbol.")
+        if params.get('algoType') != 'CONDITIONAL' or params.get('type') not in self.CONDITIONAL:
+            raise SimulatorError(-1116, "Invalid orderType.")
+        client_algo_id = params.get('clientAlgoId') or f"sim_{uuid.uuid4().hex[:16]}"
+        if any(algo['clientAlgoId'] == client_algo_id for algo in self.algo_orders.values()):
+            raise SimulatorError(-4116, "ClientOrderId is duplicated.")
+        algo = {
+            "algoId": next(self.order_ids), "clientAlgoId": client_algo_id, "algoType": "CONDITIONAL",
+            "orderType": params['type'], "symbol": symbol, "side": params['side'], "quantity": str(params['quantity']),
+            "triggerPrice": str(params['triggerPrice']), "reduceOnly": str(params.get('reduceOnly', 'false')).lower() == 'true',
+            "algoStatus": "NEW", "actualOrderId": "", "updateTime": self._now_ms(),
+        }
+        if self._triggered(algo, self.last_prices[symbol]):
+            raise SimulatorError(-2021, "Order would immediately trigger.")
+        self.algo_orders[algo['algoId']] = algo
+        self.open_algo_orders.append(algo)
+        self._emit_algo(algo)
+        return dict(algo)
+
+    def cancel_algo_order(self, params):
+        algo = self._find_algo_order(params)
+        if algo['algoStatus'] != 'NEW':
+            raise SimulatorError(-2011, "Unknown order sent.")
+        self.open_algo_orders.remove(algo)
+        algo.update({"algoStatus": "CANCELED", "updateTime": self._now_ms()})
+        self._emit_algo(algo)
+        return dict(algo)
+
+    def get_open_algo_orders(self, params):
+        return [dict(algo) for algo in self.open_algo_orders if 'symbol' not in params or algo['symbol'] == params['symbol']]
+
+    def _find_algo_order(self, params):
+        if 'algoId' in params:
+            algo = self.algo_orders.get(int(params['algoId']))
+        else:
+            algo = next((a for a in self.algo_orders.values() if a['clientAlgoId'] == params.get('clientAlgoId')), None)
+        if algo is None:
+            raise SimulatorError(-2013, "Order does not exist.")
+        return algo
+
+    @staticmethod
+    def _triggered(algo, price):
+        """ STOP_MARKET 은 불리한 쪽, TAKE_PROFIT_MARKET 은 유리한 쪽으로 triggerPrice 에 닿으면 발동 """
+        trigger = float(algo['triggerPrice'])
+        rising = (algo['orderType'] == 'STOP_MARKET') == (algo['side'] == 'BUY')
+        return price >= trigger if rising else price <= trigger
+
+    def _trigger(self, algo):
+        """ 발동된 조건부 주문을 시장가 주문으로 냄. reduce-only 인데 줄일 포지션이 없으면 만료 """
+        algo.update({"algoStatus": "TRIGGERED", "updateTime": self._now_ms()})
+        self._emit_algo(algo)
+        try:
+            order = self.create_order({"symbol": algo['symbol'], "side": algo['side'], "type": "MARKET",
+                                       "quantity": algo['quantity'], "reduceOnly": str(algo['reduceOnly']).lower()})
+        except SimulatorError:
+            algo.update({"algoStatus": "EXPIRED", "updateTime": self._now_ms()})
+        else:
+            algo.update({"algoStatus": "FINISHED", "actualOrderId": str(order['orderId']), "updateTime": self._now_ms()})
+        self._emit_algo(algo)
+
+    def cancel_order(self, params):
+        order = self._find_order(params)
+        if order['status'] != 'NEW':
+            raise SimulatorError(-2011, "Unknown order sent.")
+        self.open_orders.remove(order)
+        order.update({"status": "CANCELED", "updateTime": self._now_ms()})
+        self._emit_order(order, "CANCELED", 0.0, 0.0, 0.0, 0.0)
+        return dict(order)
+
+    def _find_order(self, params):
+        if 'orderId' in params:
+            order = self.orders.get(int(params['orderId']))
+        else:
+            client_order_id = params.get('origClientOrderId')
+            order = next((o for o in self.orders.values() if o['clientOrderId'] == client_order_id), None)
+        if order is None:
+            raise SimulatorError(-2013, "Order does not exist.")
+        return order
+
+    # ---------- user-data 이벤트 ----------
+    def _emit_user(self, payload):
+        message = json.dumps(payload, separators=(',', ':'))
+        for key in self.listen_keys:
+            asyncio.ensure_future(self._publish(key, message), loop=self.loop)
+
+    def _emit_order(self, order, execution, last_quantity, last_price, realized, fee):
+        now = self._now_ms()
+        self._emit_user({"e": "ORDER_TRADE_UPDATE", "E": now, "T": now, "o": {
+            "s": order['symbol'], "c": order['clientOrderId'], "S": order['side'], "o": order['type'],
+            "q": order['origQty'], "p": order['price'], "ap": order['avgPrice'], "X": order['status'],
+            "x": execution, "i": order['orderId'], "l": str(last_quantity), "z": order['executedQty'],
+            "L": str(last_price), "R": order['reduceOnly'], "rp": str(realized), "n": str(fee), "N": "USDT", "T": now,
+        }})
+
+    def _emit_algo(self, algo):
+        now = self._now_ms()
+        self._emit_user({"e": "ALGO_UPDATE", "E": now, "T": now, "o": {
+            "caid": algo['clientAlgoId'], "aid": algo['algoId'], "at": algo['algoType'], "o": algo['orderType'],
+            "s": algo['symbol'], "S": algo['side'], "q": algo['quantity'], "X": algo['algoStatus'],
+            "ai": algo['actualOrderId'], "tp": algo['triggerPrice'], "R": algo['reduceOnly'],
+        }})
+
+    def _emit_account(self, symbol):
+        now = self._now_ms()
+        position = self._position(symbol)
+        self._emit_user({"e": "ACCOUNT_UPDATE", "E": now, "T": now, "a": {
+            "m": "ORDER",
+            "B": [{"a": "USDT", "wb": str(self.balance), "cw": str(self.balance)}],
+            "P": [{"s": symbol, "pa": str(position['amt']), "ep": str(position['entry']),
+                   "up": str(self._unrealized(symbol)), "ps": "BOTH"}],
+        }})
+
+
+def use_simulator(port):
+    """ 이 프로세스의 바이낸스 엔드포인트를 시뮬레이터로 바꿈 (endpoints 를 import 하기 전에 호출) """
+    os.environ["BINANCE_FAPI_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["BINANCE_STREAM_URL"] = f"ws://127.0.0.1:{port}"
+    # 서명은 검사하지 않지만 서명 계산에 키가 필요함
+    os.environ.setdefault("BIN_API_KEY", "simulator")
+    os.environ.setdefault("BIN_SEC_KEY", "simulator")
+
+
+def _percentiles(values):
+    if not values:
+        return "데이터 없음"
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return f"p50 {pick(0.5):8.2f}ms  p90 {pick(0.9):8.2f}ms  p99 {pick(0.99):8.2f}ms  max {values[-1] * 1000:8.2f}ms  (n={len(values)})"
+
+
+def bench(messages, speed=0.0, port=8765, drain_interval=0.5, settle=3.0):
+    """ 시뮬레이터에 report.py 와 main.py 파이프라인을 한 프로세스로 붙여 수집 속도와 단계별 지연을 측정
+
+    체결 -> 캔들: 캔들이 마감될 수 있게 된 시점(끝 + grace 를 넘긴 첫 체결 전송, 배속 재생이면 그 시각)부터 CANDLE_CLOSED 까지
+    캔들 -> 신호: CANDLE_CLOSED 부터 INDICATORS_UPDATED 까지
+    신호 -> 주문: INDICATORS_UPDATED 부터 시뮬레이터가 주문을 받을 때까지
+    """
+    use_simulator(port)
+    os.chdir(tempfile.mkdtemp(prefix="exchange_sim_"))
+
+    simulator = ExchangeSimulator(messages, speed=speed, port=port)
+    simulator.start()
+
+    # 엔드포인트는 import 시점에 환경 변수를 읽으므로 여기서 import
+    from candle_store import candle_file, kst_to_epoch_ms
+    from event_bus import bus, CANDLE_CLOSED, INDICATORS_UPDATED
+    from ohlcv_update import BinanceWebSocket_ohlcv
+    from trading_info import TradingIndicators
+    import main
+
+    symbol = simulator.trades[0]['s']
+    events = {CANDLE_CLOSED: [], INDICATORS_UPDATED: []}
+
+    def collect(topic):
+        subscription = bus.subscribe(topic)
+        while True:
+            for payload in subscription.get_all(timeout=1):
+                events[topic].append((time.perf_counter(), payload))
+
+    for topic in events:
+        threading.Thread(target=collect, args=(topic,), daemon=True).start()
+
+    ohlcv = BinanceWebSocket_ohlcv(symbol=symbol.lower(), data_file=candle_file(symbol), legacy_json=None,
+                                   drain_interval=drain_interval)
+    ohlcv.start()
+    indicators = TradingIndicators(candle_file(symbol), symbol=symbol)
+    threading.Thread(target=indicators.run, daemon=True).start()
+    main.start_account_stream()
+    main.start_price_stream(symbol.lower())
+    main.start_order_book(symbol.lower())
+    threading.Thread(target=main.check_and_execute, args=(bus.subscribe(INDICATORS_UPDATED), (symbol,)),
+                     daemon=True).start()
+
+    while not simulator.has_subscriber(f"{symbol.lower()}@trade"):
+        time.sleep(0.05)
+    simulator.start_replay()
+    simulator.finished.wait()
+    time.sleep(settle)  # 마지막 캔들/지표/주문이 나올 시간
+    ohlcv.stop()
+
+    # 체결 -> 캔들
+    interval, grace = ohlcv.aggregator.interval, ohlcv.aggregator.grace
+    candle_latency = []
+    candle_ready = []
+    for published, candle in events[CANDLE_CLOSED]:
+        due = kst_to_epoch_ms(candle['timestamp']) + interval + grace
+        if speed:
+            ready = simulator.replay_started + (due - simulator.shift - simulator.first_time) / 1000 / speed
+        else:
+            index = bisect.bisect_left(simulator.sent_times, due)
+            if index >= len(simulator.sent_at):
+                continue
+            ready = simulator.sent_at[index]
+        candle_ready.append((published, ready))
+        candle_latency.append(published - ready)
+
+    def latest_before(items, moment):
+        index = bisect.bisect_right([item[0] for item in items], moment) - 1
+        return items[index] if index >= 0 else None
+
+    # 캔들 -> 신호, 신호 -> 주문, 체결 -> 주문
+    signal_latency, order_latency, end_to_end = [], [], []
+    for published, _ in events[INDICATORS_UPDATED]:
+        candle = latest_before(candle_ready, published)
+        if candle:
+            signal_latency.append(published - candle[0])
+    for received, *_ in simulator.order_log:
+        update = latest_before(events[INDICATORS_UPDATED], received)
+        if update is None:
+            continue
+        order_latency.append(received - update[0])
+        candle = latest_before(candle_ready, update[0])
+        if candle:
+            end_to_end.append(received - candle[1])
+
+    elapsed = simulator.replay_finished - simulator.replay_started
+    print(f"\n📊 체결 {len(simulator.trades):,}개 재생 {elapsed:.2f}초, 수집 {ohlcv.trades.head:,}개 "
+          f"({ohlcv.trades.head / max(elapsed, 1e-9):,.0f} ticks/s, 버림 {ohlcv.trades.dropped})")
+    print(f"   캔들 {len(events[CANDLE_CLOSED])}개, 지표 갱신 {len(events[INDICATORS_UPDATED])}회, 주문 {len(simulator.order_log)}건")
+    print(f"   체결 -> 캔들 : {_percentiles(candle_latency)}")
+    print(f"   캔들 -> 신호 : {_percentiles(signal_latency)}")
+    print(f"   신호 -> 주문 : {_percentiles(order_latency)}")
+    print(f"   체결 -> 주문 : {_percentiles(end_to_end)}")
+
+
+if __name__ == "__main__":
+    # 사용법: python exchange_sim.py [녹화파일] [--speed N] [--port P] [--bench]
+    #   녹화파일: 한 줄에 @trade 메시지 하나 (없으면 합성 체결)
+    #   --speed 0 이면 최대 속도, --bench 면 파이프라인을 붙여 지연 측정
+    args = os.sys.argv[1:]
+
+    def option(name, default):
+        return type(default)(args[args.index(name) + 1]) if name in args else default
+
+    speed = option("--speed", 1.0)
+    port = option("--port", 8765)
+    if "--bench" in args:
+        use_simulator(port)
+
+    from bench_ingest import load_messages, synthetic_messages
+    paths = [arg for i, arg in enumerate(args) if not arg.startswith("--") and (i == 0 or not args[i - 1].startswith("--"))]
+    messages = load_messages(paths[0]) if paths else synthetic_messages(200_000)
+
+    if "--bench" in args:
+        bench(messages, speed=speed, port=port)
+        os._exit(0)
+    simulator = ExchangeSimulator(messages, speed=speed, port=port)
+    simulator.start()
+    print(f"BINANCE_FAPI_URL=http://127.0.0.1:{port} BINANCE_STREAM_URL=ws://127.0.0.1:{port} 로 연결하면 재생을 시작합니다.")
+    while not simulator.subscribers:
+        time.sleep(0.1)
+    simulator.start_replay()
+    simulator.finished.wait()
+    time.sleep(1)
@@ -0,0 +1,217 @@
+import threading
+import time
+
+from binance.exceptions import BinanceAPIException
+
+from rest_scheduler import RateLimitExceeded
+
+# 주문 상태 순서. 스트림/응답/조회가 뒤섞여 와도 앞 단계로 되돌리지 않는다
+RANKS = {"PENDING": 0, "UNKNOWN": 0, "NEW": 1, "PARTIALLY_FILLED": 2,
+         "FILLED": 3, "CANCELED": 3, "EXPIRED": 3, "REJECTED": 3, "LOST": 3}
+TERMINAL = ("FILLED", "CANCELED", "EXPIRED", "REJECTED", "LOST")
+RETRYABLE = ("CANCELED", "EXPIRED", "REJECTED", "LOST")  # 체결 없이 끝나 같은 의도로 다시 보낼 수 있는 상태
+UNKNOWN_CODES = (-1007,)  # 거래소도 처리 결과를 모른다고 답한 오류 (Timeout waiting for response from backend server)
+NOT_FOUND_CODE = -2013
+RECV_WINDOW = 5  # 초. 이보다 오래된 요청은 거래소가 받지 않으므로, 그 뒤에도 조회되지 않는 주문은 나가지 않은 것
+KEEP_SECONDS = 3600  # 끝난 주문 상태를 중복 확인용으로 들고 있는 시간
+
+
+def filled(record):
+    """ 끝났고 일부라도 체결된 주문인지 (시장가가 일부만 체결되고 만료된 경우 포함) """
+    return record['status'] in TERMINAL and float(record['executedQty']) > 0
+
+
+class OrderPending(Exception):
+    """ 같은 심볼에 결과를 아직 모르는 주문이 있어 새 주문을 보내지 않음 (record: 그 주문의 상태 dict) """
+    def __init__(self, message, record=None):
+        super().__init__(message)
+        self.record = record
+
+
+class OrderExecutor:
+    """ 시장가 주문을 한 번만 나가게 하는 실행 계층
+
+    - 주문 의도(진입/청산, 심볼, 신호 캔들, 방향)로 newClientOrderId 를 정하므로 같은 신호로 두 번 부르면
+      두 번째는 보내지 않고 첫 주문의 상태를 돌려준다 ('duplicate': True).
+      체결 없이 끝난 주문(거절/취소/만료/유실)만 같은 의도로 다시 보낼 수 있고, 그때는 _1, _2 ... 를 붙인다.
+    - 전송 중 타임아웃/연결 오류면 다시 보내지 않고 UNKNOWN 으로 두고 clientOrderId 로 조회한다.
+      RECV_WINDOW 가 지나도 거래소에 없으면 LOST (나가지 않음) 로 끝낸다.
+    - 같은 심볼에 결과를 모르는 주문이 남아 있으면 새 주문은 OrderPending 으로 막는다.
+    - 체결 확인은 user-data 스트림(on_order_update)을 confirm_timeout 초 기다리고, 없으면 심볼별 allOrders 한 번으로.
+
+    REST 를 직접 부르는 submit/resolve 는 동기 Client 용이고, async_trading 은 prepare/on_response/on_error/
+    on_lookup/on_orders 를 자기 AsyncClient 호출과 조합해 같은 상태를 쓴다.
+    """
+    def __init__(self, client, confirm_timeout=3.0):
+        self.client = client
+        self.confirm_timeout = confirm_timeout
+        self.cond = threading.Condition()
+        self.orders = {}  # clientOrderId -> 주문 상태 dict
+
+    @staticmethod
+    def intent_id(kind, symbol, key, side):
+        """ 의도별 clientOrderId (거래소 제한 36자 안: 'en_BTCUSDT_1700000000000_B') """
+        return f"{kind}_{symbol}_{key}_{side[0]}"
+
+    def get(self, client_order_id):
+        with self.cond:
+            record = self.orders.get(client_order_id)
+            return dict(record) if record else None
+
+    def unresolved(self, symbol):
+        """ 결과를 아직 모르는(끝나지 않은) 주문 목록 """
+        with self.cond:
+            return [dict(record) for record in self.orders.values()
+                    if record['symbol'] == symbol and record['status'] not in TERMINAL]
+
+    # ---------- 상태 전이 ----------
+    def prepare(self, kind, symbol, side, quantity, key, **params):
+        """ (상태 dict, futures_create_order 인자). 같은 의도가 이미 나갔으면 (그 상태, None) """
+        base = self.intent_id(kind, symbol, key, side)
+        with self.cond:
+            expired = time.time() - KEEP_SECONDS
+            for client_order_id in [cid for cid, record in self.orders.items()
+                                    if record['status'] in TERMINAL and record['sent_at'] < expired]:
+                del self.orders[client_order_id]
+            attempt, client_order_id = 0, base
+            while client_order_id in self.orders and self.orders[client_order_id]['status'] in RETRYABLE:
+                attempt += 1
+                client_order_id = f"{base}_{attempt}"
+            if client_order_id in self.orders:
+                return dict(self.orders[client_order_id], duplicate=True), None
+            pending = next((record for record in self.orders.values()
+                            if record['symbol'] == symbol and record['status'] not in TERMINAL), None)
+            if pending is not None:
+                raise OrderPending(f"{symbol} 에 결과를 모르는 주문이 있어 새 주문을 보내지 않습니다.", dict(pending))
+            record = {"clientOrderId": client_order_id, "symbol": symbol, "side": side, "quantity": quantity,
+                      "status": "PENDING", "orderId": None, "executedQty": 0.0, "avgPrice": 0.0,
+                      "sent_at": time.time(), "error": None}
+            self.orders[client_order_id] = record
+        order_params = {"symbol": symbol, "side": side, "type": 'MARKET', "quantity": quantity,
+                        "newClientOrderId": client_order_id, "newOrderRespType": 'RESULT', **params}
+        return dict(record), order_params
+
+    def _apply(self, client_order_id, status, executed=None, average=None, order_id=None):
+        with self.cond:
+            record = self.orders.get(client_order_id)
+            if record is None or RANKS.get(status, 0) < RANKS[record['status']]:
+                return
+            if record['status'] in TERMINAL and status != record['status']:
+                return
+            record['status'] = status
+            if executed is not None:
+                record['executedQty'] = max(record['executedQty'], float(executed))
+            if average and float(average):
+                record['avgPrice'] = float(average)
+            if order_id is not None:
+                record['orderId'] = order_id
+            self.cond.notify_all()
+
+    def on_response(self, client_order_id, response):
+        """ 주문/조회 REST 응답 """
+        self._apply(client_order_id, response.get('status', 'NEW'), response.get('executedQty'),
+                    response.get('avgPrice'), response.get('orderId'))
+
+    def on_error(self, client_order_id, error):
+        """ 주문 요청 실패. 거래소가 거절했거나 보내지 않았으면 REJECTED, 전송 결과를 모르면 UNKNOWN. 조회가 필요하면 True """
+        definite = isinstance(error, RateLimitExceeded) or (
+            isinstance(error, BinanceAPIException) and error.code not in UNKNOWN_CODES and error.status_code < 500)
+        with self.cond:
+            record = self.orders.get(client_order_id)
+            if record is not None:
+                record['error'] = repr(error)
+        self._apply(client_order_id, "REJECTED" if definite else "UNKNOWN")
+        return not definite
+
+    def on_lookup(self, client_order_id, order=None, error=None):
+        """ clientOrderId 조회 결과. 없다는 답이 RECV_WINDOW 이후면 나가지 않은 주문으로 끝냄 """
+        if order is not None:
+            self.on_response(client_order_id, order)
+        elif isinstance(error, BinanceAPIException) and error.code == NOT_FOUND_CODE:
+            record = self.get(client_order_id)
+            if record and time.time() - record['sent_at'] > RECV_WINDOW:
+                self._apply(client_order_id, "LOST")
+
+    def on_orders(self, symbol, orders):
+        """ 심볼의 allOrders 조회 결과로 끝나지 않은 주문을 한꺼번에 맞춤 """
+        found = {order.get('clientOrderId'): order for order in orders}
+        for record in self.unresolved(symbol):
+            order = found.get(record['clientOrderId'])
+            if order is not None:
+                self.on_response(record['clientOrderId'], order)
+            elif time.time() - record['sent_at'] > RECV_WINDOW:
+                self._apply(record['clientOrderId'], "LOST")
+
+    def on_order_update(self, order):
+        """ user-data 스트림 ORDER_TRADE_UPDATE 콜백 (웹소켓 스레드) """
+        self._apply(order['c'], order['X'], order.get('z'), order.get('ap'), order.get('i'))
+
+    def wait(self, client_order_id, timeout):
+        """ 주문이 끝날 때까지 최대 timeout 초 기다린 뒤의 상태 """
+        with self.cond:
+            self.cond.wait_for(lambda: self.orders[client_order_id]['status'] in TERMINAL, timeout)
+            return dict(self.orders[client_order_id])
+
+    def since(self, symbol):
+        """ 끝나지 않은 주문을 allOrders 로 찾을 때의 startTime (ms). 없으면 None """
+        records = self.unresolved(symbol)
+        if not records:
+            return None
+        return int(min(record['sent_at'] for record in records) * 1000) - 1000
+
+    # ---------- 동기 Client ----------
+    def lookup(self, client_order_id):
+        record = self.get(client_order_id)
+        try:
+            order = self.client.futures_get_order(symbol=record['symbol'], origClientOrderId=client_order_id)
+        except BinanceAPIException as e:
+            self.on_lookup(client_order_id, error=e)
+        except Exception as e:
+            print(f"⚠️ 주문 조회 실패 {client_order_id}: {e}")
+        else:
+            self.on_lookup(client_order_id, order)
+
+    def resolve(self, symbol):
+        """ 결과를 모르는 주문들을 allOrders 한 번으로 확인 """
+        start = self.since(symbol)
+        if start is None:
+            return
+        try:
+            self.on_orders(symbol, self.client.futures_get_all_orders(symbol=symbol, startTime=start))
+        except Exception as e:
+            print(f"⚠️ {symbol} 주문 확인 실패: {e}")
+
+    def submit(self, kind, symbol, side, quantity, key, **params):
+        """ 시장가 주문을 한 번만 보내고 체결 확인까지 한 상태 dict 를 돌려줌 (거래소가 거절하면 그 예외)
+
+        결과를 끝내 모르면 status 가 UNKNOWN 인 채로 돌려주고, 다음 호출에서 다시 확인한다.
+        확인한 뒤에도 같은 심볼에 결과를 모르는 주문이 남아 있으면 보내지 않고 그 주문의 상태를 돌려준다.
+        """
+        try:
+            record, order_params = self.prepare(kind, symbol, side, quantity, key, **params)
+        except OrderPending:
+            record, order_params = None, None
+        if record is None or (order_params is None and record['status'] not in TERMINAL):
+            # 결과를 모르는 주문부터 확인 (유실로 확인되면 같은 의도를 다시 보낼 수 있음)
+            self.resolve(symbol)
+            try:
+                record, order_params = self.prepare(kind, symbol, side, quantity, key, **params)
+            except OrderPending as e:
+                return e.record
+        if order_params is None:
+            return record
+
+        client_order_id = record['clientOrderId']
+        try:
+            self.on_response(client_order_id, self.client.futures_create_order(**order_params))
+        except Exception as e:
+            if not self.on_error(client_order_id, e):
+                raise
+            print(f"⚠️ {symbol} 주문 전송 결과를 모릅니다. 다시 보내지 않고 조회합니다: {e}")
+            self.lookup(client_order_id)
+
+        record = self.wait(client_order_id, self.confirm_timeout)
+        if record['status'] not in TERMINAL:
+            self.resolve(symbol)
+            record = self.get(client_order_id)
+        return record
@@ -1,8 +1,18 @@
-import json
 import time
 from binance.client import Client
 from dotenv import load_dotenv
 import os
+from shared_state import SharedIndicators, LayoutChanged, shared_file
+from user_stream import BinanceUserStream
+from price_cache import prices, BinancePriceStream, PNL_SOURCES, SIZING_SOURCES
+from endpoints import FAPI_URL, DEFAULT_FAPI_URL
+from metrics import metrics
+from exchange_info import ExchangeInfo, round_step
+from protective_orders import ProtectiveOrders
+from execution import OrderExecutor, filled
+from rest_scheduler import scheduler
+from order_book import OrderBook
+from decimal import ROUND_UP
 
 # .env 파일 로드
 load_dotenv()
@@ -11,148 +21,345 @@ load_dotenv()
 BINANCE_API_KEY = os.getenv("BIN_API_KEY")
 BINANCE_API_SECRET = os.getenv("BIN_SEC_KEY")
 
-client = Client(BINANCE_API_KEY, BINANCE_API_SECRET)
+# BINANCE_FAPI_URL 을 바꾸면(로컬 시뮬레이터 등) 현물 API ping 없이 그 주소로 선물 요청을 보냄
+client = Client(BINANCE_API_KEY, BINANCE_API_SECRET, ping=FAPI_URL == DEFAULT_FAPI_URL)
+client.FUTURES_URL = FAPI_URL + "/fapi"
 
+# 주문 경로에서 쓰는 REST 호출은 엔드포인트별 지연을 기록하고, 요청 가중치 한도 안에서 주문을 먼저 보내도록 감쌈
+REST_METHODS = ("futures_account_balance", "futures_symbol_ticker", "futures_position_information",
+                "futures_change_leverage", "futures_create_order", "futures_exchange_info", "futures_symbol_config",
+                "futures_cancel_order", "futures_get_open_orders", "futures_get_order", "futures_get_all_orders",
+                "futures_order_book")
 
 
-def open_Position():
-    # 현재 잔고 가져오기
-    balance = float([x for x in client.futures_account_balance() if x['asset'] == 'USDT'][0]['balance'])
-    
-    # 사용할 금액 = 잔고의 90%
-    amount_to_use = balance * 0.9
-    
-    # 현재 가격 가져오기
-    current_price = float(client.futures_symbol_ticker(symbol='BTCUSDT')['price'])
-    
-    # 레버리지
-    leverage = 75
-    client.futures_change_leverage(symbol='BTCUSDT', leverage=leverage)
+def _timed(name, method):
+    def call(**params):
+        with metrics.span("rest_seconds", endpoint=name):
+            return method(**params)
+    return call
+
+
+for _name in REST_METHODS:
+    setattr(client, _name, _timed(_name, getattr(client, _name)))
+rest = scheduler.install(REST_METHODS, client)
+
+# 진입/청산 규칙 (동기 루프와 async_trading 이 같이 사용)
+LEVERAGE = 75
+TAKE_PROFIT_RATE = 11.8  # 레버리지 적용 손익률(%)이 이 이상이면 익절
+STOP_LOSS_RATE = -9.25   # 이 이하이면 손절
+MIN_NOTIONAL = 100       # 거래소 필터를 모를 때만 쓰는 최소 명목가
+SLIPPAGE_BUDGET_BPS = 5  # 호가창 기준 예상 평균 체결가가 최우선 호가보다 이만큼(bp) 넘게 불리하지 않도록 진입 수량을 줄임
+
+# 캔들 간격 (ohlcv_update 의 10초 캔들). 신호를 만든 캔들이 끝난 시각부터 주문까지의 지연 측정에 사용
+CANDLE_INTERVAL_MS = 10_000
+_recorded_candles = {}  # 심볼 -> 주문 지연을 마지막으로 기록한 신호 캔들 시작 시각 (ms)
+
+# user-data 스트림 기반 포지션/잔고 캐시 (start_account_stream 으로 시작)
+account = None
+
+# 심볼별 주문 필터(수량 단위, 최소 명목가)와 현재 레버리지 캐시
+exchange = ExchangeInfo(client)
+
+# 진입할 때 거는 거래소 익절/손절 주문 (체결/취소는 user-data 스트림으로 받음)
+protective = ProtectiveOrders(client)
+
+# 진입/청산 시장가 주문 상태 (같은 신호로 두 번 주문하지 않도록)
+executor = OrderExecutor(client)
+
+# 심볼별 로컬 호가창 (start_order_book 으로 시작). 진입 수량을 슬리피지 예산 안으로 제한하는 데 사용
+books = {}
+
+
+def start_account_stream():
+    global account
+    account = BinanceUserStream(client)
+    # 다른 곳(웹/앱)에서 레버리지를 바꿔도 캐시가 맞도록
+    account.add_config_listener(exchange.record_leverage)
+    account.add_algo_listener(protective.on_algo_update)
+    account.add_listener(executor.on_order_update)
+    account.start()
+    return account
+
+
+def start_exchange_info():
+    exchange.start()
+    return exchange
+
+
+def get_balance(asset='USDT'):
+    # 스트림 캐시가 동기화된 상태면 캐시를, 아니면 REST 를 사용
+    if account is not None and account.synced:
+        balance = account.get_balance(asset)
+        if balance is not None:
+            return balance
+    return float([x for x in client.futures_account_balance() if x['asset'] == asset][0]['balance'])
+
+
+def start_price_stream(symbols='btcusdt'):
+    # 체결 스트림이 없는 프로세스에서 markPrice/bookTicker 로 가격 캐시를 채움
+    stream = BinancePriceStream(prices, symbols)
+    stream.start()
+    return stream
+
+
+def start_order_book(symbols='btcusdt'):
+    # 심볼마다 깊이 스냅샷 + @depth@100ms diff 로 로컬 호가창을 유지
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    for symbol in symbols:
+        if symbol.upper() not in books:
+            books[symbol.upper()] = OrderBook(client, symbol).start()
+    return books
+
+
+def get_current_price(symbol='BTCUSDT', max_age=2.0, sources=SIZING_SOURCES):
+    # 캐시된 가격이 max_age 초 이내면 그대로 쓰고, 오래됐을 때만 REST 조회 (sources: 용도별 가격 소스 순서)
+    price = prices.latest(symbol, max_age, sources)
+    if price is None:
+        price = float(client.futures_symbol_ticker(symbol=symbol)['price'])
+        prices.update(symbol, price, 'rest')
+    return price
+
+
+def get_position(symbol='BTCUSDT'):
+    if account is not None and account.synced:
+        return account.get_position(symbol)
+    positions = client.futures_position_information(symbol=symbol)
+    return next((pos for pos in positions if pos['symbol'] == symbol), None)
+
+
+
+def signal_key(symbol, candle_ms=None):
+    """ 주문 의도 키: 신호를 만든 캔들의 시작 시각 (모르면 지금 캔들). 같은 캔들에서는 진입/청산을 한 번씩만 보냄 """
+    return candle_ms or int(time.time() * 1000) // CANDLE_INTERVAL_MS * CANDLE_INTERVAL_MS
+
+
+def record_tick_to_order(symbol, candle_ms):
+    """ 신호를 만든 캔들 마감(거래소 시각) -> 주문 응답까지의 지연 기록 (캔들 하나당 한 번) """
+    if candle_ms and _recorded_candles.get(symbol) != candle_ms:
+        _recorded_candles[symbol] = candle_ms
+        metrics.observe("tick_to_order_seconds", time.time() - (candle_ms + CANDLE_INTERVAL_MS) / 1000, symbol=symbol)
+
+
+def order_quantity(balance, current_price, allocation=1.0, leverage=LEVERAGE, filters=None):
+    """ 잔고의 90% (여러 심볼이면 배분 비율만큼) 에 레버리지를 적용한 주문 수량
+
+    filters(ExchangeInfo.filters) 가 있으면 시장가 수량 단위로 내림하고, 거래소 최소 명목가(수량 x 가격)를 맞춘다.
+    """
+    amount_to_use = balance * 0.9 * allocation
+
+    if filters is not None:
+        step = filters['market_step_size']
+        quantity = min(round_step(amount_to_use * leverage / current_price, step), filters['max_market_qty'])
+        if quantity * current_price < filters['min_notional'] or quantity < filters['min_qty']:
+            # 최소 명목가를 넘는 가장 작은 수량으로 올림
+            quantity = max(round_step(filters['min_notional'] / current_price, step, ROUND_UP), filters['min_qty'])
+            print(f"수량이 너무 적어서 명목 가치를 {filters['min_notional']} USDT 이상으로 맞췄습니다. 새로운 수량: {quantity}")
+        return quantity
 
     # 레버리지를 적용한 금액으로 수량 계산 (소수점 3자리로 반올림 → 최소 거래 단위 맞춤)
     quantity = round(amount_to_use * leverage / current_price, 3)
 
     # 명목 가치 계산 (레버리지 적용)
     notional_value = current_price * quantity * leverage
-    
+
     # 명목 가치가 100 USDT 미만이면 최소 100 USDT에 해당하는 수량으로 변경
-    if notional_value < 100:
+    if notional_value < MIN_NOTIONAL:
         # 최소 명목 가치를 100 USDT로 설정하여 수량 조정
-        quantity = round(100 / (current_price * leverage), 3)
-        print(f"수량이 너무 적어서 명목 가치를 100 USDT 이상으로 맞췄습니다. 새로운 수량: {quantity} BTC")
+        quantity = round(MIN_NOTIONAL / (current_price * leverage), 3)
+        print(f"수량이 너무 적어서 명목 가치를 100 USDT 이상으로 맞췄습니다. 새로운 수량: {quantity}")
+    return quantity
+
+
+def depth_limited_quantity(symbol, side, quantity, filters=None):
+    """ 호가창에서 예상 평균 체결가가 SLIPPAGE_BUDGET_BPS 안에 드는 수량까지만 (호가창이 준비되지 않았으면 그대로)
+
+    수량 단위로 내림하므로 거래소 최소 명목가보다 작아질 수 있다 (호출한 쪽이 진입을 건너뜀).
+    """
+    book = books.get(symbol)
+    if book is None or not book.ready():
+        return quantity
+    limit = book.max_quantity(side, SLIPPAGE_BUDGET_BPS)
+    if limit is None or limit >= quantity:
+        return quantity
+    capped = round_step(limit, filters['market_step_size'] if filters else 0.001)
+    average, _ = book.estimate_fill_price(side, capped)
+    print(f"📉 {symbol} 호가가 얇아 진입 수량을 {quantity} -> {capped} 로 줄였습니다 (예상 평균 체결가 {average}).")
+    return capped
+
+
+def below_min_notional(quantity, current_price, filters=None):
+    if filters is not None:
+        return quantity < filters['min_qty'] or quantity * current_price < filters['min_notional']
+    return quantity * current_price < MIN_NOTIONAL
+
+
+def profit_rate(position_size, entry_price, current_price, leverage=LEVERAGE):
+    """ 레버리지를 적용한 포지션 손익률(%). 진입 가격이 0이면 None """
+    # 포지션의 미실현 손익 (스트림은 가격 변동마다 손익을 보내지 않으므로 현재가로 계산)
+    unrealized_profit = (current_price - entry_price) * position_size
+    # 레버리지 적용 후 실제 투자 금액
+    entry_value = entry_price * position_size / leverage
+    if entry_value == 0:
+        return None
+    # 손익 비율 계산: (미실현 손익 / 실제 투자 금액) * 100
+    if position_size > 0:  # LONG 포지션
+        return (unrealized_profit / entry_value) * 100
+    return (-unrealized_profit / entry_value) * 100  # SHORT은 반대로 계산
+
+
+def is_reversal(position_size, final_signal):
+    """ 현재 포지션과 반대 방향 신호인지 """
+    return (position_size > 0 and final_signal == "SHORT") or (position_size < 0 and final_signal == "LONG")
+
+
+def exit_reason(position_size, rate, final_signal):
+    """ 청산 사유 ('take_profit' / 'reverse' / 'stop_loss'), 유지하면 None (익절 > 반대 신호 > 손절 순) """
+    if rate >= TAKE_PROFIT_RATE:
+        return "take_profit"
+    if is_reversal(position_size, final_signal):
+        return "reverse"
+    if rate <= STOP_LOSS_RATE:
+        return "stop_loss"
+    return None
+
+
+EXIT_MESSAGES = {
+    "take_profit": f"📈 손익 +{TAKE_PROFIT_RATE}% 이상: 포지션을 클로즈합니다.",
+    "reverse": "📈 현재 포지션과 반대 진입명령이 나왔습니다. : 포지션을 클로즈합니다.",
+    "stop_loss": f"📉 손익 {STOP_LOSS_RATE}% 이하: 포지션을 클로즈합니다.",
+}
+
+
+def protect_position(symbol, side, quantity, order, fallback_price):
+    """ 진입 체결가 기준으로 손익률 임계값에서 발동하는 거래소 익절/손절 주문을 걸음. 둘 다 걸렸으면 True """
+    entry_price = float(order.get('avgPrice') or 0) or fallback_price
+    quantity = float(order.get('executedQty') or 0) or quantity
+    filters = exchange.filters(symbol)
+    return protective.place(symbol, side, quantity, entry_price, LEVERAGE, TAKE_PROFIT_RATE, STOP_LOSS_RATE,
+                            filters['tick_size'] if filters else 0)
+
+
+def ensure_protection(symbol, position_size, entry_price):
+    """ 보호 주문 없이 들고 있는 포지션(재시작 등)이면 거래소의 미체결 보호 주문을 찾고, 없으면 새로 걸음 (심볼당 한 번)
+
+    보호 주문이 걸려 있으면 True. 실패하면 False 로 두고 매매 루프가 손익률을 직접 확인한다.
+    """
+    if not protective.needs_check(symbol):
+        return protective.protected(symbol)
+    try:
+        if protective.adopt(symbol, client.futures_get_open_orders(symbol=symbol, conditional=True)):
+            return True
+        side = 1 if position_size > 0 else -1
+        return protect_position(symbol, side, abs(position_size), {}, entry_price)
+    except Exception as e:
+        protective.mark_checked(symbol)
+        print(f"⚠️ {symbol} 보호 주문 확인 실패: {e}")
+        return False
 
-    
-    final_signal = get_final_signal()
-    
-    if final_signal == "LONG":
-        order = client.futures_create_order(
-            symbol='BTCUSDT',
-            side='BUY',
-            type='MARKET',
-            quantity=quantity
-        )
-        print(f"✅ LONG 진입: {quantity} BTC at {current_price} USDT")
-        return order
-    
-    elif final_signal == "SHORT":
-        order = client.futures_create_order(
-            symbol='BTCUSDT',
-            side='SELL',
-            type='MARKET',
-            quantity=quantity
-        )
-        print(f"✅ Short 진입: {quantity} BTC at {current_price} USDT")
-        return order
-    
-    else:
-        print(f"🟡 HOLD 상태 유지")
 
+def open_Position(final_signal=None, symbol='BTCUSDT', allocation=1.0, candle_ms=None):
+    # 신호가 주어지지 않으면 공유 메모리에서 새 지표가 나올 때까지(최대 15초) 기다려 판단
+    if final_signal is None:
+        final_signal = get_final_signal(symbol=symbol, timeout=15)
+        candle_ms = signal_candle(symbol)
 
+    if final_signal not in ("LONG", "SHORT"):
+        print(f"🟡 HOLD 상태 유지")
+        return
 
-def close_position():
+    # 현재 잔고 가져오기
+    balance = get_balance('USDT')
+    
+    # 현재 가격 가져오기
+    current_price = get_current_price(symbol)
+    
+    # 레버리지 (이미 맞춰져 있으면 요청하지 않음)
+    exchange.ensure_leverage(symbol, LEVERAGE)
+
+    # 사용할 금액 = 잔고의 90% (여러 심볼을 돌릴 때는 심볼별 배분 비율만큼), 수량 단위는 거래소 필터 기준
+    filters = exchange.filters(symbol)
+    quantity = order_quantity(balance, current_price, allocation, filters=filters)
+
+    # 호가창 깊이로 슬리피지 예산 안의 수량까지만
+    side = 'BUY' if final_signal == "LONG" else 'SELL'
+    quantity = depth_limited_quantity(symbol, side, quantity, filters)
+    if below_min_notional(quantity, current_price, filters):
+        print(f"🟡 {symbol} 호가가 얇아 최소 주문 금액 안에서 슬리피지 예산을 맞출 수 없어 진입하지 않습니다.")
+        return None
+
+    # 체결가(avgPrice)를 받아 보호 주문 가격 계산에 사용. 전송 결과를 모르면 다시 보내지 않고 조회
+    order = executor.submit("en", symbol, side, quantity, signal_key(symbol, candle_ms))
+    record_tick_to_order(symbol, candle_ms)
+    if order.get('duplicate'):
+        print(f"🟡 {symbol} 같은 신호의 진입 주문이 이미 나갔습니다 ({order['status']}).")
+        return None
+    if not filled(order):
+        print(f"⚠️ {symbol} 진입 주문 체결을 확인하지 못했습니다 ({order['status']}). 다음 확인 때 다시 봅니다.")
+        protective.forget(symbol)  # 나중에 체결된 것으로 확인되면 close_position 이 보호 주문을 검
+        return None
+
+    protect_position(symbol, 1 if side == 'BUY' else -1, quantity, order, current_price)
+    print(f"✅ {'LONG' if side == 'BUY' else 'Short'} 진입: {order['executedQty']} {symbol} at {order['avgPrice'] or current_price} USDT")
+    return order
+
+
+
+def close_position(final_signal=None, symbol='BTCUSDT', candle_ms=None):
     try:
         # 현재 포지션 정보 가져오기
-        positions = client.futures_position_information(symbol='BTCUSDT')
-        
-        # BTCUSDT 포지션 찾기
-        btc_position = next((pos for pos in positions if pos['symbol'] == 'BTCUSDT'), None)
+        btc_position = get_position(symbol)
 
         if btc_position:
-            # 포지션의 미실현 손익
-            unrealized_profit = float(btc_position['unRealizedProfit'])
-            
             # 현재 포지션 수량
             position_size = float(btc_position['positionAmt'])
-            
-            # 레버리지 정보 가져오기
-            leverage = 75
 
             if position_size != 0:
                 # 포지션 진입 가격
                 entry_price = float(btc_position['entryPrice'])
-                
-                # 현재 가격 가져오기
-                current_price = float(client.futures_symbol_ticker(symbol='BTCUSDT')['price'])
-                
-                # 레버리지 적용 후 실제 투자 금액
-                entry_value = entry_price * position_size / leverage
-                
-                # 손익 비율 계산: (미실현 손익 / 실제 투자 금액) * 100
-                if entry_value == 0:
-                    print("⚠️ 진입 가격이 0입니다. 손익 비율 계산을 할 수 없습니다.")
-                    return
-                
-                if position_size > 0:  # LONG 포지션
-                    profit_rate = (unrealized_profit / entry_value) * 100
-                else:  # SHORT 포지션
-                    profit_rate = (-unrealized_profit / entry_value) * 100  # SHORT은 반대로 계산
-
-                final_signal = get_final_signal()
-                
-                print(f"현재 손익: {unrealized_profit} USDT, 손익 비율: {profit_rate:.2f}%")
-                
-                # +5% 이상 또는 -2.5% 이하일 경우 포지션 클로즈
-                if profit_rate >= 11.8 :
-                    print("📈 손익 +11.8% 이상: 포지션을 클로즈합니다.")
-                    # 포지션 클로즈 (매도)
-                    order = client.futures_create_order(
-                        symbol='BTCUSDT',
-                        side='SELL' if position_size > 0 else 'BUY',  # LONG이면 'SELL', SHORT이면 'BUY'
-                        type='MARKET',
-                        quantity=abs(position_size)
-                    )
-                    print(f"✅ 포지션 클로즈: {abs(position_size)} BTC")
-                    return order
-                
-                elif (position_size > 0 and final_signal == "SHORT") or (position_size < 0 and final_signal == "LONG"):
-                    print("📈 현재 포지션과 반대 진입명령이 나왔습니다. : 포지션을 클로즈합니다.")
-                    # 포지션 클로즈 (매도)
-                    order = client.futures_create_order(
-                        symbol='BTCUSDT',
-                        side='SELL' if position_size > 0 else 'BUY',  # LONG이면 'SELL', SHORT이면 'BUY'
-                        type='MARKET',
-                        quantity=abs(position_size)
-                    )
-                    print(f"✅ 포지션 클로즈: {abs(position_size)} BTC")
-                    return order
 
-                elif profit_rate <= -9.25 :
-                    print("📉 손익 -9.25% 이하: 포지션을 클로즈합니다.")
-                    # 포지션 클로즈 (매도)
-                    order = client.futures_create_order(
-                        symbol='BTCUSDT',
-                        side='SELL' if position_size > 0 else 'BUY',  # LONG이면 'SELL', SHORT이면 'BUY'
-                        type='MARKET',
-                        quantity=abs(position_size)
-                    )
-                    print(f"✅ 포지션 클로즈: {abs(position_size)} BTC")
+                if ensure_protection(symbol, position_size, entry_price):
+                    # 익절/손절은 거래소 보호 주문이 맡으므로 새 지표가 나오면 반대 신호만 확인
+                    if final_signal is None:
+                        final_signal = get_final_signal(symbol=symbol, timeout=15)
+                        candle_ms = signal_candle(symbol)
+                    reason = "reverse" if is_reversal(position_size, final_signal) else None
+                else:
+                    # 현재 가격 가져오기 (손익률은 mark price 기준)
+                    current_price = get_current_price(symbol, sources=PNL_SOURCES)
+
+                    rate = profit_rate(position_size, entry_price, current_price)
+                    if rate is None:
+                        print("⚠️ 진입 가격이 0입니다. 손익 비율 계산을 할 수 없습니다.")
+                        return
+
+                    if final_signal is None:
+                        final_signal = get_final_signal(symbol=symbol)
+                        candle_ms = signal_candle(symbol)
+
+                    unrealized_profit = (current_price - entry_price) * position_size
+                    print(f"현재 손익: {unrealized_profit} USDT, 손익 비율: {rate:.2f}%")
+
+                    # 익절 / 반대 신호 / 손절
+                    reason = exit_reason(position_size, rate, final_signal)
+
+                if reason:
+                    print(EXIT_MESSAGES[reason])
+                    # 보호 주문을 먼저 취소하고, 그사이 보호 주문이 발동해도 반대 포지션이 생기지 않도록 reduce-only 로 청산
+                    protective.cancel(symbol)
+                    order = executor.submit("ex", symbol, 'SELL' if position_size > 0 else 'BUY',  # LONG이면 'SELL', SHORT이면 'BUY'
+                                            abs(position_size), signal_key(symbol, candle_ms), reduceOnly='true')
+                    if order.get('duplicate') or not filled(order):
+                        print(f"🟡 {symbol} 청산 주문이 이미 나갔거나 체결을 확인하지 못했습니다 ({order['status']}).")
+                        return None
+                    print(f"✅ 포지션 클로즈: {order['executedQty']} {symbol}")
                     return order
                 else:
-                    print("🟡 손익 비율이 클로즈 조건을 만족하지 않습니다. 포지션을 유지합니다.")
+                    print("🟡 클로즈 조건을 만족하지 않습니다. 포지션을 유지합니다.")
             else:
                 print("포지션이 없습니다.")
         else:
-            print("BTCUSDT 포지션 없음")
+            print(f"{symbol} 포지션 없음")
 
     except Exception as e:
         print(f"⚠️ 오류 발생: {e}")
@@ -165,24 +372,24 @@ def close_position():
 
 
 
-# 📌 파일 로드 함수
-def load_data():
-    with open("Technical_indicators.json", 'r') as file:
-        data = json.load(file)
-    return data
+_shared = {}
+_last_signals = {}  # 심볼 -> (판단에 쓴 스냅샷 version, 스냅샷 마지막 캔들 시작 시각 ms, 신호)
 
-# 📌 실시간 가격 로드 함수 (가장 최신 값 사용)
-def get_realtime_price(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    latest_price = data[-1]['close']  # 가장 최신 값 사용
-    prev_price = data[-2]['close']  # 두 번째 최신 값 사용
-    return latest_price, prev_price
+# 📌 공유 메모리 지표 스냅샷 로드 (지표와 가격이 같은 시점 값)
+def load_shared(symbol='BTCUSDT', version=0, timeout=0):
+    """ version 보다 새 스냅샷을 timeout 초까지 기다려서 반환 (없으면 None) """
+    if symbol not in _shared:
+        _shared[symbol] = SharedIndicators(shared_file(symbol), readonly=True)
+    try:
+        return _shared[symbol].wait(version, timeout)
+    except LayoutChanged:
+        # 데이터 파이프라인이 다른 지표 목록으로 다시 시작함: 새 레이아웃으로 다시 엶
+        _shared[symbol] = SharedIndicators(shared_file(symbol), readonly=True)
+        return _shared[symbol].wait(version, timeout)
 
 # 📌 전략 1 로직
 def strategy_1(data, current_price):
     rsi = data['rsi'][0]
-    sma = data['sma'][0]
     macd = data['macd'][0]
 
     macd_last_15 = data['macd'][-15:]
@@ -228,45 +435,102 @@ def strategy_2(data, current_price, prev_price):
     return signal
 
 # 📌 최종 신호 판단
-def get_final_signal():
+def get_final_signal(data=None, prices=None, symbol='BTCUSDT', timeout=0):
+    # 이벤트로 받은 지표/가격이 있으면 그대로 쓰고, 없을 때만 공유 메모리에서 한 스냅샷으로 읽음
+    if data is None or prices is None:
+        # 마지막으로 판단한 것보다 새 스냅샷이 나올 때까지 최대 timeout 초 대기
+        version, _, signal = _last_signals.get(symbol, (0, None, None))
+        snapshot = load_shared(symbol, version, timeout)
+        if snapshot is None:
+            if signal is None:
+                raise RuntimeError(f"{symbol} 지표가 아직 기록되지 않았습니다.")
+            # 지표가 그대로면 다시 계산하지 않고 직전 신호를 사용
+            return signal
+        if data is None:
+            data = snapshot['indicators']
+        if prices is None:
+            prices = snapshot['prices']
+        version = snapshot['version']
+        candle_ms = int(snapshot['candles']['timestamp'][-1]) if len(snapshot['candles']['timestamp']) else None
+    else:
+        version = None
+    current_price, prev_price = prices
+
+    with metrics.span("signal_seconds", symbol=symbol):
+        # 전략 1과 전략 2에서 각각 신호를 받아옴
+        signal_1 = strategy_1(data, current_price)
+        signal_2 = strategy_2(data, current_price, prev_price)
+
+        # 매매 신호 결정
+        if (signal_1 == "long" and (signal_2 == "long" or "hold")) or ((signal_1 == "long" or "hold") and signal_2 == "long"):
+            final_signal = "LONG"
+        elif (signal_1 == "short" and (signal_2 == "short" or "hold")) or ((signal_1 == "short" or "hold") and signal_2 == "short"):
+            final_signal = "SHORT"
+        else:
+            final_signal = "HOLD"
 
-    data = load_data()
-    # 실시간 가격 가져오기
-    current_price, prev_price = get_realtime_price("1min_BTC_OHLCV.json")
+    if version is not None:
+        _last_signals[symbol] = (version, candle_ms, final_signal)
+    return final_signal
 
-    # 전략 1과 전략 2에서 각각 신호를 받아옴
-    signal_1 = strategy_1(data, current_price)
-    signal_2 = strategy_2(data, current_price, prev_price)
 
-    # 매매 신호 결정
-    if (signal_1 == "long" and (signal_2 == "long" or "hold")) or ((signal_1 == "long" or "hold") and signal_2 == "long"):
-        final_signal = "LONG"
-    elif (signal_1 == "short" and (signal_2 == "short" or "hold")) or ((signal_1 == "short" or "hold") and signal_2 == "short"):
-        final_signal = "SHORT"
-    else:
-        final_signal = "HOLD"
+def signal_candle(symbol):
+    """ 공유 메모리 스냅샷으로 마지막 판단한 신호의 캔들 시작 시각 (ms, 없으면 None)
 
-    return final_signal
+    스냅샷이 그대로라 get_final_signal 이 직전 신호를 돌려줄 때도 같은 캔들이라 주문 의도 키가 바뀌지 않는다.
+    """
+    return _last_signals.get(symbol, (0, None, None))[1]
+
+
+def needs_polling(has_position):
+    """ 거래소 보호 주문 없이 들고 있는 포지션이 있어 손익률을 주기적으로 확인해야 하는지 """
+    return any(held and not protective.protected(symbol) for symbol, held in has_position.items())
 
 
-def check_and_execute():
+def check_and_execute(events=None, symbols=('BTCUSDT',)):
+    """ 매매 루프. events(event_bus 의 INDICATORS_UPDATED 구독)가 주어지면 지표 갱신 이벤트가 온 심볼만 신호를 판단
+
+    symbols 의 각 심볼은 잔고를 1/len(symbols) 씩 나눠 쓴다.
+    """
+    final_signals = {}  # 심볼 -> (신호를 만든 캔들 시작 시각 ms, 신호)
+    allocation = 1 / len(symbols)
     while True:
         try:
             # 현재 포지션 정보 가져오기
-            positions = client.futures_position_information(symbol='BTCUSDT')
-            btc_position = next((pos for pos in positions if pos['symbol'] == 'BTCUSDT'), None)
-            
-            # 포지션이 없으면 open_Position 호출
-            if btc_position is None or float(btc_position['positionAmt']) == 0:
-                print("포지션 없음, open_Position 실행 중...")
-                open_Position()
-                time.sleep(5)  # 포지션이 없을 때는 5초 대기
-
-            # 포지션이 있으면 close_Position 호출
-            else:
-                print("포지션 있음, close_Position 실행 중...")
-                close_position()
-                time.sleep(2)  # 포지션이 있을 때는 2초 대기
+            has_position = {}
+            for symbol in symbols:
+                position = get_position(symbol)
+                has_position[symbol] = position is not None and float(position['positionAmt']) != 0
+
+            updated = set(symbols)
+            if events is not None:
+                # 포지션이 없으면 다음 지표 갱신까지, 있으면 손익 확인 주기(2초)까지만 기다림
+                latest = {}
+                for event in events.get_all(timeout=2 if needs_polling(has_position) else 15):
+                    latest[event.get('symbol', 'BTCUSDT')] = event
+                updated = {symbol for symbol in latest if symbol in has_position}
+                for symbol in updated:
+                    # 같은 신호로 다시 주문해도 의도 키가 같도록 신호 캔들을 신호와 같이 보관
+                    final_signals[symbol] = (latest[symbol].get('candle_ms'), get_final_signal(
+                        latest[symbol]['indicators'], latest[symbol]['prices'], symbol))
+
+            for symbol in symbols:
+                # 포지션이 없으면 open_Position 호출 (이벤트 모드에서는 새 지표가 온 심볼만)
+                if not has_position[symbol]:
+                    if symbol in updated:
+                        print(f"{symbol} 포지션 없음, open_Position 실행 중...")
+                        candle_ms, final_signal = final_signals.get(symbol, (None, None))
+                        open_Position(final_signal, symbol, allocation, candle_ms)
+
+                # 포지션이 있으면 close_Position 호출
+                else:
+                    print(f"{symbol} 포지션 있음, close_Position 실행 중...")
+                    candle_ms, final_signal = final_signals.get(symbol, (None, None))
+                    close_position(final_signal, symbol, candle_ms)
+
+            if events is None and needs_polling(has_position):
+                # 보호 주문 없는 포지션이 있을 때는 2초 대기 (그 밖에는 open_Position/close_position 이 새 지표를 기다림)
+                time.sleep(2)
 
         except Exception as e:
             print(f"⚠️ 오류 발생: {e}")
@@ -274,5 +538,13 @@ def check_and_execute():
 
 # ✅ 테스트 실행 코드
 if __name__ == "__main__":
-    check_and_execute()
+    # 사용법: python main.py [BTCUSDT ETHUSDT ...] (기본 BTCUSDT)
+    symbols = [arg.upper() for arg in os.sys.argv[1:]] or ['BTCUSDT']
+    # 데이터 파이프라인(report.py, 9108)과 같은 호스트에서 돌 수 있도록 다른 포트 사용
+    metrics.serve(int(os.getenv("METRICS_PORT", 9109)))
+    start_account_stream()
+    start_price_stream([symbol.lower() for symbol in symbols])
+    start_order_book([symbol.lower() for symbol in symbols])
+    start_exchange_info()
+    check_and_execute(symbols=symbols)
 
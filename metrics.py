@@ -0,0 +1,167 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Histogram:
+    """ HDR 방식의 로그-선형 버킷 히스토그램 (마이크로초 정수 단위 기록)
+
+    값의 상위 bits 비트로 버킷을 정하므로 2배 구간마다 2^(bits-1) 개 버킷이 있고 상대 오차는 약 2^-(bits-1) 이다.
+    record 는 비트 연산과 리스트 원소 증가뿐이라 락 없이 hot path 에서 호출한다
+    (여러 스레드가 동시에 기록하면 드물게 카운트 하나가 빠질 수 있음).
+    """
+    def __init__(self, bits=5, max_exponent=40):
+        self.bits = bits
+        self.sub = 1 << bits
+        self.half = self.sub >> 1
+        self.counts = [0] * (self.sub + (max_exponent - bits) * self.half)
+        self.total = 0
+        self.sum = 0
+
+    def _index(self, value):
+        if value < self.sub:
+            return value
+        shift = value.bit_length() - self.bits
+        return self.sub + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def _upper(self, index):
+        """ 버킷의 최댓값 """
+        if index < self.sub:
+            return index
+        shift = (index - self.sub) // self.half + 1
+        top = (index - self.sub) % self.half + self.half
+        return ((top + 1) << shift) - 1
+
+    def record(self, micros):
+        micros = int(micros) if micros > 0 else 0
+        index = min(self._index(micros), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += micros
+
+    def percentile(self, q):
+        """ q(0~1) 분위수 (마이크로초, 버킷 최댓값 기준). 기록이 없으면 0 """
+        if not self.total:
+            return 0
+        target = max(1, int(q * self.total + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self._upper(index)
+        return self._upper(len(self.counts) - 1)
+
+
+class Metrics:
+    """ 이름(+라벨)별 지연 히스토그램과 게이지를 모아 Prometheus 텍스트 형식으로 내보냄
+
+    - span(name, **labels): with 블록의 실행 시간을 기록
+    - observe(name, seconds, **labels): 직접 잰 시간을 기록
+    - gauge(name, fn, **labels): 스크레이프할 때마다 fn() 값을 읽음 (큐 길이, 버퍼 크기 등)
+    """
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, prefix="bot"):
+        self.prefix = prefix
+        self.histograms = {}  # (이름, 라벨 튜플) -> Histogram
+        self.gauges = {}      # (이름, 라벨 튜플) -> 함수
+        self.lock = threading.Lock()
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).record(seconds * 1_000_000)
+
+    def span(self, name, **labels):
+        return _Span(self.histogram(name, **labels))
+
+    def gauge(self, name, fn, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render(self):
+        """ Prometheus 텍스트 형식 (히스토그램은 분위수를 미리 계산한 summary 로) """
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            gauges = sorted(self.gauges.items())
+
+        typed = set()
+        for (name, labels), histogram in histograms:
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            for q in self.QUANTILES:
+                seconds = histogram.percentile(q) / 1_000_000
+                lines.append(f"{metric}{self._labels(labels, [('quantile', q)])} {seconds:.6f}")
+            lines.append(f"{metric}_sum{self._labels(labels)} {histogram.sum / 1_000_000:.6f}")
+            lines.append(f"{metric}_count{self._labels(labels)} {histogram.total}")
+
+        for (name, labels), fn in gauges:
+            metric = f"{self.prefix}_{name}"
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """ /metrics 를 로컬 HTTP 로 제공 (백그라운드 스레드) """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"📊 메트릭 엔드포인트: http://{host}:{port}/metrics")
+        return server
+
+
+class _Span:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record((time.perf_counter_ns() - self.started) // 1000)
+        return False
+
+
+# 프로세스 기본 메트릭 저장소
+metrics = Metrics()
@@ -0,0 +1,195 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+
+import websocket
+
+from candle_store import candle_file
+from event_bus import bus, CANDLE_CLOSED, INDICATORS_UPDATED
+from ohlcv_update import BinanceWebSocket_ohlcv
+from backfill import BinanceBackfill
+from trading_info import TradingIndicators, indicator_file
+from endpoints import STREAM_URL
+from metrics import metrics
+
+
+def _indicator_worker(jobs, results):
+    """ 지표 워커 프로세스: 맡은 심볼의 캔들 저장소(메모리 맵)를 직접 읽어 지표를 갱신 """
+    indicators = {}
+    while True:
+        symbol = jobs.get()
+        if symbol is None:
+            break
+        if symbol not in indicators:
+            indicators[symbol] = TradingIndicators(candle_file(symbol), indicator_file(symbol), symbol)
+        try:
+            payload = indicators[symbol].update()
+        except Exception as e:
+            print(f"⚠️ {symbol} 지표 계산 오류: {e}")
+            continue
+        if payload is not None:
+            results.put(payload)
+
+
+class IndicatorPool:
+    """ 심볼 기준으로 나눈 지표 계산 프로세스 풀
+
+    심볼은 crc32(symbol) % workers 로 항상 같은 워커에 배정되므로 심볼별 지표 상태가 한 프로세스에만 있다.
+    워커는 캔들을 큐로 받지 않고 공유 메모리 맵 캔들 저장소에서 직접 읽으며, 결과만 부모로 돌려보낸다.
+    부모는 결과를 INDICATORS_UPDATED 이벤트로 발행한다.
+    """
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context('spawn')
+        self.results = context.Queue()
+        self.jobs = [context.Queue() for _ in range(self.workers)]
+        self.processes = [
+            context.Process(target=_indicator_worker, args=(jobs, self.results), daemon=True)
+            for jobs in self.jobs
+        ]
+
+    def shard(self, symbol):
+        return zlib.crc32(symbol.upper().encode()) % self.workers
+
+    def submit(self, symbol):
+        """ symbol 의 새 캔들을 반영하도록 담당 워커에 알림 """
+        self.jobs[self.shard(symbol)].put(symbol.upper())
+
+    def collect(self):
+        """ 워커 결과를 이벤트 버스로 발행 (별도 스레드에서 실행) """
+        while True:
+            payload = self.results.get()
+            bus.publish(INDICATORS_UPDATED, payload)
+
+    def run(self):
+        for process in self.processes:
+            process.start()
+        threading.Thread(target=self.collect, daemon=True).start()
+
+        # 캔들 마감 이벤트마다 해당 심볼을 담당 워커에 넘김
+        candle_events = bus.subscribe(CANDLE_CLOSED)
+        while True:
+            for candle in candle_events.get_all(timeout=10):
+                self.submit(candle['symbol'])
+
+    def stop(self):
+        for jobs in self.jobs:
+            jobs.put(None)
+
+
+class BinanceWebSocket_multi:
+    """ 여러 심볼의 @trade 를 결합 스트림 하나로 받는 수집기
+
+    소켓 하나와 링버퍼 drain 스레드 하나로 모든 심볼을 처리한다.
+    심볼별 링버퍼/캔들 집계/캔들 저장소는 BinanceWebSocket_ohlcv 를 그대로 쓴다 (자체 소켓/타이머는 사용하지 않음).
+    """
+    STREAM_PREFIX = '{"stream":"'
+
+    def __init__(self, symbols, drain_interval=0.5):
+        self.symbols = [symbol.lower() for symbol in symbols]
+        self.drain_interval = drain_interval
+        self.feeds = {
+            symbol: BinanceWebSocket_ohlcv(
+                symbol=symbol,
+                legacy_json="1min_BTC_OHLCV.json" if symbol == "btcusdt" else None,
+                start_timer=False,
+            )
+            for symbol in self.symbols
+        }
+        # 결합 스트림은 연결당 최대 200개 스트림까지 허용됨
+        streams = "/".join(f"{symbol}@trade" for symbol in self.symbols)
+        self.stream_url = f"{STREAM_URL}/stream?streams={streams}"
+        self.ws = None
+        self.running = False
+
+    def on_message(self, ws, message):
+        """ {"stream":"btcusdt@trade","data":{...}} 에서 심볼만 잘라 해당 피드로 넘김 """
+        if message.startswith(self.STREAM_PREFIX):
+            start = len(self.STREAM_PREFIX)
+            symbol = message[start:message.index('@', start)]
+        else:
+            symbol = json.loads(message)['stream'].split('@')[0]
+        feed = self.feeds.get(symbol)
+        if feed is not None:
+            feed.on_message(ws, message)
+
+    def on_error(self, ws, error):
+        print(f"Error: {error}")
+
+    def on_close(self, ws, close_status_code, close_msg):
+        print("결합 웹소켓 연결 종료")
+
+    def on_open(self, ws):
+        print(f"결합 웹소켓 연결 성공 ({len(self.symbols)}개 심볼)")
+
+    def drain_loop(self):
+        """ 모든 심볼의 링버퍼를 한 스레드에서 주기적으로 비움 """
+        while self.running:
+            for feed in self.feeds.values():
+                try:
+                    feed.drain()
+                except Exception as e:
+                    print(f"⚠️ {feed.symbol} 캔들 집계 오류: {e}")
+            time.sleep(self.drain_interval)
+
+    def run_websocket(self):
+        websocket.enableTrace(False)
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.stream_url,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close
+            )
+            self.ws.on_open = self.on_open
+            self.ws.run_forever()
+            time.sleep(5)
+
+    def start(self, backfill=True):
+        """ 웹소켓과 drain 스레드를 백그라운드에서 실행
+
+        backfill 이면 체결을 링버퍼에 쌓아 두는 동안 심볼별로 최근 이력을 먼저 채운다.
+        """
+        self.running = True
+        threading.Thread(target=self.run_websocket).start()
+        if backfill:
+            backfiller = BinanceBackfill()
+            for feed in self.feeds.values():
+                try:
+                    backfiller.warm_up(feed)
+                except Exception as e:
+                    print(f"⚠️ {feed.symbol} 백필 실패: {e}")
+        threading.Thread(target=self.drain_loop, daemon=True).start()
+
+
+def start_trading(symbols):
+    # 같은 프로세스에서 매매 루프를 돌려 지표 갱신 이벤트를 바로 받음
+    if "--async" in os.sys.argv:
+        import async_trading
+        async_trading.start_trading(symbols)
+        return
+    import main
+    main.start_account_stream()
+    main.start_price_stream(symbols)
+    main.start_order_book(symbols)
+    main.start_exchange_info()
+    main.check_and_execute(bus.subscribe(INDICATORS_UPDATED), [symbol.upper() for symbol in symbols])
+
+
+if __name__ == "__main__":
+    # 사용법: python multi_symbol.py btcusdt ethusdt solusdt ... [--trade [--async]]
+    symbols = [arg.lower() for arg in os.sys.argv[1:] if not arg.startswith("--")] or ["btcusdt"]
+
+    # 지표 워커는 별도 프로세스라 여기에는 수집/매매 단계 메트릭만 나옴
+    metrics.serve(int(os.getenv("METRICS_PORT", 9108)))
+    feed = BinanceWebSocket_multi(symbols)
+    feed.start()
+
+    pool = IndicatorPool()
+    threading.Thread(target=pool.run).start()
+
+    if "--trade" in os.sys.argv:
+        threading.Thread(target=start_trading, args=(symbols,)).start()
@@ -1,115 +1,172 @@
 import websocket
-import json
-from datetime import datetime, timezone, timedelta
 import threading
+import time
+import os
+from candle_store import CandleStore, candle_file, kst_to_epoch_ms
+from event_bus import bus, CANDLE_CLOSED, ROLLUP_CLOSED
+from price_cache import prices
+from trade_buffer import TradeRingBuffer, parse_trade
+from candle_aggregator import CandleAggregator
+from backfill import BinanceBackfill
+from supervisor import heartbeats
+from endpoints import STREAM_URL
+from metrics import metrics
 
 class BinanceWebSocket_ohlcv:
-    def __init__(self, symbol="btcusdt", data_file="1min_BTC_OHLCV.json"):
+    ROLLUP_FILES = {
+        60_000: "1m_{symbol}_OHLCV.bin",
+        300_000: "5m_{symbol}_OHLCV.bin",
+        900_000: "15m_{symbol}_OHLCV.bin",
+    }
+
+    def __init__(self, symbol="btcusdt", data_file=None, legacy_json="1min_BTC_OHLCV.json",
+                 rollup_files=None, grace_ms=1_000, drain_interval=0.5, start_timer=True):
         self.symbol = symbol
-        self.data_file = data_file
-        self.stream_url = f"wss://fstream.binance.com/ws/{self.symbol}@trade"
+        self.data_file = data_file = data_file or candle_file(symbol)
+        self.store = CandleStore(data_file, capacity=500)
+
+        # 예전 JSON 캔들 파일이 남아 있으면 처음 한 번 캔들 저장소로 옮김
+        if self.store.count == 0 and legacy_json and os.path.exists(legacy_json):
+            migrated = self.store.import_json(legacy_json)
+            print(f"{legacy_json} 에서 캔들 {migrated}개를 옮겼습니다.")
+        self.stream_url = f"{STREAM_URL}/ws/{self.symbol}@trade"
         self.ws = None
-        self.data_buffer = []  # 데이터를 임시로 저장할 버퍼
-        self.lock = threading.Lock()
-
-        # 캔들봉 버퍼, 각 1분 캔들봉을 저장
-        self.candle_buffer = []
-        self.last_candle_time = None
-
-        # 1초마다 데이터 저장 타이머 설정
-        self.timer = threading.Timer(1, self.process_data)
-        self.timer.start()
-
-    def save_to_json(self, new_data):
-        """ JSON 파일에 데이터를 저장하는 함수 """
-        try:
-            with open(self.data_file, "r", encoding="utf-8") as file:
-                data = json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            data = []
-
-        # 새로운 1분 캔들봉 데이터를 data에 추가
-        data.append(new_data)
-
-        if len(data) > 500:
-            data = data[-500:] 
-
-        with open(self.data_file, "w", encoding="utf-8") as file:
-            json.dump(data, file, indent=4)
+        self.running = False
+        self.connections = 0  # 연결 성공 횟수 (두 번째부터는 재연결)
+        self.backoff_base = 1
+        self.backoff_max = 60
+        # 체결 링버퍼 (웹소켓 스레드가 쓰고 캔들 집계가 읽음, 락 없음)
+        self.trades = TradeRingBuffer()
+
+        # 거래소 체결 시각 기준 10초 캔들 + 1/5/15분 롤업 (grace_ms 까지 늦은 체결 허용)
+        if rollup_files is None:
+            rollup_files = {interval: path.format(symbol=symbol.upper()) for interval, path in self.ROLLUP_FILES.items()}
+        self.rollup_stores = {interval: CandleStore(path, capacity=500) for interval, path in rollup_files.items()}
+        self.aggregator = CandleAggregator(
+            interval=10_000, rollups=tuple(self.rollup_stores), grace=grace_ms, on_candle=self.on_candle
+        )
+        self.aggregator_lock = threading.Lock()  # drain 과 재연결 백필이 집계기를 동시에 건드리지 않도록
+        self.gap_fills = 0  # 진행 중인 백필 수 (0 이 아니면 drain 은 체결을 링버퍼에 남겨 둠)
+        self.gap_lock = threading.Lock()  # 백필은 한 번에 하나씩
+        self.drain_interval = drain_interval
+        self.clock_offset = 0  # 거래소 시각 - 로컬 시각 (ms), 체결이 없을 때 마감 판단에 사용
+
+        # hot path 지연 히스토그램은 미리 찾아 두고 (on_message 마다 dict 조회를 하지 않도록) 버퍼 크기는 게이지로 노출
+        symbol_label = symbol.upper()
+        self.on_message_latency = metrics.histogram("ws_on_message_seconds", symbol=symbol_label)
+        self.receive_lag = metrics.histogram("trade_receive_lag_seconds", symbol=symbol_label)
+        metrics.gauge("trade_buffer_depth", lambda: self.trades.head - self.trades.tail, symbol=symbol_label)
+        metrics.gauge("trade_buffer_dropped", lambda: self.trades.dropped, symbol=symbol_label)
+        metrics.gauge("late_trades", lambda: self.aggregator.late_trades, symbol=symbol_label)
+        metrics.gauge("ws_connections", lambda: self.connections, symbol=symbol_label)
+
+        # 링버퍼를 주기적으로 비우는 타이머 설정 (캔들 경계는 타이머가 아니라 체결 시각으로 정해짐)
+        # 여러 심볼을 한 스레드에서 돌릴 때는 start_timer=False 로 두고 drain() 을 직접 호출
+        self.timer_lock = threading.Lock()  # 타이머 체인이 둘로 갈라지지 않도록 (재예약과 restart_drain 이 겹칠 때)
+        self.timer = threading.Timer(self.drain_interval, self.process_data)
+        if start_timer:
+            self.timer.start()
+
+    def save_candle(self, new_data):
+        """ 캔들 저장소(메모리 맵 링버퍼)에 캔들 하나를 O(1)로 추가 """
+        if new_data is None:
+            return
+        self.store.append_candle(new_data)
+        heartbeats.beat(f"candle:{self.symbol.upper()}")
+        # 지표 단계가 파일을 다시 보지 않도록 닫힌 캔들을 바로 알림
+        bus.publish(CANDLE_CLOSED, {"symbol": self.symbol.upper(), **new_data})
+
+    def save_to_json(self, json_path):
+        """ 디버깅용: 저장소의 캔들을 기존 형식의 JSON 파일로 내보내기 """
+        self.store.export_json(json_path)
+
+    def on_candle(self, interval, candle):
+        """ 집계기에서 마감된 캔들 처리: 10초 캔들은 저장소+이벤트, 롤업은 시간대별 저장소에 저장 """
+        if interval == self.aggregator.interval:
+            # 캔들 구간이 끝난 (거래소) 시각부터 로컬에서 마감 처리할 때까지 걸린 시간
+            close_ms = kst_to_epoch_ms(candle['timestamp']) + interval
+            metrics.observe("candle_close_lag_seconds", (time.time() * 1000 + self.clock_offset - close_ms) / 1000,
+                            symbol=self.symbol.upper())
+            print(f"10초 캔들봉: {candle}")
+            self.save_candle(candle)
+        else:
+            self.rollup_stores[interval].append_candle(candle)
+            bus.publish(ROLLUP_CLOSED, {"symbol": self.symbol.upper(), "interval": interval, "candle": candle})
+
+    def drain(self):
+        """ 링버퍼에 쌓인 체결을 집계기에 넘기고, 체결이 없어도 시간이 지난 버킷은 마감 """
+        with self.aggregator_lock, metrics.span("candle_drain_seconds", symbol=self.symbol.upper()):
+            if self.gap_fills:
+                # 재연결 백필이 끝나기 전에 실시간 버킷을 마감하면 closed_until 이 빈 구간을 넘어가
+                # 백필 체결이 모두 늦은 체결로 버려지므로, 그동안 체결은 링버퍼에 쌓아 둠
+                return
+            end = self.trades.head
+            if end > self.trades.tail:
+                timestamps, trade_prices, quantities = self.trades.peek(end)
+                local_now = int(time.time() * 1000)
+                self.clock_offset = int(timestamps[-1]) - local_now
+                self.aggregator.add_trades(timestamps, trade_prices, quantities)
+                self.trades.release(end)
+
+            # 조용한 구간에서도 캔들이 마감되도록 로컬 시계를 거래소 시각으로 환산해 마감 처리
+            exchange_now = int(time.time() * 1000) + self.clock_offset
+            self.aggregator.flush(max(exchange_now, self.aggregator.watermark))
 
     def process_data(self):
-        """ 10초마다 데이터를 처리하여 저장 """
-        with self.lock:
-            if not self.data_buffer:
-                return
-            
-            # 현재 시간을 기준으로 10초 단위로 정렬 (0, 10, 20, 30, 40, 50)
-            current_time = datetime.now(timezone.utc)
-            current_period = current_time.replace(second=(current_time.second // 10) * 10, microsecond=0)
-
-            if self.last_candle_time is None or (current_period != self.last_candle_time):
-                # 새 10초가 시작되었으면 캔들 저장
-                if self.candle_buffer:
-                    ohlcv = self.create_candle(self.candle_buffer)
-                    print(f"10초 캔들봉: {ohlcv}")
-                    self.save_to_json(ohlcv)
-
-                # 버퍼 초기화
-                self.candle_buffer = []
-                self.last_candle_time = current_period
-
-        # 10초마다 반복 실행
-        self.timer = threading.Timer(10, self.process_data)
-        self.timer.start()
-
-
-
-    def create_candle(self, trade_data):
-        """ 거래 데이터를 바탕으로 1분 캔들봉 생성 """
-    
-        # price가 0보다 큰 데이터만 필터링
-        filtered_trade_data = [data for data in trade_data if data['price'] > 0]
-
-        # 필터링된 데이터가 없으면 빈 캔들 반환
-        if not filtered_trade_data:
-            return None
-
-        # 첫 번째 거래 데이터를 오픈 시간으로 설정
-        open_price = filtered_trade_data[0]['price']
-        close_price = filtered_trade_data[-1]['price']
-        high_price = max(data['price'] for data in filtered_trade_data)
-        low_price = min(data['price'] for data in filtered_trade_data)
-        volume = sum(data['quantity'] for data in filtered_trade_data)
-
-        # 첫 번째 거래의 timestamp를 캔들봉의 오픈 시간으로 설정
-        timestamp = filtered_trade_data[0]['timestamp']
-        formatted_timestamp = datetime.utcfromtimestamp(timestamp / 1000) + timedelta(hours=9)
-        formatted_timestamp = formatted_timestamp.strftime('%Y-%m-%d %H:%M:%S')
-
-        formatted_data = {
-            "timestamp": formatted_timestamp,
-            "open": float(open_price),
-            "high": float(high_price),
-            "low": float(low_price),
-            "close": float(close_price),
-            "volume": float(volume)
-        }
-
-        return formatted_data
+        """ drain 후 타이머 재설정 """
+        try:
+            self.drain()
+        finally:
+            # drain_interval 마다 반복 실행 (이미 예약된 타이머가 있으면 그것을 취소하고 새로 예약)
+            with self.timer_lock:
+                self.timer.cancel()
+                self.timer = threading.Timer(self.drain_interval, self.process_data)
+                self.timer.start()
+
+    def restart_drain(self):
+        """ 캔들 집계 타이머를 (다시) 시작. 버퍼/집계 상태는 그대로 유지하며, 이미 돌고 있어도 타이머는 하나만 남음 """
+        with self.timer_lock:
+            self.timer.cancel()
+        self.process_data()
+
+    def hold_drain(self):
+        """ 다음 fill_gap 이 끝날 때까지 drain 이 체결을 링버퍼에 남겨 두게 함 (fill_gap 을 시작하기 전에 호출) """
+        with self.aggregator_lock:
+            self.gap_fills += 1
+
+    def reconnect(self):
+        """ 웹소켓만 끊어서 run_websocket 루프가 다시 연결하도록 함 """
+        if self.ws:
+            self.ws.close()
+
+    def fill_gap(self):
+        """ 시작/재연결 후 마지막 저장 캔들 이후 빠진 구간을 REST 로 채움
+
+        hold_drain 으로 올려 둔 gap_fills 를 끝나면 내려서 drain 이 링버퍼의 실시간 체결을 다시 집계하게 한다.
+        백필 구간과 겹치는 실시간 체결은 closed_until 보다 앞이라 늦은 체결로 버려진다.
+        """
+        try:
+            with self.gap_lock:
+                BinanceBackfill().warm_up(self)
+        except Exception as e:
+            print(f"⚠️ 백필 실패: {e}")
+        finally:
+            with self.aggregator_lock:
+                self.gap_fills -= 1
 
     def on_message(self, ws, message):
         """ 메시지가 도착하면 호출되는 콜백 함수 """
-        data = json.loads(message)  # JSON 형식으로 메시지를 파싱
-        
-        with self.lock:
-            # 가격 (p) 값 저장
-            trade_data = {
-                "timestamp": data['T'],  # 거래 타임스탬프
-                "price": float(data['p']),  # 거래 가격
-                "quantity": float(data['q'])  # 거래 수량
-            }
-            self.data_buffer.append(trade_data)
-            self.candle_buffer.append(trade_data)
+        started = time.perf_counter_ns()
+        # 거래 타임스탬프(T), 가격(p), 수량(q)만 파싱해서 링버퍼에 기록
+        timestamp, price, quantity = parse_trade(message)
+        self.trades.push(timestamp, price, quantity)
+
+        # 주문 경로가 REST 시세 조회 없이 쓸 수 있도록 최신 체결가 갱신
+        prices.update(self.symbol, price, 'trade')
+
+        # 거래소 체결 시각 -> 수신 지연 (로컬/거래소 시계 차이 포함), 파싱~링버퍼 기록 시간
+        self.receive_lag.record((time.time() * 1000 - timestamp) * 1000)
+        self.on_message_latency.record((time.perf_counter_ns() - started) // 1000)
 
     def on_error(self, ws, error):
         """ 웹소켓 에러 발생 시 호출되는 콜백 함수 """
@@ -118,25 +175,45 @@ class BinanceWebSocket_ohlcv:
     def on_close(self, ws, close_status_code, close_msg):
         """ 웹소켓 연결 종료 시 호출되는 콜백 함수 """
         print("웹소켓 연결 종료")
-        # 타이머 종료
-        self.timer.cancel()
+        # 집계 타이머와 버퍼는 유지 (run_websocket 루프가 다시 연결)
 
     def on_open(self, ws):
         """ 웹소켓 연결 성공 시 호출되는 콜백 함수 """
         print("웹소켓 연결 성공")
+        self.connections += 1
+        self.attempts = 0
+        if self.connections > 1:
+            # 재연결이면 끊긴 동안 빠진 캔들을 백그라운드에서 채움 (스레드가 뜨기 전에 drain 을 먼저 멈춤)
+            self.hold_drain()
+            threading.Thread(target=self.fill_gap, daemon=True).start()
 
     def run_websocket(self):
-        """ 웹소켓 연결 및 데이터 수신 """
+        """ 웹소켓 연결 및 데이터 수신. 끊기면 지수 백오프로 다시 연결 """
         websocket.enableTrace(False)  # 디버깅 비활성화 가능
-        self.ws = websocket.WebSocketApp(
-            self.stream_url,
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close
-        )
-        self.ws.on_open = self.on_open
-        self.ws.run_forever()
+        self.attempts = 0
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.stream_url,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close
+            )
+            self.ws.on_open = self.on_open
+            self.ws.run_forever()
+            if not self.running:
+                break
+            delay = min(self.backoff_base * 2 ** self.attempts, self.backoff_max)
+            self.attempts += 1
+            print(f"🔄 {delay}초 후 웹소켓 재연결 시도 ({self.attempts}번째)")
+            time.sleep(delay)
 
     def start(self):
         """ 웹소켓을 백그라운드에서 실행 """
+        self.running = True
         threading.Thread(target=self.run_websocket).start()
+
+    def stop(self):
+        self.running = False
+        self.timer.cancel()
+        if self.ws:
+            self.ws.close()
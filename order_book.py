@@ -0,0 +1,226 @@
+import bisect
+import json
+import threading
+import time
+
+import websocket
+
+from endpoints import STREAM_URL
+from metrics import metrics
+
+
+class BookSide:
+    """ 한쪽 호가 (가격 -> 수량) 를 좋은 가격부터 정렬해 최대 depth 단계만 유지
+
+    정렬 키는 sign * price 라서 매수(내림차순)/매도(오름차순) 모두 키 오름차순이 좋은 호가 순서다.
+    위치는 bisect 로 O(log n) 에 찾고, 목록은 depth 개로 묶여 있어 삽입/삭제 비용도 작다.
+    depth 밖으로 밀려난 단계는 버리므로 위쪽 호가가 빠지면 그 아래 단계는 diff 가 다시 올 때까지 보이지 않는다.
+    """
+    def __init__(self, descending, depth):
+        self.sign = -1 if descending else 1
+        self.depth = depth
+        self.keys = []    # sign * price, 오름차순
+        self.levels = {}  # price -> 수량
+
+    def set(self, price, quantity):
+        """ 단계 하나를 수량으로 바꿈 (0 이면 삭제). diff 스트림의 수량은 변화량이 아니라 그 가격의 전체 수량 """
+        key = self.sign * price
+        if quantity == 0:
+            if self.levels.pop(price, None) is not None:
+                del self.keys[bisect.bisect_left(self.keys, key)]
+            return
+        if price not in self.levels:
+            index = bisect.bisect_left(self.keys, key)
+            if index >= self.depth:
+                return
+            self.keys.insert(index, key)
+            if len(self.keys) > self.depth:
+                del self.levels[self.sign * self.keys.pop()]
+        self.levels[price] = quantity
+
+    def clear(self):
+        self.keys.clear()
+        self.levels.clear()
+
+    def best(self):
+        return self.sign * self.keys[0] if self.keys else None
+
+    def top(self, n=None):
+        """ 좋은 가격부터 [(가격, 수량), ...] """
+        keys = self.keys if n is None else self.keys[:n]
+        return [(self.sign * key, self.levels[self.sign * key]) for key in keys]
+
+
+class OrderBook:
+    """ 깊이 스냅샷 + @depth@100ms diff 스트림으로 유지하는 심볼 하나의 로컬 L2 호가창
+
+    바이낸스 선물 절차대로 맞춘다:
+    1. 스트림을 먼저 열어 이벤트를 버퍼에 모으고 REST 스냅샷(lastUpdateId)을 받는다.
+    2. u < lastUpdateId 인 이벤트는 버리고, 첫 이벤트는 U <= lastUpdateId <= u 여야 한다.
+    3. 그 뒤로는 각 이벤트의 pu 가 직전 이벤트의 u 와 같아야 하며, 다르면(빠진 이벤트) 스냅샷부터 다시 맞춘다.
+    재연결할 때도 다시 맞춘다. 맞추는 동안과 stale_after 초 넘게 갱신이 없으면 ready() 가 False 다.
+    """
+    def __init__(self, client, symbol, depth=100, snapshot_limit=500, speed="100ms", stale_after=5.0):
+        self.client = client
+        self.symbol = symbol.upper()
+        self.snapshot_limit = snapshot_limit
+        self.stale_after = stale_after
+        self.stream_url = f"{STREAM_URL}/ws/{symbol.lower()}@depth@{speed}"
+        self.lock = threading.Lock()
+        self.bids = BookSide(True, depth)
+        self.asks = BookSide(False, depth)
+
+        self.last_update_id = None  # 마지막으로 반영한 이벤트(또는 스냅샷)의 업데이트 ID
+        self.expect_first = True    # 스냅샷 뒤 첫 이벤트를 기다리는 중
+        self.synced = False
+        self.syncing = False
+        self.buffer = []            # 스냅샷을 받는 동안 온 이벤트
+        self.updated_at = None
+        self.resyncs = 0
+        self.ws = None
+
+        metrics.gauge("order_book_synced", lambda: float(self.synced), symbol=self.symbol)
+        metrics.gauge("order_book_resyncs", lambda: self.resyncs, symbol=self.symbol)
+
+    # ---------- 동기화 ----------
+    def _apply(self, event):
+        """ 이벤트 하나 반영. 앞 이벤트와 이어지지 않으면 False """
+        if self.expect_first:
+            if event['u'] < self.last_update_id:
+                return True  # 스냅샷에 이미 들어 있음
+            if event['U'] > self.last_update_id and event.get('pu') != self.last_update_id:
+                return False  # 스냅샷과 첫 이벤트 사이가 빠짐
+            self.expect_first = False
+        elif event['pu'] != self.last_update_id:
+            return False
+        for price, quantity in event['b']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in event['a']:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = event['u']
+        self.updated_at = time.monotonic()
+        return True
+
+    def resync(self):
+        """ 스냅샷을 받아 버퍼의 이벤트부터 다시 이어 붙임 (이어지지 않으면 1초 뒤 다시) """
+        with self.lock:
+            if self.syncing:
+                return
+            self.syncing, self.synced, self.buffer = True, False, []
+        try:
+            snapshot = self.client.futures_order_book(symbol=self.symbol, limit=self.snapshot_limit)
+        except Exception as e:
+            print(f"⚠️ {self.symbol} 호가 스냅샷 조회 실패: {e}")
+            with self.lock:
+                self.syncing = False
+            threading.Timer(1.0, self.resync).start()
+            return
+
+        with self.lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, quantity in snapshot['bids']:
+                self.bids.set(float(price), float(quantity))
+            for price, quantity in snapshot['asks']:
+                self.asks.set(float(price), float(quantity))
+            self.last_update_id = snapshot['lastUpdateId']
+            self.expect_first = True
+            self.updated_at = time.monotonic()
+            ok = all(self._apply(event) for event in self.buffer)
+            self.buffer = []
+            self.synced, self.syncing = ok, False
+        if not ok:
+            print(f"⚠️ {self.symbol} 호가 스냅샷과 diff 가 이어지지 않아 다시 맞춥니다.")
+            threading.Timer(1.0, self.resync).start()
+
+    def _start_resync(self):
+        self.resyncs += 1
+        threading.Thread(target=self.resync, daemon=True).start()
+
+    def on_message(self, ws, message):
+        event = json.loads(message)
+        if event.get('e') != 'depthUpdate':
+            return
+        with self.lock:
+            if not self.synced:
+                self.buffer.append(event)
+                return
+            if self._apply(event):
+                return
+            print(f"⚠️ {self.symbol} 호가 diff 누락 (pu {event['pu']} != {self.last_update_id}). 스냅샷부터 다시 맞춥니다.")
+            self.synced = False
+            self.buffer = [event]
+        self._start_resync()
+
+    def on_open(self, ws):
+        # 연결이 끊긴 사이의 diff 는 다시 오지 않으므로 매번 스냅샷부터
+        self._start_resync()
+
+    def on_error(self, ws, error):
+        print(f"Order book stream error: {error}")
+
+    def run_websocket(self):
+        while True:
+            self.ws = websocket.WebSocketApp(self.stream_url, on_open=self.on_open, on_message=self.on_message,
+                                             on_error=self.on_error)
+            self.ws.run_forever()
+            with self.lock:
+                self.synced = False
+            time.sleep(5)
+
+    def start(self):
+        """ 웹소켓을 백그라운드에서 실행 """
+        threading.Thread(target=self.run_websocket, daemon=True).start()
+        return self
+
+    # ---------- 조회 ----------
+    def ready(self):
+        return self.synced and self.updated_at is not None and time.monotonic() - self.updated_at <= self.stale_after
+
+    def best(self):
+        """ (최우선 매수 호가, 최우선 매도 호가) """
+        with self.lock:
+            return self.bids.best(), self.asks.best()
+
+    def top(self, n=10):
+        with self.lock:
+            return {"bids": self.bids.top(n), "asks": self.asks.top(n)}
+
+    def _levels(self, side):
+        """ side 방향 시장가 주문이 먹는 쪽 호가 (BUY 면 매도 호가) """
+        return (self.asks if side == 'BUY' else self.bids).top()
+
+    def estimate_fill_price(self, side, quantity):
+        """ side('BUY'/'SELL') 로 quantity 를 시장가로 냈을 때 (예상 평균 체결가, 채워지는 수량)
+
+        유지하는 단계 안에서 다 채워지지 않으면 채워지는 수량이 quantity 보다 작다. 호가가 없으면 (None, 0).
+        """
+        with self.lock:
+            levels = self._levels(side)
+        filled = cost = 0.0
+        for price, available in levels:
+            take = min(available, quantity - filled)
+            filled += take
+            cost += take * price
+            if filled >= quantity:
+                break
+        return (cost / filled if filled else None), filled
+
+    def max_quantity(self, side, max_slippage_bps):
+        """ 예상 평균 체결가가 최우선 호가보다 max_slippage_bps 이상 불리해지지 않는 최대 수량 (호가가 없으면 None) """
+        with self.lock:
+            levels = self._levels(side)
+        if not levels:
+            return None
+        direction = 1 if side == 'BUY' else -1
+        limit = levels[0][0] * (1 + direction * max_slippage_bps / 10_000)
+        filled = cost = 0.0
+        for price, available in levels:
+            if direction * (price - limit) <= 0:
+                filled += available
+                cost += available * price
+                continue
+            # 이 단계에서 평균이 limit 에 닿는 수량: (cost + x * price) / (filled + x) = limit
+            filled += min(available, (limit * filled - cost) / (price - limit))
+            break
+        return filled
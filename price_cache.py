@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+
+import websocket
+
+from endpoints import STREAM_URL
+
+# 용도별 가격 소스 순서: 앞의 소스가 max_age 안이면 그 값만 쓰고, 오래됐을 때만 다음 소스로 넘어감
+PNL_SOURCES = ("mark", "trade", "book", "rest")     # 손익률/보호 주문 확인: 거래소 청산 기준인 mark price
+SIZING_SOURCES = ("book", "trade", "mark", "rest")  # 진입 수량: 실제로 체결될 호가 중간값 / 최근 체결가
+
+
+class PriceCache:
+    """ 심볼별 최신 가격 캐시 (스레드 안전)
+
+    소스별(trade / mark / book / rest)로 가격과 수신 시각(time.monotonic)을 따로 저장하고,
+    latest() 는 용도별 소스 순서(PNL_SOURCES / SIZING_SOURCES)에서 max_age 안에 들어온 첫 값을 돌려준다.
+    소스마다 가격이 조금씩 달라, 가장 최근 값을 쓰면 같은 포지션의 손익률이 소스에 따라 오락가락한다.
+    없으면 None (오래됨).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prices = {}  # symbol -> {source: (price, received_at)}
+        self.listeners = []  # 가격이 갱신될 때마다 (symbol, price) 로 부를 콜백 (가볍게 유지할 것)
+
+    def update(self, symbol, price, source='trade'):
+        # 체결마다 호출되므로 락 없이 갱신: 항목 하나를 통째로 바꾸는 dict 대입은 GIL 아래에서 원자적
+        symbol = symbol.upper()
+        sources = self.prices.get(symbol)
+        if sources is None:
+            with self.lock:
+                sources = self.prices.setdefault(symbol, {})
+        sources[source] = (float(price), time.monotonic())
+        for listener in self.listeners:
+            listener(symbol, price)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def latest(self, symbol, max_age=2.0, sources=SIZING_SOURCES):
+        symbol = symbol.upper()
+        now = time.monotonic()
+        with self.lock:
+            received = dict(self.prices.get(symbol, {}))
+        for source in sources:
+            if source in received and now - received[source][1] <= max_age:
+                return received[source][0]
+        return None
+
+    def age(self, symbol):
+        """ 마지막 가격 수신 후 지난 시간(초). 받은 적이 없으면 None """
+        with self.lock:
+            sources = self.prices.get(symbol.upper())
+            if not sources:
+                return None
+            received_at = max(received_at for _, received_at in list(sources.values()))
+        return time.monotonic() - received_at
+
+
+class BinancePriceStream:
+    """ markPrice / bookTicker 결합 스트림으로 PriceCache 를 채움 (여러 심볼도 소켓 하나로 처리) """
+    def __init__(self, cache, symbols="btcusdt"):
+        self.cache = cache
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        self.symbols = [symbol.lower() for symbol in symbols]
+        streams = "/".join(f"{symbol}@markPrice@1s/{symbol}@bookTicker" for symbol in self.symbols)
+        self.stream_url = f"{STREAM_URL}/stream?streams={streams}"
+        self.ws = None
+
+    def on_message(self, ws, message):
+        data = json.loads(message).get('data', {})
+        event = data.get('e')
+        if event == 'markPriceUpdate':
+            self.cache.update(data['s'], data['p'], 'mark')
+        elif event == 'bookTicker':
+            # 최우선 매수/매도 호가의 중간값
+            self.cache.update(data['s'], (float(data['b']) + float(data['a'])) / 2, 'book')
+
+    def on_error(self, ws, error):
+        print(f"Price stream error: {error}")
+
+    def run_websocket(self):
+        # 끊기면 5초 뒤 다시 연결 (그동안 주문 경로는 REST 로 대체됨)
+        while True:
+            self.ws = websocket.WebSocketApp(self.stream_url, on_message=self.on_message, on_error=self.on_error)
+            self.ws.run_forever()
+            time.sleep(5)
+
+    def start(self):
+        """ 웹소켓을 백그라운드에서 실행 """
+        threading.Thread(target=self.run_websocket, daemon=True).start()
+
+
+# 프로세스 기본 가격 캐시
+prices = PriceCache()
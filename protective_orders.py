@@ -0,0 +1,145 @@
+import threading
+import time
+from decimal import ROUND_DOWN, ROUND_UP
+
+from exchange_info import round_step
+
+ORDER_TYPES = {"take_profit": "TAKE_PROFIT_MARKET", "stop_loss": "STOP_MARKET"}
+PREFIXES = {"take_profit": "tp", "stop_loss": "sl"}
+TRIGGERED = ("TRIGGERED", "FINISHED")
+CLOSED = ("CANCELED", "EXPIRED", "REJECTED")
+
+
+def trigger_prices(entry_price, side, leverage, take_profit_rate, stop_loss_rate, tick_size=0):
+    """ 레버리지 적용 손익률 = side x (가격 / 진입가 - 1) x 100 x 레버리지 가 임계값이 되는 (익절가, 손절가)
+
+    side 는 LONG 1 / SHORT -1, stop_loss_rate 는 음수. 틱 단위로 맞출 때는 진입가 쪽으로 (조금 일찍 발동하도록) 반올림한다.
+    """
+    take_profit = entry_price * (1 + side * take_profit_rate / (100 * leverage))
+    stop_loss = entry_price * (1 + side * stop_loss_rate / (100 * leverage))
+    if side > 0:
+        return round_step(take_profit, tick_size, ROUND_DOWN), round_step(stop_loss, tick_size, ROUND_UP)
+    return round_step(take_profit, tick_size, ROUND_UP), round_step(stop_loss, tick_size, ROUND_DOWN)
+
+
+class ProtectiveOrders:
+    """ 진입 직후 거래소에 거는 reduce-only 익절(TAKE_PROFIT_MARKET) / 손절(STOP_MARKET) 주문의 수명 관리
+
+    조건부 주문은 algo 주문(/fapi/v1/algoOrder)이라 clientAlgoId / algoId 로 구분하고
+    상태는 user-data 스트림의 ALGO_UPDATE 로 받는다 (futures_create_order 가 type 을 보고 algo 엔드포인트로 보냄).
+
+    - 진입하면 place(): 손익률 임계값에서 발동하는 두 주문을 건다. 둘 다 걸린 심볼만 protected() 이고,
+      그동안 매매 루프는 반대 신호 청산만 맡는다 (가격 급변에도 거래소가 바로 청산).
+    - 한쪽이 발동하면 남은 쪽을 취소하고 추적을 끝낸다.
+    - 반대 신호로 직접 청산할 때는 cancel() 로 먼저 취소한다 (다음 진입에서 새로 걸림).
+    - 거래소에서 취소/만료되면 남은 쪽도 취소하고 추적을 끝내므로 매매 루프가 예전처럼 손익률을 직접 확인한다.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        self.active = {}      # symbol -> {"take_profit": 주문 dict, "stop_loss": 주문 dict}
+        self.checked = set()  # 재시작 후 거래소의 미체결 보호 주문을 확인한 심볼
+
+    @staticmethod
+    def order_params(symbol, side, quantity, entry_price, leverage, take_profit_rate, stop_loss_rate, tick_size=0):
+        """ 두 보호 주문의 futures_create_order 인자 ({"take_profit": {...}, "stop_loss": {...}}) """
+        take_profit, stop_loss = trigger_prices(entry_price, side, leverage, take_profit_rate, stop_loss_rate, tick_size)
+        stamp = int(time.time() * 1000)
+        return {
+            kind: {
+                "symbol": symbol,
+                "side": 'SELL' if side > 0 else 'BUY',
+                "type": ORDER_TYPES[kind],
+                "stopPrice": price,
+                "quantity": quantity,
+                "reduceOnly": 'true',
+                "clientAlgoId": f"{PREFIXES[kind]}_{symbol}_{stamp}",
+            }
+            for kind, price in (("take_profit", take_profit), ("stop_loss", stop_loss))
+        }
+
+    def protected(self, symbol):
+        with self.lock:
+            return symbol in self.active
+
+    def track(self, symbol, orders):
+        """ 걸린 보호 주문 기록. 둘 중 하나라도 빠졌으면 걸린 쪽을 돌려줌 (호출한 쪽이 취소) """
+        if len(orders) == len(ORDER_TYPES):
+            with self.lock:
+                self.active[symbol] = orders
+            print(f"🛡️ {symbol} 보호 주문: 익절 {orders['take_profit'].get('triggerPrice')} / 손절 {orders['stop_loss'].get('triggerPrice')}")
+            return {}
+        return orders
+
+    def release(self, symbol):
+        """ 추적을 끝내고 취소해야 할 주문들을 돌려줌 (REST 는 부르지 않음) """
+        with self.lock:
+            return self.active.pop(symbol, {})
+
+    def _cancel_orders(self, symbol, orders):
+        for kind, order in orders.items():
+            try:
+                self.client.futures_cancel_order(symbol=symbol, algoId=order['algoId'])
+            except Exception as e:
+                # 이미 체결/취소된 주문이면 거래소가 거절하므로 무시
+                print(f"⚠️ {symbol} {kind} 보호 주문 취소 실패: {e}")
+
+    def place(self, symbol, side, quantity, entry_price, leverage, take_profit_rate, stop_loss_rate, tick_size=0):
+        """ 두 보호 주문을 걸고 둘 다 걸렸으면 True (하나만 걸리면 취소하고 False) """
+        self.cancel(symbol)  # 이전 포지션에서 남은 주문이 새 포지션을 건드리지 않도록
+        placed = {}
+        params = self.order_params(symbol, side, quantity, entry_price, leverage, take_profit_rate, stop_loss_rate, tick_size)
+        for kind, order in params.items():
+            try:
+                placed[kind] = self.client.futures_create_order(**order)
+            except Exception as e:
+                print(f"⚠️ {symbol} {kind} 보호 주문 실패 (매매 루프가 손익률을 직접 확인): {e}")
+        leftover = self.track(symbol, placed)
+        self._cancel_orders(symbol, leftover)
+        return not leftover and bool(placed)
+
+    def cancel(self, symbol):
+        self._cancel_orders(symbol, self.release(symbol))
+
+    def needs_check(self, symbol):
+        """ 추적 중인 보호 주문이 없고 거래소의 미체결 보호 주문도 아직 확인하지 않은 심볼인지 """
+        return not self.protected(symbol) and symbol not in self.checked
+
+    def mark_checked(self, symbol):
+        """ 확인했거나 확인에 실패한 심볼: 다음부터는 매매 루프가 손익률을 직접 확인 """
+        self.checked.add(symbol)
+
+    def forget(self, symbol):
+        """ 다음 확인 때 거래소의 보호 주문을 다시 찾도록 (진입 체결을 확인하지 못했을 때) """
+        self.checked.discard(symbol)
+
+    def adopt(self, symbol, open_orders):
+        """ 재시작 뒤 거래소에 남아 있는 보호 주문(clientOrderId 접두사로 구분)을 다시 추적. 다 찾았으면 True """
+        self.mark_checked(symbol)
+        found = {}
+        for order in open_orders:
+            for kind, prefix in PREFIXES.items():
+                if order.get('clientAlgoId', '').startswith(f"{prefix}_{symbol}_"):
+                    found[kind] = order
+        leftover = self.track(symbol, found)
+        self._cancel_orders(symbol, leftover)
+        return not leftover and bool(found)
+
+    def on_algo_update(self, order):
+        """ user-data 스트림 ALGO_UPDATE 콜백 (웹소켓 스레드) """
+        symbol, client_algo_id, status = order['s'], order['caid'], order['X']
+        if status not in TRIGGERED and status not in CLOSED:
+            return
+        with self.lock:
+            orders = self.active.get(symbol, {})
+            kind = next((kind for kind, tracked in orders.items() if tracked.get('clientAlgoId') == client_algo_id), None)
+            if kind is None:
+                return
+            self.active.pop(symbol)
+        siblings = {other: tracked for other, tracked in orders.items() if other != kind}
+        if status in TRIGGERED:
+            print(f"✅ {symbol} {kind} 보호 주문 발동: 발동가 {order.get('tp')}")
+        else:
+            print(f"⚠️ {symbol} {kind} 보호 주문 {status} (매매 루프가 손익률을 직접 확인)")
+        # 스트림 스레드를 막지 않도록 남은 주문 취소는 별도 스레드에서
+        threading.Thread(target=self._cancel_orders, args=(symbol, siblings), daemon=True).start()
@@ -1,70 +1,96 @@
 from ohlcv_update import BinanceWebSocket_ohlcv
 from trading_info import TradingIndicators
-import json
+from event_bus import bus, INDICATORS_UPDATED
+from supervisor import Supervisor, heartbeats
+from metrics import metrics
 import time
 import os
 import threading
-from datetime import datetime, timedelta, timezone
 
 
-def check_timestamp():
-    try:
-        with open('Technical_indicators.json', 'r') as f:
-            data = json.load(f)
-
-        # timestamp를 offset-aware로 변환
-        timestamp = datetime.strptime(data["timestamp"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-        
-        # 현재 시간 한국 시간 기준 변환
-        now_kst = datetime.now(timezone.utc) + timedelta(hours=9)
-        time_diff = now_kst - timestamp
-
-        if time_diff.total_seconds() > 300:  # 5분 초과 시
-            print("⛔ 데이터가 5분 이상 경과했습니다. 스크립트를 재시작합니다.")
-            restart_script()
-        else:
-            print("✅ 데이터가 최신 상태입니다.")
-
-    except Exception as e:
-        print(f"⚠️ 오류 발생: {e}")
-        restart_script()
-
 def restart_script():
     python = os.sys.executable  # 현재 실행 중인 Python 경로 사용
     print("🔄 스크립트를 재시작합니다...")
     os.execl(python, python, *os.sys.argv)
 
 
-def start_ohlcv():
-    ohlcv = BinanceWebSocket_ohlcv(symbol="btcusdt", data_file="1min_BTC_OHLCV.json")
+def start_ohlcv(ohlcv):
+    # 실시간 체결은 링버퍼에 쌓아 두고, 그동안 REST 로 최근 이력을 채운 뒤 캔들 집계를 시작
+    # (백필 중에 슈퍼바이저가 restart_drain 으로 타이머를 먼저 띄워도 백필이 끝날 때까지 drain 은 체결을 남겨 둠)
+    ohlcv.hold_drain()
     ohlcv.start()
+    ohlcv.fill_gap()
+    ohlcv.restart_drain()
 
 
-def start_trading_info():
-    trading_indicators = TradingIndicators('1min_BTC_OHLCV.json')
+def start_trading_info(trading_indicators):
     trading_indicators.run()
 
 
-def start_check_timestamp():
-    print("⏳ 1분 후에 타임스탬프 체크 시작...")
-    time.sleep(60)  # 1분 대기 후 실행
+def start_trading():
+    # 같은 프로세스에서 매매 루프를 돌리면 지표 갱신 이벤트를 파일 없이 바로 받음
+    if "--async" in os.sys.argv:
+        import async_trading
+        async_trading.start_trading()
+        return
+    import main
+    main.start_account_stream()
+    main.start_price_stream()
+    main.start_order_book()
+    main.start_exchange_info()
+    main.check_and_execute(bus.subscribe(INDICATORS_UPDATED))
+
+
+def start_supervisor(ohlcv, trading_indicators, trading_info_thread):
+    """ 구성 요소별 heartbeat 를 감시해 멈춘 것만 다시 시작 (끝까지 안 되면 프로세스 재시작) """
+    supervisor = Supervisor(interval=5, max_restarts=5, on_give_up=restart_script)
+    threads = {"indicators": trading_info_thread}
+
+    def restart_trading_info():
+        # 지표 스레드가 예외로 죽었을 때만 새로 띄움 (살아 있으면 다음 캔들을 기다리는 중)
+        if not threads["indicators"].is_alive():
+            threads["indicators"] = threading.Thread(target=start_trading_info, args=(trading_indicators,))
+            threads["indicators"].start()
+
+    # 웹소켓은 hot path 에 heartbeat 를 넣지 않고 링버퍼 head 가 움직이는지로 판단
+    supervisor.register("websocket:BTCUSDT", max_age=30, restart=ohlcv.reconnect,
+                        probe=lambda: ohlcv.trades.head, startup_grace=60)
+    supervisor.register("candle:BTCUSDT", max_age=60, restart=ohlcv.restart_drain,
+                        depends="websocket:BTCUSDT", startup_grace=120)
+    supervisor.register("indicators:BTCUSDT", max_age=60, restart=restart_trading_info,
+                        depends="candle:BTCUSDT", startup_grace=120)
+    supervisor.start()
+    for name in ("websocket:BTCUSDT", "candle:BTCUSDT", "indicators:BTCUSDT"):
+        metrics.gauge("heartbeat_age_seconds", lambda name=name: heartbeats.age(name), component=name)
+
     while True:
-        check_timestamp()
-        time.sleep(10)  # 1분 간격으로 체크
+        time.sleep(600)
+        for name, stats in supervisor.summary().items():
+            print(f"📊 {name} 복구 {stats['count']}회, 평균 {stats['mean']:.2f}초, 최대 {stats['max']:.2f}초")
 
 
 if __name__ == "__main__":
+    ohlcv = BinanceWebSocket_ohlcv(symbol="btcusdt", data_file="1min_BTC_OHLCV.bin", start_timer=False)
+    # --dump-json: 디버깅용으로 지표 JSON 파일도 같이 기록
+    trading_indicators = TradingIndicators('1min_BTC_OHLCV.bin', dump_json="--dump-json" in os.sys.argv)
+    metrics.serve(int(os.getenv("METRICS_PORT", 9108)))
+
     # 스레드 설정
-    ohlcv_thread = threading.Thread(target=start_ohlcv)
-    trading_info_thread = threading.Thread(target=start_trading_info)
-    check_thread = threading.Thread(target=start_check_timestamp)
+    ohlcv_thread = threading.Thread(target=start_ohlcv, args=(ohlcv,))
+    trading_info_thread = threading.Thread(target=start_trading_info, args=(trading_indicators,))
+    supervisor_thread = threading.Thread(
+        target=start_supervisor, args=(ohlcv, trading_indicators, trading_info_thread), daemon=True
+    )
 
     # 스레드 시작
     ohlcv_thread.start()
     trading_info_thread.start()
-    check_thread.start()
+    supervisor_thread.start()
+
+    # --trade: 매매 루프도 이 프로세스에서 이벤트 기반으로 실행 (--async 면 asyncio 매매 루프)
+    if "--trade" in os.sys.argv:
+        threading.Thread(target=start_trading).start()
 
     # 스레드 종료 대기
     ohlcv_thread.join()
     trading_info_thread.join()
-    check_thread.join()
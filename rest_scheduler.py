@@ -0,0 +1,290 @@
+import asyncio
+import contextlib
+import threading
+import time
+from collections import Counter
+
+from binance.exceptions import BinanceAPIException
+
+from metrics import metrics
+
+# 우선순위 (작을수록 먼저). 한도에 가까워지면 낮은 우선순위부터 다음 창까지 기다린다
+ORDER, ACCOUNT, BACKGROUND = 0, 1, 2
+PRIORITIES = {
+    "futures_create_order": ORDER,
+    "futures_cancel_order": ORDER,
+    "futures_change_leverage": ORDER,
+    "futures_exchange_info": BACKGROUND,
+    "futures_symbol_config": BACKGROUND,
+    "futures_aggregate_trades": BACKGROUND,
+    "futures_klines": BACKGROUND,
+}
+# 우선순위별로 1분 요청 가중치 한도의 이 비율까지만 씀 (나머지는 위 우선순위 몫)
+CEILINGS = {ORDER: 0.95, ACCOUNT: 0.85, BACKGROUND: 0.7}
+ORDER_CEILING = 0.9  # 주문 수 한도(10초/1분)의 이 비율까지만 씀
+WRITE_MAX_WAIT = 10  # 주문/취소/레버리지는 이보다 오래 기다려야 하면 보내지 않음 (늦게 나간 주문은 판단 시점과 시세가 다름)
+
+# 요청 가중치 추정치 (응답 헤더가 오면 그 값으로 맞춤). (심볼을 줄 때, 안 줄 때)
+WEIGHTS = {
+    "futures_account": (5, 5),
+    "futures_account_balance": (5, 5),
+    "futures_symbol_ticker": (1, 2),
+    "futures_position_information": (5, 5),
+    "futures_change_leverage": (1, 1),
+    "futures_create_order": (0, 0),
+    "futures_cancel_order": (1, 1),
+    "futures_get_open_orders": (1, 40),
+    "futures_get_order": (1, 1),
+    "futures_get_all_orders": (5, 5),
+    "futures_exchange_info": (1, 1),
+    "futures_symbol_config": (5, 5),
+    "futures_order_book": (10, 10),  # limit=500 기준
+    "futures_aggregate_trades": (20, 20),
+    "futures_klines": (10, 10),  # limit=1500 기준
+}
+ORDER_METHODS = ("futures_create_order",)  # 주문 수 한도에 들어가는 요청
+WRITE_METHODS = ("futures_create_order", "futures_cancel_order", "futures_change_leverage")  # 합치면 안 되는 요청
+DEFAULT_LIMITS = {"weight_1m": 2400, "orders_10s": 300, "orders_1m": 1200}
+
+
+class RateLimitExceeded(Exception):
+    """ 한도 때문에 max_wait 안에 보낼 수 없는 요청 """
+
+
+class _Pending:
+    """ 진행 중인 조회 한 건. 같은 조회가 또 오면 새로 보내지 않고 이 결과를 같이 받음 """
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def get(self):
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RestScheduler:
+    """ 선물 REST 요청 가중치/주문 수를 세면서 한도에 닿기 전에 스스로 늦추는 스케줄러
+
+    - 응답의 X-MBX-USED-WEIGHT-1M, X-MBX-ORDER-COUNT-10S/1M 헤더로 거래소가 센 값을 받고,
+      응답 전인 요청은 WEIGHTS 추정치로 미리 잡아 둔다 (헤더 값은 계정/IP 전체 값이라 어느 스레드의 응답이든 그대로 씀).
+    - 한도(exchangeInfo 의 rateLimits, 기본 DEFAULT_LIMITS)의 CEILINGS 비율을 넘기려는 요청은 창이 바뀔 때까지 기다린다.
+      주문이 기다리는 동안에는 조회가 먼저 나가지 않는다.
+    - 같은 조회(메서드 + 인자)가 이미 진행 중이면 보내지 않고 그 응답을 같이 받는다.
+    - 그래도 429/418 을 받으면 Retry-After 동안 모든 요청을 멈춘다 (계속 보내면 IP 차단 시간이 늘어남).
+      주문/취소/레버리지는 WRITE_MAX_WAIT 보다 오래 기다려야 하면 보내지 않고 RateLimitExceeded 를 낸다.
+    """
+    def __init__(self, client=None, limits=None):
+        self.client = client
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.cond = threading.Condition()
+        self.minute = None         # 현재 1분 창 번호
+        self.ten_seconds = None    # 현재 10초 창 번호
+        self.used_weight = 0       # 이번 1분 창에 쓴 가중치 (헤더 기준)
+        self.pending_weight = 0    # 응답 전인 요청의 추정 가중치
+        self.orders_10s = 0
+        self.orders_1m = 0
+        self.blocked_until = 0.0   # 429/418 이후 요청을 다시 보낼 수 있는 시각 (epoch 초)
+        self.waiting = Counter()   # 우선순위 -> 기다리는 요청 수
+        self.inflight = {}         # (메서드, 인자) -> _Pending
+        self.merged = 0            # 합쳐진 조회 수
+
+        metrics.gauge("rest_used_weight", lambda: self.used_weight + self.pending_weight)
+        metrics.gauge("rest_order_count_10s", lambda: self.orders_10s)
+        metrics.gauge("rest_order_count_1m", lambda: self.orders_1m)
+        metrics.gauge("rest_merged_requests", lambda: self.merged)
+
+    # ---------- 한도 ----------
+    def update_limits(self, rate_limits):
+        """ exchangeInfo 의 rateLimits 로 한도 갱신 """
+        for item in rate_limits or []:
+            seconds = {"SECOND": 1, "MINUTE": 60, "DAY": 86400}.get(item.get('interval'), 0) * item.get('intervalNum', 1)
+            if item.get('rateLimitType') == 'REQUEST_WEIGHT' and seconds == 60:
+                self.limits["weight_1m"] = item['limit']
+            elif item.get('rateLimitType') == 'ORDERS' and seconds == 10:
+                self.limits["orders_10s"] = item['limit']
+            elif item.get('rateLimitType') == 'ORDERS' and seconds == 60:
+                self.limits["orders_1m"] = item['limit']
+
+    @staticmethod
+    def weight(name, params):
+        with_symbol, without_symbol = WEIGHTS.get(name, (1, 1))
+        return with_symbol if 'symbol' in params else without_symbol
+
+    def _roll(self, now):
+        """ 창이 바뀌었으면 카운터를 비움 (거래소 창은 벽시계 분/10초 경계 기준) """
+        minute, ten_seconds = int(now // 60), int(now // 10)
+        if minute != self.minute:
+            self.minute, self.used_weight, self.orders_1m = minute, 0, 0
+        if ten_seconds != self.ten_seconds:
+            self.ten_seconds, self.orders_10s = ten_seconds, 0
+
+    def _delay(self, priority, weight, order, now):
+        """ 지금 보내도 되면 0, 아니면 다시 확인할 때까지 기다릴 시간 (초) """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._roll(now)
+        if any(self.waiting[higher] for higher in range(priority)):
+            return 0.05  # 한도를 기다리는 더 급한 요청이 먼저
+        if self.used_weight + self.pending_weight + weight > self.limits["weight_1m"] * CEILINGS[priority]:
+            return 60 - now % 60
+        if order:
+            if self.orders_10s + 1 > self.limits["orders_10s"] * ORDER_CEILING:
+                return 10 - now % 10
+            if self.orders_1m + 1 > self.limits["orders_1m"] * ORDER_CEILING:
+                return 60 - now % 60
+        return 0
+
+    def _admit(self, weight, order):
+        self.pending_weight += weight
+        if order:
+            self.orders_10s += 1
+            self.orders_1m += 1
+
+    @staticmethod
+    def _check_wait(delay, started, max_wait):
+        waited = time.perf_counter() - started if started is not None else 0
+        if max_wait is not None and waited + delay > max_wait:
+            raise RateLimitExceeded(f"REST 한도 때문에 {delay:.1f}초 더 기다려야 합니다.")
+
+    def acquire(self, priority, weight, order=False, max_wait=None):
+        """ 보내도 될 때까지 기다린 뒤 가중치를 잡아 둠. max_wait 초 안에 보낼 수 없으면 RateLimitExceeded """
+        started = None
+        with self.cond:
+            try:
+                while (delay := self._delay(priority, weight, order, time.time())) > 0:
+                    self._check_wait(delay, started, max_wait)
+                    if started is None:
+                        started = time.perf_counter()
+                        self.waiting[priority] += 1
+                    self.cond.wait(delay)
+            finally:
+                if started is not None:
+                    self.waiting[priority] -= 1
+            self._admit(weight, order)
+        if started is not None:
+            metrics.observe("rest_throttled_seconds", time.perf_counter() - started, priority=priority)
+
+    async def acquire_async(self, priority, weight, order=False, max_wait=None):
+        """ acquire 의 asyncio 버전 (이벤트 루프를 막지 않도록 잠깐씩 다시 확인) """
+        started = None
+        try:
+            while True:
+                with self.cond:
+                    delay = self._delay(priority, weight, order, time.time())
+                    if delay <= 0:
+                        self._admit(weight, order)
+                        break
+                    self._check_wait(delay, started, max_wait)
+                    if started is None:
+                        started = time.perf_counter()
+                        self.waiting[priority] += 1
+                await asyncio.sleep(min(delay, 0.5))
+        finally:
+            if started is not None:
+                with self.cond:
+                    self.waiting[priority] -= 1
+        if started is not None:
+            metrics.observe("rest_throttled_seconds", time.perf_counter() - started, priority=priority)
+
+    def release(self, weight, headers=None, status=None):
+        """ 응답(또는 오류)을 받은 뒤 헤더로 사용량을 맞추고 429/418 이면 Retry-After 동안 멈춤 """
+        now = time.time()
+        with self.cond:
+            self.pending_weight -= weight
+            self._roll(now)
+            used = headers.get('X-MBX-USED-WEIGHT-1M') if headers is not None else None
+            if used is not None:
+                # 동시에 보낸 요청의 응답은 순서가 바뀔 수 있으므로 큰 값을 씀
+                self.used_weight = max(self.used_weight, int(used))
+                self.orders_10s = max(self.orders_10s, int(headers.get('X-MBX-ORDER-COUNT-10S') or 0))
+                self.orders_1m = max(self.orders_1m, int(headers.get('X-MBX-ORDER-COUNT-1M') or 0))
+            else:
+                self.used_weight += weight
+            if status in (418, 429):
+                retry_after = int((headers or {}).get('Retry-After') or 60)
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                print(f"🚫 REST 한도 초과 ({status}): {retry_after}초 동안 요청을 멈춥니다.")
+            self.cond.notify_all()
+
+    def _finish(self, weight, client, error=None):
+        """ 요청 결과로 release. 성공이면 클라이언트의 마지막 응답 헤더, API 오류면 그 응답의 헤더와 상태 코드 """
+        if error is None:
+            self.release(weight, getattr(getattr(client, 'response', None), 'headers', None))
+        elif isinstance(error, BinanceAPIException):
+            self.release(weight, getattr(error.response, 'headers', None), error.status_code)
+        else:
+            self.release(weight)
+
+    # ---------- 요청 ----------
+    def _send(self, name, method, params):
+        weight = self.weight(name, params)
+        self.acquire(PRIORITIES.get(name, ACCOUNT), weight, name in ORDER_METHODS,
+                     WRITE_MAX_WAIT if name in WRITE_METHODS else None)
+        try:
+            result = method(**params)
+        except BaseException as e:
+            self._finish(weight, self.client, e)
+            raise
+        self._finish(weight, self.client)
+        if name == "futures_exchange_info":
+            self.update_limits(result.get('rateLimits'))
+        return result
+
+    @contextlib.asynccontextmanager
+    async def reserve_async(self, name, params, client):
+        """ async with 블록 안에서 보내는 client(AsyncClient) 요청 한 건을 같은 한도 안에서 셈 """
+        weight = self.weight(name, params)
+        await self.acquire_async(PRIORITIES.get(name, ACCOUNT), weight, name in ORDER_METHODS,
+                                 WRITE_MAX_WAIT if name in WRITE_METHODS else None)
+        try:
+            yield
+        except BaseException as e:
+            self._finish(weight, client, e)
+            raise
+        self._finish(weight, client)
+
+    def wrap(self, name, method):
+        """ 클라이언트 메서드를 스케줄러를 거치도록 감쌈 """
+        if name in WRITE_METHODS:
+            return lambda **params: self._send(name, method, params)
+
+        def call(**params):
+            key = (name, tuple(sorted(params.items())))
+            with self.cond:
+                pending = self.inflight.get(key)
+                if pending is None:
+                    self.inflight[key] = pending = _Pending()
+                    owner = True
+                else:
+                    self.merged += 1
+                    owner = False
+            if not owner:
+                return pending.get()
+            try:
+                pending.result = self._send(name, method, params)
+                return pending.result
+            except BaseException as e:
+                pending.error = e
+                raise
+            finally:
+                with self.cond:
+                    self.inflight.pop(key, None)
+                pending.event.set()
+        return call
+
+    def install(self, names, client=None):
+        """ client(주지 않으면 생성할 때 준 클라이언트)의 names 메서드를 제자리에서 감쌈 """
+        if client is not None:
+            self.client = client
+        for name in names:
+            setattr(self.client, name, self.wrap(name, getattr(self.client, name)))
+        return self
+
+
+# 거래소 한도는 IP 단위라 같은 프로세스의 주문 경로(main)와 백필이 이 스케줄러 하나로 같이 센다
+scheduler = RestScheduler()
@@ -0,0 +1,195 @@
+import mmap
+import os
+import time
+import zlib
+
+import numpy as np
+
+from candle_store import epoch_ms_to_kst
+
+MAGIC = 0x3245544154534B42  # "BKSTATE2"
+HEADER_SLOTS = 8  # magic, tail, seq, version, length, updated_ms, 지표 키 crc32, 예비
+HEADER_SIZE = HEADER_SLOTS * 8
+KEYS_SIZE = 512  # 지표 키 이름 (쉼표로 이은 ASCII, 나머지는 0)
+INDICATOR_KEYS = ("sma", "wma", "ema", "rsi", "macd", "bb_upper", "bb_sma", "bb_lower", "vwap")
+CANDLE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def shared_file(symbol):
+    """ 심볼별 지표 공유 메모리 파일 이름 """
+    symbol = symbol.upper()
+    if symbol == 'BTCUSDT':
+        return "Technical_indicators.shm"
+    return f"Technical_indicators_{symbol}.shm"
+
+
+class LayoutChanged(Exception):
+    """ 쓰는 쪽이 다른 지표 키로 레이아웃을 다시 만듦 (읽는 쪽은 파일을 다시 열어야 함) """
+
+
+class SharedIndicators:
+    """ 데이터 파이프라인 프로세스가 쓰고 매매 프로세스가 읽는 고정 레이아웃 공유 메모리 (seqlock)
+
+    파일 구조: [헤더 8 x int64][지표 키 이름 512 bytes][가격 2 x float64][지표 len(keys) x tail float64]
+              [캔들 timestamp tail x int64][캔들 OHLCV 5 x tail float64]
+    지표/캔들은 최근 length 개가 오른쪽 끝에 붙어 있다.
+    지표 키는 쓰는 쪽이 정하고(지표 레지스트리가 요구된 지표만) 파일에 기록하므로 읽는 쪽은 keys 를 받지 않는다.
+    쓰는 쪽이 다른 키로 다시 시작하면 파일을 줄이지 않고 레이아웃만 다시 기록하며, 이전 레이아웃으로 연 쪽의 read() 는 LayoutChanged.
+
+    쓰는 쪽(한 프로세스만)은 seq 를 홀수로 올린 뒤 값을 쓰고 다시 짝수로 올린다.
+    읽는 쪽은 seq 가 짝수이고 복사 전후로 같을 때까지 다시 읽으므로 반쯤 쓴 값을 보지 않는다.
+    메모리 맵이라 읽을 때 시스템 호출이나 JSON 파싱이 없다.
+    """
+    def __init__(self, path, tail=15, keys=INDICATOR_KEYS, readonly=False):
+        self.path = path
+        self.readonly = readonly
+
+        if readonly:
+            self._file = open(path, 'rb')
+            stored = self._stored_layout()
+            if stored is None:
+                self._file.close()
+                raise FileNotFoundError(f"{path} 에 지표 공유 메모리가 아직 만들어지지 않았습니다.")
+            tail, keys = stored
+        else:
+            self._file = open(path, 'a+b')
+            stored = self._stored_layout()
+            if stored is not None and stored[1] == tuple(keys):
+                tail = stored[0]
+
+        self.tail = tail
+        self.keys = tuple(keys)
+        names = ",".join(self.keys).encode('ascii')
+        if len(names) > KEYS_SIZE:
+            raise ValueError(f"지표 키 이름이 너무 깁니다 ({len(names)} > {KEYS_SIZE} bytes)")
+        self.layout = zlib.crc32(names)
+        size = HEADER_SIZE + KEYS_SIZE + 8 * (2 + len(keys) * tail + tail + len(CANDLE_COLUMNS) * tail)
+
+        if readonly:
+            self._mm = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        else:
+            if os.path.getsize(path) < size:
+                self._file.truncate(size)
+            self._mm = mmap.mmap(self._file.fileno(), size)
+
+        offset = HEADER_SIZE + KEYS_SIZE
+        self._header = np.frombuffer(self._mm, dtype=np.int64, count=HEADER_SLOTS, offset=0)
+        self._prices = np.frombuffer(self._mm, dtype=np.float64, count=2, offset=offset)
+        offset += 8 * 2
+        self._indicators = np.frombuffer(
+            self._mm, dtype=np.float64, count=len(keys) * tail, offset=offset
+        ).reshape(len(keys), tail)
+        offset += 8 * len(keys) * tail
+        self._timestamps = np.frombuffer(self._mm, dtype=np.int64, count=tail, offset=offset)
+        offset += 8 * tail
+        self._candles = np.frombuffer(
+            self._mm, dtype=np.float64, count=len(CANDLE_COLUMNS) * tail, offset=offset
+        ).reshape(len(CANDLE_COLUMNS), tail)
+
+        if not readonly and stored != (tail, self.keys):
+            # 처음 만들거나 지표 키가 바뀜. version 은 이어서 올려 기다리던 쪽도 새 스냅샷으로 보게 함
+            version = int(self._header[3]) if stored is not None else 0
+            self._header[0] = 0
+            self._mm[HEADER_SIZE:HEADER_SIZE + KEYS_SIZE] = names.ljust(KEYS_SIZE, b'\0')
+            self._header[1] = tail
+            self._header[2] = 0
+            self._header[3] = version
+            self._header[6] = self.layout
+            self._header[0] = MAGIC
+
+    def _stored_layout(self):
+        """ 파일에 기록된 (tail, 지표 키). 아직 만들어지지 않았으면 None """
+        self._file.seek(0)
+        raw = self._file.read(HEADER_SIZE + KEYS_SIZE)
+        if len(raw) < HEADER_SIZE + KEYS_SIZE:
+            return None
+        header = np.frombuffer(raw[:HEADER_SIZE], dtype=np.int64)
+        if header[0] != MAGIC:
+            return None
+        names = raw[HEADER_SIZE:].rstrip(b'\0').decode('ascii')
+        return int(header[1]), tuple(names.split(',')) if names else ()
+
+    @property
+    def version(self):
+        """ 지금까지 기록된 스냅샷 수 (읽는 쪽이 새 값이 있는지 값싸게 확인할 때 사용) """
+        return int(self._header[3])
+
+    def write(self, indicators, candles, prices, updated_ms=None):
+        """ 지표(key -> 최근 값 리스트), 최근 캔들(store.last 형식), (최신가, 직전가)를 한 번에 기록 """
+        length = min(min(len(indicators[key]) for key in self.keys), self.tail)
+        count = min(len(candles['timestamp']), self.tail)
+        seq = int(self._header[2])
+
+        self._header[2] = seq + 1  # 홀수: 쓰는 중
+        self._prices[:] = prices
+        self._indicators[:] = np.nan
+        for row, key in enumerate(self.keys):
+            if length:
+                self._indicators[row, self.tail - length:] = indicators[key][-length:]
+        self._timestamps[:] = 0
+        self._candles[:] = np.nan
+        if count:
+            self._timestamps[self.tail - count:] = candles['timestamp'][-count:]
+            for row, name in enumerate(CANDLE_COLUMNS):
+                self._candles[row, self.tail - count:] = candles[name][-count:]
+        self._header[4] = length
+        self._header[5] = int(time.time() * 1000) if updated_ms is None else updated_ms
+        self._header[3] += 1
+        self._header[2] = seq + 2  # 짝수: 쓰기 완료
+
+    def read(self, retries=10_000):
+        """ 일관된 스냅샷 하나를 복사해 반환. 아직 기록된 적이 없으면 None
+
+        반환: {"version", "timestamp", "indicators": {key: [...]}, "prices": (최신가, 직전가), "candles": {...}}
+        """
+        for _ in range(retries):
+            if self._header[0] == MAGIC and int(self._header[6]) != self.layout:
+                raise LayoutChanged(f"{self.path} 의 지표 키가 바뀌었습니다.")
+            seq = int(self._header[2])
+            if seq & 1:
+                time.sleep(0)  # 쓰는 중이면 쓰는 쪽에 양보 (경합이 있을 때만 발생)
+                continue
+            if seq == 0:
+                return None
+            version = int(self._header[3])
+            length = int(self._header[4])
+            updated_ms = int(self._header[5])
+            prices = self._prices.copy()
+            indicators = self._indicators[:, self.tail - length:].copy()
+            timestamps = self._timestamps.copy()
+            candles = self._candles.copy()
+            if int(self._header[2]) != seq:
+                time.sleep(0)
+                continue
+
+            valid = timestamps > 0
+            return {
+                "version": version,
+                "timestamp": epoch_ms_to_kst(updated_ms),
+                "indicators": {key: indicators[row].tolist() for row, key in enumerate(self.keys)},
+                "prices": (float(prices[0]), float(prices[1])),
+                "candles": {
+                    "timestamp": timestamps[valid],
+                    **{name: candles[row][valid] for row, name in enumerate(CANDLE_COLUMNS)},
+                },
+            }
+        raise TimeoutError(f"{self.path} 스냅샷을 {retries}번 안에 일관되게 읽지 못했습니다.")
+
+    def wait(self, version=0, timeout=None, poll=0.05):
+        """ version 보다 새 스냅샷이 기록될 때까지 기다렸다가 반환. timeout(초) 안에 없으면 None
+
+        기다리는 동안에는 메모리의 version 만 poll 간격으로 확인한다
+        (메모리 맵 쓰기는 inotify 이벤트를 만들지 않으므로 파일 감시 대신 사용).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.version <= version:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+        return self.read()
+
+    def close(self):
+        self._header = None
+        self._prices = self._indicators = self._timestamps = self._candles = None
+        self._mm.close()
+        self._file.close()
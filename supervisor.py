@@ -0,0 +1,137 @@
+import threading
+import time
+
+
+class Heartbeats:
+    """ 구성 요소별 마지막 활동 시각(time.monotonic)을 메모리에 기록 """
+    def __init__(self):
+        self.last = {}
+
+    def beat(self, name):
+        self.last[name] = time.monotonic()
+
+    def age(self, name):
+        """ 마지막 heartbeat 이후 지난 시간(초). 한 번도 없으면 None """
+        last = self.last.get(name)
+        return None if last is None else time.monotonic() - last
+
+
+# 프로세스 기본 heartbeat 기록
+heartbeats = Heartbeats()
+
+
+class _Component:
+    def __init__(self, name, max_age, restart, probe, depends, startup_grace):
+        self.name = name
+        self.max_age = max_age
+        self.restart = restart
+        self.probe = probe
+        self.depends = depends
+        self.registered_at = time.monotonic()
+        self.startup_grace = startup_grace
+        self.last_value = None
+        self.failed_at = None     # 장애를 감지한 시각
+        self.attempts = 0         # 이번 장애에서 재시작한 횟수
+        self.next_retry = 0.0
+
+
+class Supervisor:
+    """ 구성 요소별로 heartbeat 를 감시하고 멈춘 것만 다시 시작하는 프로세스 내부 감독자
+
+    - 웹소켓처럼 hot path 에 heartbeat 를 넣기 싫은 곳은 probe(예: 링버퍼 head)를 주면
+      감시 주기마다 값이 바뀌었는지로 활동을 판단한다.
+    - 재시작은 지수 백오프(backoff_base * 2^n, 최대 backoff_max)로 반복하고,
+      max_restarts 번 안에 살아나지 않으면 on_give_up 을 호출한다 (예: 프로세스 재시작).
+    - depends 로 지정한 상위 구성 요소가 장애 중이면 하위 구성 요소는 재시작하지 않는다.
+    - 장애 감지부터 첫 heartbeat 까지의 복구 시간을 recoveries 에 기록한다.
+    """
+    def __init__(self, interval=5, backoff_base=1, backoff_max=60, max_restarts=5, on_give_up=None):
+        self.interval = interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_restarts = max_restarts
+        self.on_give_up = on_give_up
+        self.components = {}
+        self.recoveries = []  # (이름, 복구 시간 초)
+        self.running = False
+
+    def register(self, name, max_age, restart, probe=None, depends=None, startup_grace=None):
+        self.components[name] = _Component(
+            name, max_age, restart, probe, depends, max_age if startup_grace is None else startup_grace
+        )
+
+    def _age(self, component, now):
+        if component.probe is not None:
+            value = component.probe()
+            if value != component.last_value:
+                component.last_value = value
+                heartbeats.beat(component.name)
+        age = heartbeats.age(component.name)
+        if age is None:
+            # 아직 한 번도 활동이 없으면 등록 후 startup_grace 동안은 정상으로 간주
+            since = now - component.registered_at
+            return since - component.startup_grace + component.max_age
+        return age
+
+    def _restart(self, component, now):
+        component.attempts += 1
+        delay = min(self.backoff_base * 2 ** (component.attempts - 1), self.backoff_max)
+        component.next_retry = now + delay
+        print(f"🔄 {component.name} 재시작 ({component.attempts}번째, 다음 확인까지 {delay}초)")
+        try:
+            component.restart()
+        except Exception as e:
+            print(f"⚠️ {component.name} 재시작 실패: {e}")
+
+    def check(self):
+        now = time.monotonic()
+        for component in self.components.values():
+            age = self._age(component, now)
+
+            if component.failed_at is not None:
+                # 장애 감지 이후 heartbeat 가 들어왔으면 복구 완료
+                last_beat = now - age
+                if last_beat > component.failed_at:
+                    recovery = last_beat - component.failed_at
+                    self.recoveries.append((component.name, recovery))
+                    print(f"✅ {component.name} 복구 완료: {recovery:.2f}초 (재시작 {component.attempts}회)")
+                    component.failed_at = None
+                    component.attempts = 0
+                elif now >= component.next_retry:
+                    if component.attempts >= self.max_restarts:
+                        print(f"⛔ {component.name} 이(가) {self.max_restarts}번 재시작해도 복구되지 않았습니다.")
+                        if self.on_give_up:
+                            self.on_give_up()
+                        component.attempts = 0
+                    self._restart(component, now)
+                continue
+
+            if age > component.max_age:
+                upstream = self.components.get(component.depends)
+                if upstream is not None and upstream.failed_at is not None:
+                    continue
+                print(f"⛔ {component.name} 이(가) {age:.1f}초 동안 응답이 없습니다.")
+                component.failed_at = now
+                self._restart(component, now)
+
+    def summary(self):
+        """ 구성 요소별 복구 횟수와 평균/최대 복구 시간 """
+        stats = {}
+        for name, seconds in self.recoveries:
+            stats.setdefault(name, []).append(seconds)
+        return {
+            name: {"count": len(values), "mean": sum(values) / len(values), "max": max(values)}
+            for name, values in stats.items()
+        }
+
+    def run(self):
+        self.running = True
+        while self.running:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ 감독자 오류: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
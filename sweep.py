@@ -0,0 +1,156 @@
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import load_candles, signal_inputs, signals_from_inputs, simulate, _rolling_sum
+
+# main.py 에 상수로 박혀 있는 값들의 기본 탐색 범위
+DEFAULT_GRID = {
+    "rsi_long": [30, 35, 40, 45],
+    "rsi_short": [55, 60, 65, 70],
+    "signal_window": [9, 12, 15],
+    "leverage": [25, 50, 75],
+    "take_profit": [5.0, 8.0, 11.8, 15.0],
+    "stop_loss": [5.0, 9.25, 12.0],
+}
+SIGNAL_PARAMS = ("rsi_long", "rsi_short", "signal_window")
+RESULT_COLUMNS = ("final_balance", "return_pct", "max_drawdown_pct", "trades", "win_rate_pct", "fees")
+
+# 워커 프로세스 상태 (initializer 에서 공유 메모리에 붙음)
+_segments = []
+_arrays = {}
+_signal_cache = {}
+_line_cache = {}
+
+
+def _share(arrays):
+    """ 배열들을 공유 메모리에 복사하고 (세그먼트 목록, 워커에 넘길 (이름, shape, dtype) 명세) 반환 """
+    segments, specs = [], {}
+    for key, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        segment = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=segment.buf)[:] = values
+        segments.append(segment)
+        specs[key] = (segment.name, values.shape, values.dtype.str)
+    return segments, specs
+
+
+def _attach(specs):
+    """ 워커 시작 시 한 번 공유 메모리에 붙어 복사 없이 배열 뷰를 만듦 """
+    for key, (name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=name)
+        _segments.append(segment)
+        _arrays[key] = np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+
+
+def _cached(cache, key, compute, limit=32):
+    if key not in cache:
+        if len(cache) >= limit:
+            cache.pop(next(iter(cache)))
+        cache[key] = compute()
+    return cache[key]
+
+
+def _signals(rsi_long, rsi_short, signal_window):
+    """ 같은 진입 파라미터의 신호(와 MACD 시그널선)는 워커 안에서 한 번만 계산 """
+    def compute():
+        line = _cached(_line_cache, signal_window,
+                       lambda: _rolling_sum(_arrays["macd"], signal_window) / signal_window)
+        return signals_from_inputs(_arrays, rsi_long, rsi_short, signal_window, signal_line=line)
+    return _cached(_signal_cache, (rsi_long, rsi_short, signal_window), compute)
+
+
+def _run_chunk(chunk, fee_rate, initial_balance, allocation):
+    rows = []
+    for params in chunk:
+        signals = _signals(*(params[key] for key in SIGNAL_PARAMS))
+        result = simulate(_arrays["timestamps"], _arrays["close"], signals, params["leverage"],
+                          params["take_profit"], params["stop_loss"], fee_rate, initial_balance, allocation,
+                          high=_arrays.get("high"), low=_arrays.get("low"))
+        rows.append({**params, **{key: result["stats"][key] for key in RESULT_COLUMNS}})
+    return rows
+
+
+def grid_params(grid):
+    """ 모든 조합. 진입 파라미터가 같은 조합끼리 붙어 있도록 SIGNAL_PARAMS 를 바깥 루프로 둠 """
+    keys = list(SIGNAL_PARAMS) + [key for key in grid if key not in SIGNAL_PARAMS]
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def random_params(grid, samples, seed=0):
+    """ 각 파라미터를 grid 의 최소~최대 범위에서 무작위로 뽑음 (정수 범위는 정수로) """
+    rng = np.random.default_rng(seed)
+    params = []
+    for _ in range(samples):
+        sample = {}
+        for key, values in grid.items():
+            low, high = min(values), max(values)
+            if all(isinstance(value, int) for value in values):
+                sample[key] = int(rng.integers(low, high + 1))
+            else:
+                sample[key] = round(float(rng.uniform(low, high)), 2)
+        params.append(sample)
+    return sorted(params, key=lambda sample: tuple(sample[key] for key in SIGNAL_PARAMS))
+
+
+def run_sweep(timestamps, close, volume, params, workers=None, chunk_size=None,
+              fee_rate=0.0005, initial_balance=1000.0, allocation=0.9, history=500, tail=15, high=None, low=None):
+    """ 파라미터 조합 목록을 프로세스 풀에 나눠 백테스트하고 수익률 순으로 정렬한 DataFrame 반환
+
+    파라미터와 무관한 지표 배열은 부모에서 한 번 계산해 공유 메모리로 넘기므로 작업마다 피클링하지 않는다.
+    조합은 진입 파라미터 순으로 정렬된 연속 구간(chunk) 단위로 나눠, 워커가 같은 신호를 캐시로 재사용한다.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, -(-len(params) // (workers * 4)))
+    arrays = signal_inputs(close, volume, history, tail)
+    arrays["timestamps"] = np.asarray(timestamps, dtype=np.int64)
+    if high is not None and low is not None:
+        # 보호 주문 발동을 캔들 안의 고가/저가로 판단
+        arrays["high"] = np.asarray(high, dtype=np.float64)
+        arrays["low"] = np.asarray(low, dtype=np.float64)
+    segments, specs = _share(arrays)
+
+    try:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_attach, initargs=(specs,)) as pool:
+            chunks = [params[i:i + chunk_size] for i in range(0, len(params), chunk_size)]
+            futures = [pool.submit(_run_chunk, chunk, fee_rate, initial_balance, allocation) for chunk in chunks]
+            rows = [row for future in futures for row in future.result()]
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    results = pd.DataFrame(rows)
+    if len(results):
+        results = results.sort_values(["return_pct", "max_drawdown_pct"], ascending=[False, True])
+        results.insert(0, "rank", range(1, len(results) + 1))
+    return results.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # 사용법: python sweep.py 캔들파일(.bin/.json/.csv) [--random N] [--workers K] [--out sweep_results.csv]
+    args = os.sys.argv[1:]
+
+    def option(name, default):
+        return type(default)(args[args.index(name) + 1]) if name in args else default
+
+    timestamps, close, volume, high, low = load_candles(args[0])
+    samples = option("--random", 0)
+    params = random_params(DEFAULT_GRID, samples) if samples else grid_params(DEFAULT_GRID)
+    workers = option("--workers", os.cpu_count() or 1)
+    output = option("--out", "sweep_results.csv")
+
+    started = time.perf_counter()
+    results = run_sweep(timestamps, close, volume, params, workers=workers, high=high, low=low)
+    elapsed = time.perf_counter() - started
+
+    results.to_csv(output, index=False)
+    print(f"✅ {len(params)}개 조합 x 캔들 {len(close)}개 ({workers}개 프로세스, {elapsed:.2f}초) → {output}")
+    print(results.head(10).to_string(index=False))
@@ -2,6 +2,7 @@ from binance.client import Client
 from dotenv import load_dotenv
 import os
 import time
+from rest_scheduler import RestScheduler
 
 # .env 파일 로드
 load_dotenv()
@@ -11,6 +12,9 @@ BINANCE_API_KEY = os.getenv("BIN_API_KEY")
 BINANCE_API_SECRET = os.getenv("BIN_SEC_KEY")
 
 client = Client(BINANCE_API_KEY, BINANCE_API_SECRET)
+# 요청 가중치 한도 안에서 주문을 먼저 보내고 같은 조회는 합치도록
+RestScheduler(client).install(("futures_account", "futures_account_balance", "futures_symbol_ticker",
+                               "futures_change_leverage", "futures_create_order", "futures_position_information"))
 
 def get_futures_account_info():
     try:
@@ -0,0 +1,17 @@
+import os
+import socket
+import sys
+
+import pytest
+
+# 저장소 루트의 평평한 모듈들(backfill, execution, ...)을 tests/ 에서 바로 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# main 을 import 해도 Client 가 실제 거래소에 ping 하지 않도록 로컬 주소로 돌려 둠 (bench_suite 와 같음)
+os.environ.setdefault("BINANCE_FAPI_URL", "http://127.0.0.1:9")
+
+
+@pytest.fixture
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
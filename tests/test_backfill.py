@@ -0,0 +1,170 @@
+import json
+import time
+import types
+
+import numpy as np
+import pytest
+import requests
+
+import backfill
+from backfill import BinanceBackfill
+from exchange_sim import ExchangeSimulator
+from ohlcv_update import BinanceWebSocket_ohlcv
+from rest_scheduler import RestScheduler
+
+INTERVAL = 10_000
+NOW_MS = 1_700_000_005_000        # 진행 중인 버킷 한가운데
+END_MS = NOW_MS // INTERVAL * INTERVAL
+CANDLES = 30
+TRADES_PER_CANDLE = 100           # 캔들 30개 = 체결 3000개 -> limit 1000 페이지 여러 장
+
+
+class RecordingSession(requests.Session):
+    """ 보낸 aggTrades 요청 인자를 기록 """
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append(dict(params or {}))
+        return super().get(url, params=params, **kwargs)
+
+
+def make_trades(start_ms, end_ms):
+    """ [start_ms, end_ms) 에 100ms 간격 체결 (가격은 버킷마다 다르게) """
+    return [
+        {"e": "trade", "s": "BTCUSDT", "T": timestamp, "p": f"{60_000 + timestamp % 997:.1f}", "q": "0.010", "m": False}
+        for timestamp in range(start_ms, end_ms, INTERVAL // TRADES_PER_CANDLE)
+    ]
+
+
+@pytest.fixture
+def stub(free_port):
+    """ 이미 재생한 것처럼 체결 이력을 가진 시뮬레이터 (현재 버킷의 체결까지 포함) """
+    trades = make_trades(END_MS - CANDLES * INTERVAL, NOW_MS)
+    simulator = ExchangeSimulator([json.dumps(trade) for trade in trades], port=free_port)
+    simulator.sent_times = [trade['T'] for trade in trades]
+    simulator.start()
+    return simulator
+
+
+@pytest.fixture
+def ohlcv(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill, "time", types.SimpleNamespace(time=lambda: NOW_MS / 1000,
+                                                                perf_counter=time.perf_counter))
+    feed = BinanceWebSocket_ohlcv(symbol="btcusdt", data_file=str(tmp_path / "candles.bin"), legacy_json=None,
+                                  rollup_files={}, start_timer=False)
+    yield feed
+    feed.stop()
+
+
+def make_backfill(stub, **kwargs):
+    return BinanceBackfill(base_url=f"http://127.0.0.1:{stub.port}", session=RecordingSession(),
+                           scheduler=RestScheduler(), **kwargs)
+
+
+def test_warm_up_slices_agg_trades_by_trade_rate(stub, ohlcv):
+    filler = make_backfill(stub)
+
+    assert filler.warm_up(ohlcv, CANDLES) == CANDLES
+
+    candles = ohlcv.store.last()
+    start_ms = END_MS - CANDLES * INTERVAL
+    assert candles['timestamp'].tolist() == list(range(start_ms, END_MS, INTERVAL))
+    assert np.allclose(candles['volume'], TRADES_PER_CANDLE * 0.01)
+    # 최근 1분(체결 600개)으로 빈도를 재고, 나머지는 페이지 하나(800개)씩 80초 구간으로 나눠 동시에 받음.
+    # 진행 중인 버킷은 요청하지 않음
+    calls = filler.session.calls
+    probe_start = END_MS - 60_000
+    assert (calls[0]['startTime'], calls[0]['endTime']) == (probe_start, END_MS - 1)
+    assert sorted((call['startTime'], call['endTime'] + 1) for call in calls[1:]) == [
+        (start, start + 80_000) for start in range(END_MS - CANDLES * INTERVAL, probe_start, 80_000)]
+    assert ohlcv.aggregator.closed_until == END_MS
+    assert filler.scheduler.pending_weight == 0 and filler.scheduler.used_weight >= 20 * len(calls)
+
+
+def test_agg_trades_pages_past_limit(stub):
+    # 빈도를 재는 구간이 전체(체결 3000개)면 limit 1000 페이지를 마지막 체결 시각부터 이어서 받음
+    filler = make_backfill(stub, probe_ms=CANDLES * INTERVAL)
+    start_ms = END_MS - CANDLES * INTERVAL
+
+    timestamps, prices, quantities = filler.fetch_agg_trades("BTCUSDT", start_ms, END_MS)
+
+    assert timestamps.tolist() == list(range(start_ms, END_MS, INTERVAL // TRADES_PER_CANDLE))
+    calls = filler.session.calls
+    assert len(calls) > CANDLES * TRADES_PER_CANDLE // 1000
+    assert [call['startTime'] for call in calls] == sorted(call['startTime'] for call in calls)
+    assert all(int(call['endTime']) == END_MS - 1 for call in calls)
+
+
+def test_live_trades_continue_after_backfill(stub, ohlcv):
+    # 백필하는 동안 링버퍼에 쌓인 실시간 체결: 백필 구간과 겹치는 것 5개 + 진행 중인 버킷 3개
+    overlap = [(END_MS - 500 + i * 100, 60_000.0, 1.0) for i in range(5)]
+    live = [(END_MS + 100 + i * 100, 61_000.0 + i, 0.5) for i in range(3)]
+    for trade in overlap + live:
+        ohlcv.trades.push(*trade)
+
+    make_backfill(stub).warm_up(ohlcv, CANDLES)
+    ohlcv.drain()
+
+    # 겹치는 체결은 이미 백필된 버킷이라 늦은 체결로 버리고, 새 버킷만 실시간 체결로 만든다
+    assert ohlcv.aggregator.late_trades == len(overlap)
+    assert list(ohlcv.aggregator.buckets) == [END_MS]
+    assert ohlcv.aggregator.buckets[END_MS] == [61_000.0, 61_002.0, 61_000.0, 61_002.0, 1.5]
+    assert ohlcv.store.count == CANDLES
+    assert float(ohlcv.store.last(1)['volume'][0]) == pytest.approx(TRADES_PER_CANDLE * 0.01)
+
+
+def test_warm_up_resumes_after_stored_candles(stub, ohlcv):
+    start_ms = END_MS - CANDLES * INTERVAL
+    stored = 20
+    for i in range(stored):
+        ohlcv.store.append(start_ms + i * INTERVAL, 1.0, 1.0, 1.0, 1.0, 1.0)
+    filler = make_backfill(stub)
+
+    assert filler.warm_up(ohlcv, CANDLES) == CANDLES - stored
+
+    resume_ms = start_ms + stored * INTERVAL
+    assert min(int(call['startTime']) for call in filler.session.calls) == resume_ms
+    timestamps = ohlcv.store.last()['timestamp'].tolist()
+    assert timestamps == list(range(start_ms, END_MS, INTERVAL))
+    assert ohlcv.aggregator.closed_until == END_MS
+
+
+def test_warm_up_skips_when_store_is_current(stub, ohlcv):
+    ohlcv.store.append(END_MS - INTERVAL, 1.0, 1.0, 1.0, 1.0, 1.0)
+    filler = make_backfill(stub)
+
+    assert filler.warm_up(ohlcv, CANDLES) == 0
+    assert filler.session.calls == []
+    assert ohlcv.aggregator.closed_until == END_MS
+
+
+def test_reconnect_gap_fill_holds_drain(stub, ohlcv, monkeypatch):
+    import ohlcv_update
+    monkeypatch.setattr(ohlcv_update, "BinanceBackfill", lambda: make_backfill(stub))
+    start_ms = END_MS - CANDLES * INTERVAL
+    for i in range(10):
+        ohlcv.store.append(start_ms + i * INTERVAL, 1.0, 1.0, 1.0, 1.0, 1.0)
+    resume_ms = start_ms + 10 * INTERVAL
+    # 끊기기 전에 받은 체결로 만들다 만 버킷 (REST 가 다시 주므로 두 번 세면 안 됨)
+    ohlcv.aggregator.closed_until = resume_ms
+    ohlcv.aggregator.add_trades(np.array([resume_ms + 50], dtype=np.int64), np.array([60_000.0]), np.array([9.0]))
+    # 재연결 뒤 실시간 체결: 지금 버킷과, 그 버킷을 마감시킬 만큼 늦은 다음 버킷
+    ohlcv.trades.push(END_MS + 100, 61_000.0, 0.5)
+    ohlcv.trades.push(END_MS + INTERVAL + 2_000, 61_001.0, 0.5)
+
+    ohlcv.gap_fills += 1  # on_open 이 백필 스레드를 띄우기 전에 하는 일
+    ohlcv.drain()
+    assert ohlcv.trades.head > ohlcv.trades.tail and ohlcv.store.count == 10
+
+    ohlcv.fill_gap()
+    ohlcv.drain()
+
+    # 백필 캔들이 실시간 캔들보다 먼저, 시간순으로 저장됨
+    candles = ohlcv.store.last()
+    assert candles['timestamp'].tolist() == list(range(start_ms, END_MS + INTERVAL, INTERVAL))
+    assert np.allclose(candles['volume'][10:-1], TRADES_PER_CANDLE * 0.01)
+    assert candles['volume'][-1] == 0.5
+    assert ohlcv.gap_fills == 0 and ohlcv.aggregator.late_trades == 0
+    assert list(ohlcv.aggregator.buckets) == [END_MS + INTERVAL]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from backtest import LONG, HOLD, SHORT, simulate
+from protective_orders import trigger_prices
+
+LEVERAGE, TAKE_PROFIT, STOP_LOSS = 10, 10.0, 5.0   # 발동가: 진입가 +1% / -0.5%
+
+
+def run(close, high, low, signals):
+    n = len(close)
+    return simulate(np.arange(n, dtype=np.int64) * 10_000, np.array(close, dtype=np.float64),
+                    np.array(signals, dtype=np.int8), LEVERAGE, TAKE_PROFIT, STOP_LOSS, fee_rate=0.0,
+                    high=np.array(high, dtype=np.float64), low=np.array(low, dtype=np.float64))
+
+
+def test_take_profit_fires_intrabar_at_trigger_price():
+    # 두 번째 캔들의 고가만 익절가에 닿고 종가는 진입가 그대로
+    result = run([100.0, 100.0, 100.0], [100.0, 101.5, 100.0], [100.0, 99.8, 100.0], [LONG, HOLD, HOLD])
+
+    trade = result["trades"].iloc[0]
+    assert trade["reason"] == "take_profit" and trade["exit_time"] == 10_000
+    assert trade["exit_price"] == pytest.approx(trigger_prices(100.0, LONG, LEVERAGE, TAKE_PROFIT, -STOP_LOSS)[0])
+    assert trade["profit_rate"] == pytest.approx(TAKE_PROFIT)
+
+
+def test_both_triggers_in_one_candle_count_as_stop_loss():
+    result = run([100.0, 100.0], [100.0, 100.6], [100.0, 98.0], [SHORT, HOLD])
+
+    trade = result["trades"].iloc[0]
+    assert trade["reason"] == "stop_loss"
+    assert trade["exit_price"] == pytest.approx(100.5)
+
+
+def test_trigger_beats_reverse_signal_on_the_same_candle():
+    result = run([100.0, 100.2], [100.0, 100.3], [100.0, 99.4], [LONG, SHORT])
+
+    assert result["trades"].iloc[0]["reason"] == "stop_loss"
+
+
+def test_reverse_signal_exits_at_close_without_trigger():
+    result = run([100.0, 100.2, 100.1], [100.0, 100.3, 100.2], [100.0, 99.9, 100.0], [LONG, SHORT, HOLD])
+
+    trade = result["trades"].iloc[0]
+    assert trade["reason"] == "reverse" and trade["exit_price"] == 100.2
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from candle_aggregator import CandleAggregator
+from candle_store import epoch_ms_to_kst
+
+BASE = 900_000 * 1_888_888  # 15분 경계에 맞춘 거래소 시각 (ms)
+INTERVAL = 10_000
+
+
+@pytest.fixture
+def emitted():
+    return []
+
+
+@pytest.fixture
+def aggregator(emitted):
+    return CandleAggregator(interval=INTERVAL, grace=1_000,
+                            on_candle=lambda interval, candle: emitted.append((interval, candle)))
+
+
+def candle(start, open_price, high, low, close, volume):
+    return {"timestamp": epoch_ms_to_kst(start), "open": open_price, "high": high, "low": low, "close": close,
+            "volume": volume}
+
+
+def test_late_trade_within_grace_joins_its_bucket(aggregator, emitted):
+    aggregator.add_trade(BASE + 1_000, 100.0, 1.0)
+    aggregator.add_trade(BASE + INTERVAL + 500, 105.0, 1.0)  # 다음 버킷이지만 아직 grace 안
+    aggregator.add_trade(BASE + 9_900, 98.0, 2.0)            # 늦게 도착한 이전 버킷 체결
+    assert emitted == [] and aggregator.late_trades == 0
+
+    aggregator.add_trade(BASE + INTERVAL + 1_000, 106.0, 1.0)  # 워터마크가 버킷 끝 + grace 에 닿아 마감
+
+    assert emitted == [(INTERVAL, candle(BASE, 100.0, 100.0, 98.0, 98.0, 3.0))]
+    assert aggregator.closed_until == BASE + INTERVAL
+
+
+def test_trade_after_grace_is_counted_late_and_dropped(aggregator, emitted):
+    aggregator.add_trade(BASE + 1_000, 100.0, 1.0)
+    aggregator.add_trade(BASE + INTERVAL + 1_000, 105.0, 1.0)
+    aggregator.add_trade(BASE + 9_999, 1.0, 50.0)
+    aggregator.add_trades(np.array([BASE + 5_000, BASE + 6_000], dtype=np.int64), np.array([2.0, 3.0]),
+                          np.array([1.0, 1.0]))
+
+    assert aggregator.late_trades == 3
+    assert emitted == [(INTERVAL, candle(BASE, 100.0, 100.0, 100.0, 100.0, 1.0))]
+    assert aggregator.buckets == {BASE + INTERVAL: [105.0, 105.0, 105.0, 105.0, 1.0]}
+
+
+def test_buckets_split_on_exchange_time(aggregator, emitted):
+    # 도착 순서와 상관없이 체결 시각 T 가 버킷을 정함 (경계 시각은 다음 버킷)
+    timestamps = np.array([BASE, BASE + INTERVAL - 1, BASE + INTERVAL, BASE + 2 * INTERVAL - 1], dtype=np.int64)
+    aggregator.add_trades(timestamps, np.array([1.0, 2.0, 3.0, 4.0]), np.array([1.0, 1.0, 1.0, 1.0]))
+    aggregator.flush(BASE + 3 * INTERVAL)
+
+    assert emitted == [
+        (INTERVAL, candle(BASE, 1.0, 2.0, 1.0, 2.0, 2.0)),
+        (INTERVAL, candle(BASE + INTERVAL, 3.0, 4.0, 3.0, 4.0, 2.0)),
+    ]
+
+
+def test_rollups_match_trades_grouped_by_timeframe(aggregator, emitted):
+    # 15분 동안 1초마다 체결
+    timestamps = np.arange(BASE, BASE + 900_000, 1_000, dtype=np.int64)
+    prices = 100.0 + (timestamps - BASE) // 1_000 % 97 - (timestamps - BASE) // 1_000 % 13
+    quantities = np.full(len(timestamps), 0.5)
+    for begin in range(0, len(timestamps), 250):  # 링버퍼에서 나눠 꺼낸 것처럼
+        aggregator.add_trades(timestamps[begin:begin + 250], prices[begin:begin + 250], quantities[begin:begin + 250])
+    aggregator.flush(BASE + 900_000 + aggregator.grace)
+
+    for timeframe in (INTERVAL, 60_000, 300_000, 900_000):
+        expected = []
+        for start in range(BASE, BASE + 900_000, timeframe):
+            group = prices[(timestamps >= start) & (timestamps < start + timeframe)]
+            expected.append(candle(start, group[0], group.max(), group.min(), group[-1], 0.5 * len(group)))
+        assert [c for interval, c in emitted if interval == timeframe] == expected, timeframe
+
+
+def test_rollup_must_be_multiple_of_interval():
+    with pytest.raises(ValueError):
+        CandleAggregator(interval=INTERVAL, rollups=(15_000,))
@@ -0,0 +1,172 @@
+import json
+import threading
+import types
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+from execution import OrderExecutor, OrderPending, RECV_WINDOW, filled
+
+SYMBOL = "BTCUSDT"
+KEY = 1_700_000_000_000
+
+
+def api_error(code, status=400):
+    response = types.SimpleNamespace(status_code=status, text=json.dumps({"code": code, "msg": "test"}), request=None)
+    return BinanceAPIException(response, status, response.text)
+
+
+def fill(params):
+    return {"clientOrderId": params['newClientOrderId'], "orderId": 1, "status": "FILLED",
+            "executedQty": str(params['quantity']), "avgPrice": "60000.0"}
+
+
+class FakeClient:
+    """ 주문 응답은 respond(params) 로 정하고, 조회는 exchange 에 있는 주문만 돌려줌 """
+    def __init__(self, respond=fill):
+        self.respond = respond
+        self.sent = []
+        self.exchange = {}  # clientOrderId -> 거래소에 있는 주문
+
+    def futures_create_order(self, **params):
+        self.sent.append(params)
+        return self.respond(params)
+
+    def futures_get_order(self, symbol, origClientOrderId):
+        if origClientOrderId not in self.exchange:
+            raise api_error(-2013)
+        return self.exchange[origClientOrderId]
+
+    def futures_get_all_orders(self, symbol, startTime):
+        return list(self.exchange.values())
+
+
+def timeout(params):
+    raise ConnectionError("read timed out")
+
+
+def make_executor(respond=fill):
+    return OrderExecutor(FakeClient(respond), confirm_timeout=0.01)
+
+
+def age(executor, client_order_id, seconds=RECV_WINDOW + 1):
+    executor.orders[client_order_id]['sent_at'] -= seconds
+
+
+def test_intent_id_fits_exchange_limit():
+    client_order_id = OrderExecutor.intent_id("en", "1000SHIBUSDT", KEY, "SELL")
+    assert client_order_id == f"en_1000SHIBUSDT_{KEY}_S"
+    assert len(client_order_id) <= 36
+
+
+def test_same_intent_is_sent_once():
+    executor = make_executor()
+
+    first = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+    second = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+
+    assert filled(first) and first['clientOrderId'] == f"en_{SYMBOL}_{KEY}_B"
+    assert second['duplicate'] and second['clientOrderId'] == first['clientOrderId']
+    assert len(executor.client.sent) == 1
+
+
+def test_rejected_intent_retries_with_suffix():
+    def reject_once(params):
+        if len(executor.client.sent) == 1:
+            raise api_error(-2019)  # Margin is insufficient: 거래소가 확실히 거절
+        return fill(params)
+    executor = make_executor(reject_once)
+
+    with pytest.raises(BinanceAPIException):
+        executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+    assert executor.get(f"en_{SYMBOL}_{KEY}_B")['status'] == "REJECTED"
+
+    record = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+    assert filled(record) and record['clientOrderId'] == f"en_{SYMBOL}_{KEY}_B_1"
+
+
+def test_unknown_send_is_looked_up_not_resent():
+    executor = make_executor(timeout)
+
+    record = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+
+    assert record['status'] == "UNKNOWN" and "read timed out" in record['error']
+    assert len(executor.client.sent) == 1
+
+
+def test_unknown_order_found_by_lookup():
+    executor = make_executor(timeout)
+    record = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+    executor.client.exchange[record['clientOrderId']] = fill(executor.client.sent[0])
+
+    executor.lookup(record['clientOrderId'])
+
+    assert filled(executor.get(record['clientOrderId']))
+
+
+def test_pending_order_blocks_new_intent_without_raising():
+    executor = make_executor(timeout)
+    pending = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+
+    # 다른 신호로 청산하려 해도 결과를 모르는 진입 주문이 RECV_WINDOW 안이면 보내지 않고 그 상태를 돌려줌
+    record = executor.submit("ex", SYMBOL, "SELL", 0.01, KEY + 10_000, reduceOnly='true')
+
+    assert record['clientOrderId'] == pending['clientOrderId'] and record['status'] == "UNKNOWN"
+    assert len(executor.client.sent) == 1
+    with pytest.raises(OrderPending):
+        executor.prepare("ex", SYMBOL, "SELL", 0.01, KEY + 10_000)
+
+
+def test_missing_order_after_recv_window_is_lost_and_resent():
+    executor = make_executor(timeout)
+    first = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+    age(executor, first['clientOrderId'])
+    executor.client.respond = fill
+
+    record = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+
+    assert executor.get(first['clientOrderId'])['status'] == "LOST"
+    assert filled(record) and record['clientOrderId'] == first['clientOrderId'] + "_1"
+    assert len(executor.client.sent) == 2
+
+
+def test_not_found_inside_recv_window_stays_unknown():
+    executor = make_executor(timeout)
+    record = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+
+    executor.on_lookup(record['clientOrderId'], error=api_error(-2013))
+    assert executor.get(record['clientOrderId'])['status'] == "UNKNOWN"
+
+    age(executor, record['clientOrderId'])
+    executor.on_lookup(record['clientOrderId'], error=api_error(-2013))
+    assert executor.get(record['clientOrderId'])['status'] == "LOST"
+
+
+def test_status_never_moves_backwards():
+    executor = make_executor()
+    record, _ = executor.prepare("en", SYMBOL, "BUY", 0.02, KEY)
+    client_order_id = record['clientOrderId']
+
+    executor.on_order_update({"c": client_order_id, "X": "PARTIALLY_FILLED", "z": "0.01", "ap": "60000", "i": 7})
+    executor.on_response(client_order_id, {"status": "NEW", "executedQty": "0", "orderId": 7})
+    assert executor.get(client_order_id)['status'] == "PARTIALLY_FILLED"
+    assert executor.get(client_order_id)['executedQty'] == 0.01
+
+    executor.on_order_update({"c": client_order_id, "X": "FILLED", "z": "0.02", "ap": "60001", "i": 7})
+    executor.on_order_update({"c": client_order_id, "X": "EXPIRED", "z": "0.02", "i": 7})
+    final = executor.get(client_order_id)
+    assert final['status'] == "FILLED" and final['executedQty'] == 0.02 and final['avgPrice'] == 60001.0
+
+
+def test_stream_update_confirms_while_waiting():
+    def accept(params):
+        # 응답은 NEW 이고 체결은 조금 뒤 user-data 스트림으로 옴
+        update = {"c": params['newClientOrderId'], "X": "FILLED", "z": str(params['quantity']), "ap": "60000", "i": 1}
+        threading.Timer(0.05, executor.on_order_update, args=(update,)).start()
+        return {"status": "NEW", "executedQty": "0", "orderId": 1}
+    executor = make_executor(accept)
+    executor.confirm_timeout = 2.0
+
+    record = executor.submit("en", SYMBOL, "BUY", 0.01, KEY)
+
+    assert filled(record) and record['avgPrice'] == 60000.0
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shared_state import INDICATOR_KEYS
+from trading_info import StreamingIndicators, TradingIndicators, _indicator_graph, compute_indicators
+
+HISTORY = 500  # 캔들 저장소 용량과 같은 창
+
+
+def make_candles(count, seed=7):
+    """ 랜덤 워크 종가와 거래량 (거래량 0 인 캔들도 섞음) """
+    rng = np.random.default_rng(seed)
+    close = 60_000 + np.cumsum(rng.normal(0, 25, count))
+    volume = rng.exponential(2.0, count)
+    volume[::37] = 0.0
+    return pd.DataFrame({"close": close, "volume": volume})
+
+
+def baseline(data):
+    """ 원래 pandas get_* 함수로 계산한 아홉 지표 (전체 길이) """
+    indicators = object.__new__(TradingIndicators)  # get_* 는 파일/공유 메모리 상태를 쓰지 않음
+    bb_upper, bb_sma, bb_lower = indicators.get_bb(data, 20, 2)
+    return {
+        "sma": indicators.get_sma(data, 14),
+        "wma": indicators.get_wma(data, 14),
+        "ema": indicators.get_ema(data, 14),
+        "rsi": indicators.get_rsi(data, 14),
+        "macd": indicators.get_macd(data, 12, 26),
+        "bb_upper": bb_upper,
+        "bb_sma": bb_sma,
+        "bb_lower": bb_lower,
+        "vwap": indicators.get_vwap(data),
+    }
+
+
+def test_compute_indicators_matches_pandas_baseline():
+    data = make_candles(HISTORY)
+    expected = baseline(data)
+
+    actual = compute_indicators(data['close'].to_numpy(), data['volume'].to_numpy())
+
+    assert set(actual) == set(INDICATOR_KEYS)
+    for name in INDICATOR_KEYS:
+        np.testing.assert_allclose(actual[name], expected[name].to_numpy(), rtol=1e-9, atol=1e-8, equal_nan=True, err_msg=name)
+
+
+@pytest.mark.parametrize("count", [HISTORY, HISTORY + 200])
+def test_streaming_engine_matches_pandas_baseline(count):
+    # 저장소보다 캔들이 많이 지나가도 스냅샷은 최근 HISTORY 개로 다시 계산한 배치 값과 같음
+    data = make_candles(count)
+    engine = StreamingIndicators(_indicator_graph(14, 12, 26, 20, 2), history=HISTORY, tail=15)
+    for close, volume in zip(data['close'].tolist(), data['volume'].tolist()):
+        engine.update({"close": close, "volume": volume})
+
+    snapshot = engine.snapshot()
+    expected = baseline(data.iloc[-HISTORY:].reset_index(drop=True))
+
+    assert engine.batch_outputs == [] and set(snapshot) == set(INDICATOR_KEYS)
+    for name in INDICATOR_KEYS:
+        np.testing.assert_allclose(snapshot[name], expected[name].to_numpy()[-15:], rtol=1e-9, atol=1e-8, err_msg=name)
@@ -0,0 +1,76 @@
+import types
+
+import pytest
+
+import main
+from execution import OrderExecutor
+
+SYMBOL = "BTCUSDT"
+CANDLE_MS = 1_700_000_000_000
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+
+    def futures_create_order(self, **params):
+        self.sent.append(params)
+        return {"clientOrderId": params['newClientOrderId'], "orderId": len(self.sent), "status": "FILLED",
+                "executedQty": str(params['quantity']), "avgPrice": "60000.0"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """ 주문은 FakeClient 로, 잔고/가격/필터/보호 주문은 고정값으로 """
+    client = FakeClient()
+    monkeypatch.setattr(main, "executor", OrderExecutor(client, confirm_timeout=0.01))
+    monkeypatch.setattr(main, "exchange", types.SimpleNamespace(ensure_leverage=lambda symbol, leverage: None,
+                                                                filters=lambda symbol: None))
+    monkeypatch.setattr(main, "get_balance", lambda asset='USDT': 1000.0)
+    monkeypatch.setattr(main, "get_current_price", lambda symbol='BTCUSDT': 60000.0)
+    monkeypatch.setattr(main, "protect_position", lambda *args: True)
+    monkeypatch.setattr(main, "_last_signals", {})
+    monkeypatch.setattr(main, "_recorded_candles", {})
+    return client
+
+
+def at(monkeypatch, seconds):
+    monkeypatch.setattr(main.time, "time", lambda: seconds)
+
+
+def test_stale_event_signal_across_buckets_sends_one_order(client, monkeypatch):
+    # 이벤트로 받은 신호를 check_and_execute 처럼 (캔들, 신호) 로 들고 다음 버킷에서 다시 보냄
+    at(monkeypatch, CANDLE_MS / 1000 + 11)
+    assert main.open_Position("LONG", SYMBOL, 1.0, CANDLE_MS)['status'] == "FILLED"
+    at(monkeypatch, CANDLE_MS / 1000 + 25)
+    assert main.open_Position("LONG", SYMBOL, 1.0, CANDLE_MS) is None
+    assert len(client.sent) == 1
+    assert client.sent[0]['newClientOrderId'] == f"en_{SYMBOL}_{CANDLE_MS}_B"
+
+
+def test_cached_snapshot_signal_across_buckets_sends_one_order(client, monkeypatch):
+    # 새 스냅샷이 없어 get_final_signal 이 직전 신호를 돌려줘도 그 신호의 캔들로 키를 만듦
+    main._last_signals[SYMBOL] = (7, CANDLE_MS, "LONG")
+    monkeypatch.setattr(main, "load_shared", lambda symbol, version, timeout: None)
+    at(monkeypatch, CANDLE_MS / 1000 + 11)
+    main.open_Position(symbol=SYMBOL)
+    at(monkeypatch, CANDLE_MS / 1000 + 25)
+    main.open_Position(symbol=SYMBOL)
+    assert [params['newClientOrderId'] for params in client.sent] == [f"en_{SYMBOL}_{CANDLE_MS}_B"]
+
+
+def test_signal_key_falls_back_to_wall_clock_candle(monkeypatch):
+    at(monkeypatch, CANDLE_MS / 1000 + 25)
+    assert main.signal_key(SYMBOL) == CANDLE_MS + 20_000
+    assert main.signal_key(SYMBOL, CANDLE_MS) == CANDLE_MS
+
+
+def test_tick_to_order_recorded_once_per_candle(monkeypatch):
+    observed = []
+    monkeypatch.setattr(main, "_recorded_candles", {})
+    monkeypatch.setattr(main.metrics, "observe", lambda name, value, **labels: observed.append(value))
+    at(monkeypatch, CANDLE_MS / 1000 + 11)
+    main.record_tick_to_order(SYMBOL, CANDLE_MS)
+    main.record_tick_to_order(SYMBOL, CANDLE_MS)
+    main.record_tick_to_order(SYMBOL, None)
+    assert observed == [pytest.approx(1.0)]
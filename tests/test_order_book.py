@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+import types
+
+import pytest
+
+import order_book
+from order_book import BookSide, OrderBook
+
+BIDS = [["100.0", "1"], ["99.9", "2"], ["99.8", "5"]]
+ASKS = [["100.1", "1"], ["100.2", "2"], ["100.3", "5"]]
+
+
+class FakeClient:
+    """ futures_order_book 이 부를 때마다 snapshots 를 차례로 돌려줌 (during: 스냅샷을 받는 동안 올 이벤트) """
+    def __init__(self, *snapshots):
+        self.snapshots = list(snapshots)
+        self.calls = 0
+        self.during = None
+
+    def futures_order_book(self, symbol, limit):
+        self.calls += 1
+        if self.during:
+            self.during()
+        return self.snapshots.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def retries(monkeypatch):
+    """ 실패한 스냅샷을 1초 뒤 다시 받는 타이머는 띄우지 않고 기록만 (테스트가 직접 resync 를 부름) """
+    scheduled = []
+
+    class Timer:
+        def __init__(self, interval, function):
+            scheduled.append(function)
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr(order_book, "threading", types.SimpleNamespace(
+        Lock=threading.Lock, Thread=threading.Thread, Timer=Timer))
+    return scheduled
+
+
+def snapshot(last_update_id, bids=BIDS, asks=ASKS):
+    return {"lastUpdateId": last_update_id, "bids": bids, "asks": asks}
+
+
+def diff(first, last, previous, bids=(), asks=()):
+    return json.dumps({"e": "depthUpdate", "U": first, "u": last, "pu": previous, "b": list(bids), "a": list(asks)})
+
+
+def synced_book(*snapshots, **kwargs):
+    book = OrderBook(FakeClient(*snapshots), "btcusdt", **kwargs)
+    book.resync()
+    assert book.synced
+    return book
+
+
+def wait_synced(book, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not book.synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return book.synced
+
+
+def test_buffered_events_are_stitched_onto_snapshot():
+    book = OrderBook(FakeClient(snapshot(100)), "btcusdt")
+
+    def stream():
+        book.on_message(None, diff(90, 95, 89, bids=[["100.0", "9"]]))    # 스냅샷에 이미 들어 있음
+        book.on_message(None, diff(98, 102, 97, bids=[["100.0", "3"]]))   # 스냅샷을 걸치는 첫 이벤트
+    book.client.during = stream
+    book.resync()
+
+    assert book.synced and book.last_update_id == 102
+    assert book.top(1)["bids"] == [(100.0, 3.0)]
+
+
+def test_snapshot_not_covering_first_event_resyncs(retries):
+    book = OrderBook(FakeClient(snapshot(100), snapshot(110)), "btcusdt")
+    book.client.during = lambda: book.on_message(None, diff(105, 107, 104))  # 101~104 가 빠짐
+    book.resync()
+    assert not book.synced and retries == [book.resync]
+
+    book.client.during = None
+    book.resync()
+    assert book.synced and book.last_update_id == 110
+
+
+def test_in_sequence_diff_updates_levels():
+    book = synced_book(snapshot(100))
+    book.on_message(None, diff(99, 101, 98))
+    book.on_message(None, diff(102, 104, 101, bids=[["99.9", "0"], ["100.05", "4"]], asks=[["100.1", "0.5"]]))
+
+    assert book.synced and book.last_update_id == 104
+    assert book.top(3)["bids"] == [(100.05, 4.0), (100.0, 1.0), (99.8, 5.0)]
+    assert book.best() == (100.05, 100.1)
+    assert book.top(1)["asks"] == [(100.1, 0.5)]
+    assert book.resyncs == 0
+
+
+def test_gap_triggers_resync_from_new_snapshot():
+    book = synced_book(snapshot(100), snapshot(200, bids=[["101.0", "1"]], asks=[["101.1", "1"]]))
+    book.on_message(None, diff(99, 101, 98))
+
+    book.on_message(None, diff(150, 152, 149, bids=[["100.0", "7"]]))  # pu 가 101 이 아님 (이벤트 누락)
+
+    assert book.resyncs == 1
+    assert wait_synced(book)
+    assert book.client.calls == 2 and book.last_update_id == 200
+    assert book.best() == (101.0, 101.1)
+
+
+def test_ready_goes_stale_without_updates():
+    book = synced_book(snapshot(100), stale_after=0.05)
+    assert book.ready()
+    time.sleep(0.1)
+    assert not book.ready()
+
+
+def test_book_side_keeps_best_depth_levels():
+    side = BookSide(descending=False, depth=2)
+    side.set(100.2, 1)
+    side.set(100.1, 1)
+    side.set(100.3, 1)   # depth 밖이라 무시
+    side.set(100.0, 2)   # 더 좋은 가격이 들어오면 가장 나쁜 단계가 밀려남
+    assert side.top() == [(100.0, 2), (100.1, 1)]
+    side.set(100.0, 0)
+    assert side.top() == [(100.1, 1)]
+
+
+@pytest.mark.parametrize("side, best", [("BUY", 100.1), ("SELL", 100.0)])
+def test_max_quantity_caps_at_slippage_budget(side, best):
+    book = synced_book(snapshot(100))
+    # 10bps 한도: 앞 두 단계(1 + 2)는 한도 안, 세 번째 단계에서 평균이 한도에 닿는 수량 1
+    budget = 0.1 / best * 10_000
+
+    quantity = book.max_quantity(side, budget)
+
+    assert quantity == pytest.approx(4.0)
+    average, filled = book.estimate_fill_price(side, quantity)
+    assert filled == pytest.approx(4.0)
+    assert average == pytest.approx(best + (0.1 if side == "BUY" else -0.1))
+
+
+def test_max_quantity_inside_best_level_and_empty_book():
+    book = synced_book(snapshot(100))
+    assert book.max_quantity("BUY", 0) == pytest.approx(1.0)
+
+    empty = synced_book(snapshot(100, bids=[], asks=[]))
+    assert empty.max_quantity("SELL", 5) is None
+    assert empty.estimate_fill_price("SELL", 1) == (None, 0)
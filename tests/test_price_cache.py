@@ -0,0 +1,38 @@
+import pytest
+
+import price_cache
+from price_cache import PriceCache, PNL_SOURCES, SIZING_SOURCES
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(price_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_each_purpose_keeps_its_source_while_fresh(clock):
+    cache = PriceCache()
+    cache.update("btcusdt", 60_000.0, 'mark')
+    clock[0] += 0.5
+    cache.update("BTCUSDT", 60_010.0, 'book')
+    clock[0] += 0.5
+    cache.update("BTCUSDT", 60_020.0, 'trade')
+
+    # 더 최근 체결/호가가 와도 손익률은 mark, 수량은 호가 중간값 그대로
+    assert cache.latest("BTCUSDT", 2.0, PNL_SOURCES) == 60_000.0
+    assert cache.latest("BTCUSDT", 2.0, SIZING_SOURCES) == 60_010.0
+
+
+def test_falls_back_only_when_source_is_stale(clock):
+    cache = PriceCache()
+    cache.update("BTCUSDT", 60_000.0, 'mark')
+    cache.update("BTCUSDT", 60_010.0, 'book')
+    clock[0] += 3
+    cache.update("BTCUSDT", 60_020.0, 'trade')
+
+    assert cache.latest("BTCUSDT", 2.0, PNL_SOURCES) == 60_020.0
+    assert cache.latest("BTCUSDT", 2.0, SIZING_SOURCES) == 60_020.0
+    clock[0] += 3
+    assert cache.latest("BTCUSDT", 2.0, PNL_SOURCES) is None
+    assert cache.latest("ETHUSDT") is None
@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+import types
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+import rest_scheduler
+from rest_scheduler import ACCOUNT, BACKGROUND, ORDER, WRITE_MAX_WAIT, RateLimitExceeded, RestScheduler
+
+NOW = 1_700_000_000.0  # 1분 창의 20초 지점, 10초 창의 시작
+
+
+def api_error(status, headers):
+    response = types.SimpleNamespace(status_code=status, text=json.dumps({"code": -1003, "msg": "test"}),
+                                     request=None, headers=headers)
+    return BinanceAPIException(response, status, response.text)
+
+
+class FakeClient:
+    """ python-binance 처럼 마지막 응답을 client.response 에 남김. 응답 헤더는 headers 로 정함 """
+    def __init__(self):
+        self.headers = {}
+        self.calls = []
+        self.error = None
+        self.gate = None  # 주면 조회가 이 이벤트까지 멈춤 (진행 중인 조회 합치기 확인용)
+        self.entered = threading.Event()
+        self.response = None
+
+    def _respond(self, name, params):
+        self.calls.append((name, params))
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.response = types.SimpleNamespace(headers=dict(self.headers))
+        return {"name": name, **params}
+
+    def futures_symbol_ticker(self, **params):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return self._respond("futures_symbol_ticker", params)
+
+    def futures_create_order(self, **params):
+        return self._respond("futures_create_order", params)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(rest_scheduler, "time", types.SimpleNamespace(time=lambda: now[0],
+                                                                      perf_counter=time.perf_counter))
+    return now
+
+
+@pytest.fixture
+def client(clock):
+    client = FakeClient()
+    client.scheduler = RestScheduler(limits={"weight_1m": 1000}).install(
+        ("futures_symbol_ticker", "futures_create_order"), client)
+    return client
+
+
+def test_response_headers_set_used_weight_and_order_counts(client):
+    client.headers = {"X-MBX-USED-WEIGHT-1M": "321", "X-MBX-ORDER-COUNT-10S": "3", "X-MBX-ORDER-COUNT-1M": "7"}
+
+    client.futures_create_order(symbol="BTCUSDT", side="BUY")
+
+    scheduler = client.scheduler
+    assert (scheduler.used_weight, scheduler.orders_10s, scheduler.orders_1m) == (321, 3, 7)
+    assert scheduler.pending_weight == 0
+    # 헤더가 없으면 추정 가중치만큼 더함
+    client.headers = {}
+    client.futures_symbol_ticker(symbol="BTCUSDT")
+    assert scheduler.used_weight == 322
+
+
+@pytest.mark.parametrize("used, admitted", [
+    (650, {ORDER, ACCOUNT, BACKGROUND}),
+    (690, {ORDER, ACCOUNT}),
+    (840, {ORDER}),
+    (940, set()),
+])
+def test_priority_ceilings(clock, used, admitted):
+    scheduler = RestScheduler(limits={"weight_1m": 1000})
+    scheduler.release(0, {"X-MBX-USED-WEIGHT-1M": str(used)})
+
+    for priority in (ORDER, ACCOUNT, BACKGROUND):
+        if priority in admitted:
+            scheduler.acquire(priority, 20, max_wait=1)
+            scheduler.release(20, {"X-MBX-USED-WEIGHT-1M": str(used)})  # 사용량은 헤더 값 그대로 두고 비교
+        else:
+            # 다음 1분 창까지 40초 기다려야 함
+            with pytest.raises(RateLimitExceeded):
+                scheduler.acquire(priority, 20, max_wait=1)
+    assert scheduler.pending_weight == 0
+
+
+def test_inflight_reads_are_merged_but_writes_are_not(client):
+    client.gate = threading.Event()
+    results = []
+    first = threading.Thread(target=lambda: results.append(client.futures_symbol_ticker(symbol="BTCUSDT")))
+    second = threading.Thread(target=lambda: results.append(client.futures_symbol_ticker(symbol="BTCUSDT")))
+    first.start()
+    assert client.entered.wait(5)
+    second.start()
+    deadline = time.monotonic() + 5
+    while client.scheduler.merged == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    client.gate.set()
+    first.join(5)
+    second.join(5)
+
+    assert client.calls == [("futures_symbol_ticker", {"symbol": "BTCUSDT"})]
+    assert results == [{"name": "futures_symbol_ticker", "symbol": "BTCUSDT"}] * 2
+    assert client.scheduler.merged == 1 and client.scheduler.inflight == {}
+
+    # 다른 인자의 조회와 주문은 매번 보냄
+    client.futures_symbol_ticker(symbol="ETHUSDT")
+    client.futures_create_order(symbol="BTCUSDT", side="BUY")
+    client.futures_create_order(symbol="BTCUSDT", side="BUY")
+    assert len(client.calls) == 4
+
+
+@pytest.mark.parametrize("status", [429, 418])
+def test_retry_after_blocks_every_request(client, clock, status):
+    client.error = api_error(status, {"Retry-After": "30", "X-MBX-USED-WEIGHT-1M": "1200"})
+    with pytest.raises(BinanceAPIException):
+        client.futures_symbol_ticker(symbol="BTCUSDT")
+
+    scheduler = client.scheduler
+    assert scheduler.blocked_until == NOW + 30
+    # 주문은 WRITE_MAX_WAIT 보다 오래 막혀 있으면 보내지 않고, 조회도 막힌 동안은 나가지 않음
+    with pytest.raises(RateLimitExceeded):
+        client.futures_create_order(symbol="BTCUSDT", side="SELL")
+    with pytest.raises(RateLimitExceeded):
+        scheduler.acquire(ACCOUNT, 1, max_wait=5)
+    assert len(client.calls) == 1
+
+    clock[0] = NOW + 40  # 막힌 시간도, 1분 창도 지남
+    client.futures_create_order(symbol="BTCUSDT", side="SELL")
+    assert len(client.calls) == 2
+
+
+def test_write_gives_up_after_write_max_wait(client):
+    # 주문 몫(95%)까지 다 쓴 상태: 다음 창까지 40초 > WRITE_MAX_WAIT
+    client.scheduler.release(0, {"X-MBX-USED-WEIGHT-1M": "960"})
+    assert 60 - NOW % 60 > WRITE_MAX_WAIT
+
+    with pytest.raises(RateLimitExceeded):
+        client.futures_create_order(symbol="BTCUSDT", side="BUY")
+    assert client.calls == []
+    assert client.scheduler.waiting[ORDER] == 0 and client.scheduler.pending_weight == 0
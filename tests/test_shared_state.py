@@ -0,0 +1,108 @@
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+import shared_state
+from shared_state import CANDLE_COLUMNS, LayoutChanged, SharedIndicators
+
+KEYS = ("rsi", "macd")
+CANDLE_MS = 1_700_000_000_000
+
+
+def candles(count, close=60_000.0):
+    return {"timestamp": np.arange(count, dtype=np.int64) * 10_000 + CANDLE_MS,
+            **{name: np.full(count, close) for name in CANDLE_COLUMNS}}
+
+
+def indicators(value, length=15):
+    return {key: [value + i for i in range(length)] for key in KEYS}
+
+
+@pytest.fixture
+def writer(tmp_path):
+    shared = SharedIndicators(str(tmp_path / "state.shm"), keys=KEYS)
+    yield shared
+    shared.close()
+
+
+@pytest.fixture
+def reader(writer):
+    writer.write(indicators(1.0), candles(3), (60_001.0, 60_000.0), updated_ms=CANDLE_MS)
+    shared = SharedIndicators(writer.path, readonly=True)
+    yield shared
+    shared.close()
+
+
+def test_round_trip(writer, reader):
+    snapshot = reader.read()
+
+    assert reader.keys == KEYS and reader.tail == writer.tail
+    assert snapshot['version'] == writer.version == 1
+    assert snapshot['indicators'] == indicators(1.0)
+    assert snapshot['prices'] == (60_001.0, 60_000.0)
+    # 캔들은 기록한 것만 (앞쪽 빈 칸은 빠짐)
+    assert snapshot['candles']['timestamp'].tolist() == candles(3)['timestamp'].tolist()
+    assert snapshot['candles']['close'].tolist() == [60_000.0] * 3
+
+
+def test_read_before_first_write_is_none(writer):
+    reader = SharedIndicators(writer.path, readonly=True)
+    assert reader.read() is None and reader.version == 0
+    reader.close()
+
+
+def test_read_retries_while_write_in_progress(writer, reader, monkeypatch):
+    writer._header[2] += 1  # 쓰는 쪽이 seq 를 홀수로 올린 채 값을 쓰는 중
+    sleeps = []
+
+    def finish_write(seconds):
+        # 읽는 쪽이 양보하는 동안 쓰는 쪽이 기록을 마침
+        sleeps.append(seconds)
+        writer._header[2] -= 1
+        writer.write(indicators(2.0), candles(3, 61_000.0), (61_001.0, 61_000.0))
+
+    monkeypatch.setattr(shared_state, "time", types.SimpleNamespace(sleep=finish_write, time=time.time))
+
+    snapshot = reader.read()
+
+    assert sleeps == [0]
+    assert snapshot['version'] == 2 and snapshot['indicators'] == indicators(2.0)
+    assert snapshot['prices'] == (61_001.0, 61_000.0)
+
+
+def test_read_gives_up_when_write_never_finishes(writer, reader, monkeypatch):
+    writer._header[2] += 1
+    monkeypatch.setattr(shared_state, "time", types.SimpleNamespace(sleep=lambda seconds: None, time=time.time))
+
+    with pytest.raises(TimeoutError):
+        reader.read(retries=5)
+
+
+def test_wait_returns_only_newer_version(writer, reader):
+    assert reader.wait(0, timeout=0)['version'] == 1
+    assert reader.wait(1, timeout=0.05, poll=0.01) is None
+
+    timer = threading.Timer(0.1, writer.write, args=(indicators(3.0), candles(3), (60_002.0, 60_001.0)))
+    timer.start()
+    started = time.monotonic()
+    snapshot = reader.wait(1, timeout=2, poll=0.01)
+    timer.join()
+
+    assert time.monotonic() - started >= 0.1
+    assert snapshot['version'] == 2 and snapshot['indicators'] == indicators(3.0)
+
+
+def test_writer_restart_with_other_keys_raises_layout_changed(writer, reader):
+    restarted = SharedIndicators(writer.path, keys=("rsi",))
+
+    with pytest.raises(LayoutChanged):
+        reader.read()
+    # 다시 연 쪽은 새 레이아웃으로 읽고, version 은 이어서 올라감
+    restarted.write({"rsi": [50.0]}, candles(1), (1.0, 1.0))
+    reopened = SharedIndicators(writer.path, readonly=True)
+    assert reopened.keys == ("rsi",) and reopened.read()['version'] == 2
+    reopened.close()
+    restarted.close()
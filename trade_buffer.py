@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+
+
+def parse_trade(message):
+    """ @trade 메시지에서 T/p/q 만 뽑아내는 빠른 파서 (전체 json.loads 없이 문자열 탐색)
+
+    반환: (timestamp ms, price, quantity). 형식이 예상과 다르면 json.loads 로 처리한다.
+    """
+    try:
+        start = message.index('"T":') + 4
+        timestamp = int(message[start:message.index(',', start)])
+        start = message.index('"p":"') + 5
+        price = float(message[start:message.index('"', start)])
+        start = message.index('"q":"') + 5
+        quantity = float(message[start:message.index('"', start)])
+        return timestamp, price, quantity
+    except ValueError:
+        data = json.loads(message)
+        return int(data['T']), float(data['p']), float(data['q'])
+
+
+class TradeRingBuffer:
+    """ 단일 생산자/단일 소비자용 고정 크기 체결 링버퍼
+
+    timestamp(int64) / price(float64) / quantity(float64) 컬럼을 미리 할당해 두고,
+    생산자(웹소켓 스레드)는 head 만, 소비자(캔들 집계)는 tail 만 갱신하므로 락이 필요 없다.
+    head 는 데이터를 다 쓴 뒤에 올린다. 가득 차면 새 체결을 버리고 dropped 를 센다.
+    """
+    def __init__(self, capacity=1 << 17):
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.quantity = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # 생산자가 다음에 쓸 누적 위치
+        self.tail = 0  # 소비자가 다음에 읽을 누적 위치
+        self.dropped = 0
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def push(self, timestamp, price, quantity):
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return False
+        index = head % self.capacity
+        self.timestamp[index] = timestamp
+        self.price[index] = price
+        self.quantity[index] = quantity
+        self.head = head + 1
+        return True
+
+    def peek(self, end=None):
+        """ tail 부터 end(기본: 현재 head)까지의 체결을 (timestamp, price, quantity) 배열로 반환
+
+        구간이 버퍼 끝에서 돌아가지 않으면 복사 없는 뷰, 돌아가면 이어 붙인 복사본이다.
+        """
+        end = self.head if end is None else end
+        start_index = self.tail % self.capacity
+        size = end - self.tail
+        if start_index + size <= self.capacity:
+            window = slice(start_index, start_index + size)
+            return self.timestamp[window], self.price[window], self.quantity[window]
+        split = self.capacity - start_index
+        return tuple(
+            np.concatenate((column[start_index:], column[:size - split]))
+            for column in (self.timestamp, self.price, self.quantity)
+        )
+
+    def release(self, end):
+        """ end 까지 읽은 체결을 소비 처리. peek 결과를 다 쓴 뒤에 호출해야 생산자가 덮어쓰지 않는다 """
+        self.tail = end
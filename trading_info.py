@@ -1,25 +1,637 @@
+import functools
 import json
-import time
 from datetime import datetime, timezone, timedelta
 import pandas as pd
 import numpy as np
 import os
+from candle_store import CandleStore, epoch_ms_to_kst
+from event_bus import bus, CANDLE_CLOSED, INDICATORS_UPDATED
+from supervisor import heartbeats
+from shared_state import SharedIndicators, INDICATOR_KEYS, shared_file
+from metrics import metrics
+import math
+from collections import deque
+from operator import itemgetter
+
+# 지표 계산에 쓸 수 있는 캔들 열
+SOURCES = ("open", "high", "low", "close", "volume")
+
+
+class _RollingWindow:
+    """ 고정 길이 창의 합/제곱합/가중합을 O(1)로 유지하는 보조 클래스 """
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.offset = None  # 큰 가격값의 상쇄 오차를 줄이기 위한 기준값
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.weighted = 0.0
+        self.same_run = 0  # 같은 값이 연속으로 들어온 횟수
+        self.updates = 0
+
+    def push(self, value):
+        if self.offset is None:
+            self.offset = value
+        x = value - self.offset
+
+        if len(self.values) == self.window:
+            old = self.values[0]
+            # 가중합: 모든 가중치가 1씩 줄고 새 값이 최대 가중치를 받음
+            self.weighted += self.window * x - self.total
+            self.total += x - old
+            self.total_sq += x * x - old * old
+        else:
+            self.weighted += (len(self.values) + 1) * x
+            self.total += x
+            self.total_sq += x * x
+        self.same_run = self.same_run + 1 if self.values and self.values[-1] == x else 1
+        self.values.append(x)
+
+        # 누적 오차가 쌓이지 않도록 창 길이마다 한 번 정확히 다시 계산 (분할 상환 O(1))
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+            self.weighted = math.fsum(i * v for i, v in enumerate(self.values, 1))
+        return self  # 지표 그래프에서는 창 자체가 SMA/WMA/볼린저 밴드 노드의 입력
+
+    @property
+    def full(self):
+        return len(self.values) == self.window
+
+    def mean(self):
+        if not self.full:
+            return float('nan')
+        if self.same_run >= self.window:
+            # 창 전체가 같은 값이면 오차 없이 그 값을 그대로 돌려줌 (pandas rolling 과 동일)
+            return self.values[-1] + self.offset
+        return self.total / self.window + self.offset
+
+    def wma(self):
+        if not self.full:
+            return float('nan')
+        return self.weighted / (self.window * (self.window + 1) / 2) + self.offset
+
+    def std(self):
+        if not self.full:
+            return float('nan')
+        if self.same_run >= self.window:
+            return 0.0
+        var = (self.total_sq - self.total * self.total / self.window) / (self.window - 1)
+        return math.sqrt(max(var, 0.0))
+
+
+def _rolling_sum(values, window):
+    # sliding_window_view 는 복사 없이 (n - window + 1, window) 뷰를 만듦
+    sums = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).sum(axis=1)
+    return sums
+
+
+def _ema(values, span):
+    """ adjust=False EMA 를 블록 단위 누적합으로 벡터화 (블록 안에서 (1-a)^-k 가 넘치지 않도록 끊어서 계산) """
+    alpha = 2 / (span + 1)
+    decay = 1 - alpha
+    out = np.empty(len(values))
+    if not len(values):
+        return out
+    if decay == 0:
+        out[:] = values
+        return out
+    block = max(1, int(np.log(1e-280) / np.log(decay)))
+    powers = decay ** np.arange(block + 1)
+    prev = out[0] = values[0]
+    start = 1
+    while start < len(values):
+        chunk = values[start:start + block]
+        k = np.arange(1, len(chunk) + 1)
+        # y_k = decay^k * prev + alpha * sum_{j<=k} decay^(k-j) * x_j
+        scaled = np.cumsum(chunk * alpha / powers[k])
+        out[start:start + len(chunk)] = powers[k] * (prev + scaled)
+        prev = out[start + len(chunk) - 1]
+        start += len(chunk)
+    return out
+
+
+def _fill_leading(values):
+    """ get_bb 의 bfill 과 같이 앞쪽 NaN 을 첫 유효값으로 채운 복사본 (앞쪽 NaN 이 없으면 그대로) """
+    if not len(values) or not np.isnan(values[0]):
+        return values
+    values = values.copy()
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid):
+        values[:valid[0]] = values[valid[0]]
+    return values
+
+
+class _RollingArrays:
+    """ _RollingWindow 의 mean/wma/std 를 전체 길이 배열로 (합/제곱합은 처음 쓸 때 한 번만 계산해 공유)
+
+    첫 종가를 뺀 값으로 합을 구해 큰 가격의 상쇄 오차를 줄인다.
+    """
+    def __init__(self, close, window):
+        self.window = window
+        self.offset = close[0]
+        self.x = close - self.offset
+
+    @functools.cached_property
+    def total(self):
+        return _rolling_sum(self.x, self.window)
+
+    @functools.cached_property
+    def total_sq(self):
+        return _rolling_sum(self.x * self.x, self.window)
+
+    def mean(self):
+        return self.total / self.window + self.offset
+
+    def wma(self):
+        # 행마다 파이썬 함수를 부르는 rolling.apply 대신 합성곱 한 번으로 계산
+        weights = np.arange(1, self.window + 1, dtype=np.float64)
+        wma = np.full(len(self.x), np.nan)
+        if len(self.x) >= self.window:
+            wma[self.window - 1:] = np.convolve(self.x, weights[::-1], mode='valid') / weights.sum() + self.offset
+        return wma
+
+    def std(self):
+        with np.errstate(invalid='ignore'):
+            return np.sqrt(np.maximum((self.total_sq - self.total * (self.total / self.window)) / (self.window - 1), 0.0))
+
+
+class _EmaStep:
+    """ adjust=False EMA 한 캔들 갱신 """
+    def __init__(self, span):
+        self.alpha = 2 / (span + 1)
+        self.value = None
+
+    def push(self, close):
+        self.value = close if self.value is None else self.value + self.alpha * (close - self.value)
+        return self.value
+
+
+class _RsiStep:
+    """ 상승/하락분 이동평균 RSI 한 캔들 갱신 (첫 캔들의 diff 는 NaN 이지만 pandas where 에 의해 0 으로 채워진다) """
+    def __init__(self, window):
+        self.gains = _RollingWindow(window)
+        self.losses = _RollingWindow(window)
+        self.gains.offset = self.losses.offset = 0.0
+        self.prev_close = None
+
+    def push(self, close):
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        if not self.gains.full:
+            return float('nan')
+        gain = self.gains.mean()
+        loss = self.losses.mean()
+        # pandas 나눗셈과 동일: 0/0 -> NaN, x/0 -> inf -> RSI 100
+        if loss == 0:
+            return float('nan') if gain == 0 else 100.0
+        return 100 - (100 / (1 + gain / loss))
+
+
+class _VwapStep:
+    """ 최근 history 개 캔들 구간의 누적 VWAP. 구간 시작이 캔들마다 움직이므로 값은 tail() 에서 한꺼번에 계산 """
+    def __init__(self, history):
+        self.history = history
+        # 캔들별 누적 (가격*거래량, 거래량). 창 시작 직전 값을 빼서 구간 누적을 만든다
+        self.cum_pv = deque([0.0], maxlen=history + 1)
+        self.cum_v = deque([0.0], maxlen=history + 1)
+        self.count = 0
+
+    def push(self, close, volume):
+        self.count += 1
+        if len(self.cum_pv) == self.cum_pv.maxlen and self.count % self.history == 0:
+            # 누적합이 계속 커지지 않도록 기준점을 다시 잡음 (분할 상환 O(1))
+            base_pv, base_v = self.cum_pv[0], self.cum_v[0]
+            self.cum_pv = deque((x - base_pv for x in self.cum_pv), maxlen=self.history + 1)
+            self.cum_v = deque((x - base_v for x in self.cum_v), maxlen=self.history + 1)
+        self.cum_pv.append(self.cum_pv[-1] + close * volume)
+        self.cum_v.append(self.cum_v[-1] + volume)
+
+    def tail(self, n):
+        size = min(n, self.count)
+        base_pv, base_v = self.cum_pv[0], self.cum_v[0]
+        vwap = []
+        for i in range(len(self.cum_pv) - size, len(self.cum_pv)):
+            volume = self.cum_v[i] - base_v
+            vwap.append((self.cum_pv[i] - base_pv) / volume if volume else float('nan'))
+        return vwap
+
+
+class _AtrStep:
+    """ true range 이동평균 한 캔들 갱신 """
+    def __init__(self, window):
+        self.ranges = _RollingWindow(window)
+        self.ranges.offset = 0.0
+        self.prev_close = None
+
+    def push(self, high, low, close):
+        true_range = high - low
+        if self.prev_close is not None:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.ranges.push(true_range).mean()
+
+
+def ref(name, **params):
+    """ 다른 지표 노드 참조 (지표 이름, 파라미터). 빠진 파라미터는 그래프를 만들 때 기본값으로 채움 """
+    return name, tuple(sorted(params.items()))
+
+
+class Indicator:
+    """ 레지스트리에 등록된 지표 하나의 정의 """
+    __slots__ = ("name", "batch", "inputs", "defaults", "stream", "elementwise", "fill_leading")
+
+    def __init__(self, name, batch, inputs, defaults, stream=None, elementwise=False, fill_leading=False):
+        self.name = name
+        self.batch = batch
+        self.inputs = inputs
+        self.defaults = defaults
+        self.stream = stream
+        self.elementwise = elementwise
+        self.fill_leading = fill_leading
+
+
+class IndicatorRegistry:
+    """ 지표 정의와 소비자(전략 등)별 요구 지표 목록
+
+    - indicator() 로 지표를 등록한다: 배치 계산식(전체 길이 배열), 입력 노드(캔들 열 SOURCES 나 ref(다른 지표)),
+      기본 파라미터, 캔들 하나씩 갱신하는 단계 객체(stream).
+    - require() 로 소비자가 쓰는 지표와 파라미터를 선언한다. graph() 는 선언된 지표에서 입력을 거슬러 만든 계산 그래프다.
+    새 지표(ATR, 스토캐스틱 등)는 등록하고 어떤 소비자가 요구하기만 하면 save_indicators / update 를 고치지 않고
+    계산되어 공유 메모리에 기록된다. 아무도 요구하지 않은 지표는 계산하지 않는다.
+    """
+    def __init__(self):
+        self.definitions = {}  # 지표 이름 -> Indicator
+        self.demands = {}      # 소비자 -> {출력 키: 노드 키}
+
+    def indicator(self, inputs=(), stream=None, elementwise=False, fill_leading=False, **defaults):
+        """ 지표 등록 데코레이터. 함수 이름이 지표 이름이고, 인자는 입력 노드 값들 다음에 파라미터(키워드)
+
+        inputs: 입력 노드 튜플, 또는 파라미터를 받아 입력 노드 목록을 돌려주는 함수
+        stream(history, **params): 캔들마다 push(*입력 값) -> 값 을 하는 단계 객체를 만듦 (없으면 배치로만 계산)
+        elementwise: 배치 함수가 캔들 하나의 입력 값에도 그대로 맞음 (상태 없는 조합이라 단계 객체가 필요 없음)
+        fill_leading: 출력할 때 앞쪽 NaN 을 첫 유효값으로 채움
+        """
+        def register(function):
+            self.definitions[function.__name__] = Indicator(
+                function.__name__, function, inputs, defaults, stream, elementwise, fill_leading)
+            return function
+        return register
+
+    def node(self, name, params=()):
+        """ 기본 파라미터를 채운 노드 키 (지표 이름, ((파라미터, 값), ...)) """
+        definition = self.definitions.get(name)
+        if definition is None:
+            raise KeyError(f"등록되지 않은 지표입니다: {name}")
+        params = dict(params)
+        unknown = set(params) - set(definition.defaults)
+        if unknown:
+            raise ValueError(f"{name} 에 없는 파라미터입니다: {sorted(unknown)}")
+        return name, tuple(sorted({**definition.defaults, **params}.items()))
+
+    def require(self, consumer, **indicators):
+        """ consumer 가 쓰는 지표 선언. 키는 출력 키(스냅샷/공유 메모리 키), 값은 파라미터 dict 나 (지표 이름, 파라미터 dict)
+
+        require("strategy_1", rsi={"window": 14}, macd={"fast": 12, "slow": 26})
+        require("trend", ema_50=("ema", {"span": 50}))
+        같은 출력 키를 다른 소비자가 다른 파라미터로 요구하면 ValueError.
+        """
+        outputs = {}
+        for output, spec in indicators.items():
+            name, params = spec if isinstance(spec, tuple) else (output, spec or {})
+            outputs[output] = self.node(name, params)
+        self._merge({**self.demands, consumer: outputs})
+        self.demands[consumer] = outputs
+
+    def release(self, consumer):
+        self.demands.pop(consumer, None)
+
+    @staticmethod
+    def _merge(demands):
+        merged = {}
+        for outputs in demands.values():
+            for output, key in outputs.items():
+                if merged.setdefault(output, key) != key:
+                    raise ValueError(f"{output} 을 서로 다른 파라미터로 요구했습니다: {merged[output]} / {key}")
+        return merged
+
+    def outputs(self):
+        """ 모든 소비자가 요구한 출력 키 -> 노드 키 """
+        return self._merge(self.demands)
+
+    def graph(self, outputs=None):
+        """ 출력 키 -> 노드 키 (기본: 요구된 지표 전부) 의 계산 그래프 """
+        return IndicatorGraph(self, self.outputs() if outputs is None else outputs)
+
+
+class IndicatorGraph:
+    """ 출력 지표에서 입력을 거슬러 올라가 만든 계산 그래프
+
+    같은 (지표, 파라미터) 노드는 하나만 두므로 MACD 안의 EMA, 볼린저 밴드 안의 SMA(와 그 창의 합)처럼
+    겹치는 중간값은 한 번만 계산된다. 출력에서 닿지 않는 지표는 그래프에 들어오지 않는다.
+    """
+    def __init__(self, registry, outputs):
+        self.registry = registry
+        self.outputs = dict(outputs)
+        self.nodes = {}  # 노드 키 -> (Indicator, 파라미터 dict, 입력 노드 키 목록)
+        self.order = []  # 위상 순서 (입력이 먼저)
+        for key in self.outputs.values():
+            self._add(key, ())
+
+    def _add(self, key, path):
+        if key in SOURCES or key in self.nodes:
+            return
+        if key in path:
+            raise ValueError(f"지표 입력이 순환합니다: {key[0]}")
+        definition = self.registry.definitions[key[0]]
+        params = dict(key[1])
+        inputs = definition.inputs(**params) if callable(definition.inputs) else definition.inputs
+        inputs = [node if node in SOURCES else self.registry.node(*node) for node in inputs]
+        for node in inputs:
+            self._add(node, path + (key,))
+        self.nodes[key] = (definition, params, inputs)
+        self.order.append(key)
+
+    @property
+    def sources(self):
+        """ 그래프가 읽는 캔들 열 """
+        return [source for source in SOURCES if any(source in inputs for _, _, inputs in self.nodes.values())]
+
+    def streamable(self):
+        """ 캔들 하나씩 갱신할 수 있는 노드 (단계 객체가 있거나 elementwise 이고, 입력도 모두 그런 노드) """
+        result = set(SOURCES)
+        for key in self.order:
+            definition, _, inputs = self.nodes[key]
+            if (definition.stream is not None or definition.elementwise) and all(node in result for node in inputs):
+                result.add(key)
+        return result
+
+    def compute(self, columns, names=None):
+        """ 캔들 열 배열 dict 로 출력 지표(names, 기본 전부)의 전체 길이 배열 dict
+
+        names 에 필요한 노드만 입력부터 거슬러 한 번씩 계산한다.
+        """
+        names = list(self.outputs) if names is None else names
+        if not len(next(iter(columns.values()), ())):
+            return {name: np.empty(0) for name in names}
+        values = {}
+
+        def value(key):
+            if key not in values:
+                if key in SOURCES:
+                    values[key] = np.ascontiguousarray(columns[key], dtype=np.float64)
+                else:
+                    definition, params, inputs = self.nodes[key]
+                    values[key] = definition.batch(*[value(node) for node in inputs], **params)
+            return values[key]
+
+        result = {}
+        for name in names:
+            key = self.outputs[name]
+            result[name] = _fill_leading(value(key)) if self.nodes[key][0].fill_leading else value(key)
+        return result
+
+
+# 프로세스 기본 지표 레지스트리
+registry = IndicatorRegistry()
+
+
+@registry.indicator(inputs=("close",), stream=lambda history, window: _RollingWindow(window), window=14)
+def rolling_window(close, window):
+    """ 고정 길이 종가 창 (SMA/WMA/볼린저 밴드가 공유하는 중간값) """
+    return _RollingArrays(close, window)
+
+
+@registry.indicator(inputs=lambda window: [ref("rolling_window", window=window)], elementwise=True, window=14)
+def sma(rolling, window):
+    return rolling.mean()
+
+
+@registry.indicator(inputs=lambda window: [ref("rolling_window", window=window)], elementwise=True, window=14)
+def wma(rolling, window):
+    return rolling.wma()
+
+
+@registry.indicator(inputs=("close",), stream=lambda history, span: _EmaStep(span), span=14)
+def ema(close, span):
+    offset = close[0]
+    return _ema(close - offset, span) + offset
+
+
+@registry.indicator(inputs=lambda fast, slow: [ref("ema", span=fast), ref("ema", span=slow)], elementwise=True,
+                    fast=12, slow=26)
+def macd(fast_ema, slow_ema, fast, slow):
+    return fast_ema - slow_ema
+
+
+@registry.indicator(inputs=("close",), stream=lambda history, window: _RsiStep(window), window=14)
+def rsi(close, window):
+    # 첫 diff 는 pandas 와 같이 0 으로 처리
+    x = close - close[0]
+    delta = np.empty(len(x))
+    delta[0] = 0.0
+    np.subtract(x[1:], x[:-1], out=delta[1:])
+    gain = _rolling_sum(np.where(delta > 0, delta, 0.0), window)
+    loss = _rolling_sum(np.where(delta < 0, -delta, 0.0), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + gain / loss))
+
+
+@registry.indicator(inputs=lambda window: [ref("rolling_window", window=window)], elementwise=True, window=20)
+def bb_std(rolling, window):
+    return rolling.std()
+
+
+@registry.indicator(inputs=lambda window: [ref("sma", window=window)], elementwise=True, fill_leading=True, window=20)
+def bb_sma(middle, window):
+    return middle
+
+
+@registry.indicator(inputs=lambda window, num_std_dev: [ref("sma", window=window), ref("bb_std", window=window)],
+                    elementwise=True, fill_leading=True, window=20, num_std_dev=2)
+def bb_upper(middle, std, window, num_std_dev):
+    return middle + std * num_std_dev
+
+
+@registry.indicator(inputs=lambda window, num_std_dev: [ref("sma", window=window), ref("bb_std", window=window)],
+                    elementwise=True, fill_leading=True, window=20, num_std_dev=2)
+def bb_lower(middle, std, window, num_std_dev):
+    return middle - std * num_std_dev
+
+
+@registry.indicator(inputs=("close", "volume"), stream=lambda history: _VwapStep(history))
+def vwap(close, volume):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.cumsum(close * volume) / np.cumsum(volume)
+
+
+@registry.indicator(inputs=("high", "low", "close"), stream=lambda history, window: _AtrStep(window), window=14)
+def atr(high, low, close, window):
+    """ true range(고가-저가, 직전 종가와의 차 중 최대) 의 window 이동평균 """
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return _rolling_sum(true_range, window) / window
+
+
+@registry.indicator(inputs=("high", "low", "close"), window=14)
+def stoch_k(high, low, close, window):
+    """ 스토캐스틱 %K: window 구간 고가/저가 범위에서 종가의 위치 (0~100) """
+    k = np.full(len(close), np.nan)
+    if len(close) >= window:
+        highest = np.lib.stride_tricks.sliding_window_view(high, window).max(axis=1)
+        lowest = np.lib.stride_tricks.sliding_window_view(low, window).min(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k[window - 1:] = 100 * (close[window - 1:] - lowest) / (highest - lowest)
+    return k
+
+
+@registry.indicator(inputs=lambda window, smooth: [ref("stoch_k", window=window)], window=14, smooth=3)
+def stoch_d(k, window, smooth):
+    """ 스토캐스틱 %D: %K 의 smooth 이동평균 """
+    return _rolling_sum(k, smooth) / smooth
+
+
+# 전략이 읽는 지표와 파라미터 (main.strategy_1 / strategy_2). 아무도 요구하지 않은 지표는 계산/기록하지 않음
+registry.require("strategy_1", rsi={"window": 14}, macd={"fast": 12, "slow": 26})
+registry.require("strategy_2", vwap={}, bb_upper={"window": 20, "num_std_dev": 2},
+                 bb_lower={"window": 20, "num_std_dev": 2})
+
+
+class StreamingIndicators:
+    """ 닫힌 캔들 하나마다 지표 그래프의 노드를 위상 순서로 O(1) 갱신하는 상태 기반 엔진
+
+    노드 정의는 배치 계산(IndicatorGraph.compute)과 같고, snapshot() 은 save_indicators 와 같은 형태(출력별 최근 tail 개)다.
+    VWAP 은 캔들 파일과 같이 최근 history 개 캔들 구간의 누적값으로 계산한다.
+    EMA 는 재귀식이므로 500개 창을 매번 새로 시작하는 배치 결과와 1e-15 수준에서만 다르다.
+    단계 객체가 없는 지표(와 그것을 입력으로 쓰는 지표)는 batch_outputs 에 남기고 호출한 쪽이 배치로 계산한다.
+    """
+    def __init__(self, graph=None, history=500, tail=15):
+        self.graph = registry.graph() if graph is None else graph
+        self.history = history
+        self.tail = tail
+
+        streamable = self.graph.streamable()
+        order = [key for key in self.graph.order if key in streamable]
+        self.sources = [source for source in SOURCES if any(source in self.graph.nodes[key][2] for key in order)]
+        self.steps = {}  # 노드 키 -> 단계 객체 (elementwise 노드는 없음)
+
+        # 캔들마다 도는 계획: 값은 리스트 칸에 두고 (칸, 함수, 입력 칸 getter, 입력이 하나인지) 를 위상 순서로 실행
+        slots = {source: i for i, source in enumerate(self.sources)}
+        self.plan = []
+        for key in order:
+            definition, params, inputs = self.graph.nodes[key]
+            if definition.stream is not None:
+                self.steps[key] = definition.stream(history, **params)
+                function = self.steps[key].push
+            else:
+                function = functools.partial(definition.batch, **params)
+            slots[key] = len(slots)
+            self.plan.append((slots[key], function, itemgetter(*(slots[node] for node in inputs)), len(inputs) == 1))
+        self.values = [None] * len(slots)
+
+        self.batch_outputs = [name for name, key in self.graph.outputs.items() if key not in streamable]
+        # 캔들마다 값이 정해지는 출력은 최근 tail 개를 모음 (tail() 이 있는 단계는 스냅샷 때 계산)
+        self.outputs = {name: deque(maxlen=tail) for name, key in self.graph.outputs.items()
+                        if key in streamable and not hasattr(self.steps.get(key), 'tail')}
+        self.collect = [(self.outputs[name], slots[self.graph.outputs[name]]) for name in self.outputs]
+
+    def update(self, candle):
+        """ 닫힌 캔들 하나를 반영 (candle: sources 열(close, volume 등) 키를 가진 dict) """
+        values = self.values
+        for i, source in enumerate(self.sources):
+            values[i] = float(candle[source])
+        for slot, function, getter, single in self.plan:
+            values[slot] = function(getter(values)) if single else function(*getter(values))
+        for history, slot in self.collect:
+            history.append(values[slot])
+
+    @staticmethod
+    def _bfill(values):
+        # get_bb 의 bfill 과 동일하게 앞쪽 NaN 을 첫 유효값으로 채움
+        first = next((v for v in values if not math.isnan(v)), None)
+        if first is None:
+            return values
+        return [first if math.isnan(v) else v for v in values]
+
+    def snapshot(self):
+        """ 스트리밍으로 계산하는 출력 지표 dict (지표별 최근 tail 개, batch_outputs 는 빠짐) """
+        indicators = {}
+        for name, key in self.graph.outputs.items():
+            if name in self.batch_outputs:
+                continue
+            values = list(self.outputs[name]) if name in self.outputs else self.steps[key].tail(self.tail)
+            indicators[name] = self._bfill(values) if self.graph.nodes[key][0].fill_leading else values
+        return indicators
+
+
+@functools.lru_cache(maxsize=8)
+def _indicator_graph(window, fast, slow, bb_window, num_std_dev):
+    """ INDICATOR_KEYS 아홉 지표 전부의 그래프 """
+    bb = {"window": bb_window, "num_std_dev": num_std_dev}
+    return registry.graph({
+        "sma": registry.node("sma", {"window": window}),
+        "wma": registry.node("wma", {"window": window}),
+        "ema": registry.node("ema", {"span": window}),
+        "rsi": registry.node("rsi", {"window": window}),
+        "macd": registry.node("macd", {"fast": fast, "slow": slow}),
+        "bb_upper": registry.node("bb_upper", bb),
+        "bb_sma": registry.node("bb_sma", {"window": bb_window}),
+        "bb_lower": registry.node("bb_lower", bb),
+        "vwap": registry.node("vwap"),
+    })
+
+
+def compute_indicators(close, volume, window=14, fast=12, slow=26, bb_window=20, num_std_dev=2):
+    """ 연속된 float64 배열로 INDICATOR_KEYS 아홉 지표를 모두 계산 (전체 길이 배열 dict, 벤치마크/비교용)
+
+    레지스트리 그래프로 계산하므로 SMA/WMA 는 같은 창 합을, MACD 는 EMA 노드를, 볼린저 밴드는 SMA 노드를 공유한다.
+    """
+    graph = _indicator_graph(window, fast, slow, bb_window, num_std_dev)
+    return graph.compute({"close": close, "volume": volume}, INDICATOR_KEYS)
+
+
+def indicator_file(symbol):
+    """ 심볼별 지표 JSON 파일 이름 (BTCUSDT 는 기존 파일 이름을 유지) """
+    symbol = symbol.upper()
+    if symbol == 'BTCUSDT':
+        return "Technical_indicators.json"
+    return f"Technical_indicators_{symbol}.json"
+
 
 class TradingIndicators:
-    def __init__(self, data_file):
+    def __init__(self, data_file, output_file="Technical_indicators.json", symbol="BTCUSDT", dump_json=False):
         self.data_file = data_file
+        self.output_file = output_file
+        self.dump_json = dump_json  # True 면 디버깅용으로 JSON 파일도 같이 기록
+        self.symbol = symbol.upper()
+        self.store = CandleStore(data_file)
+        # 소비자(전략)가 registry.require 로 요구한 지표만 계산하고 공유 메모리에 기록
+        self.graph = registry.graph()
+        self.shared = SharedIndicators(shared_file(self.symbol), keys=tuple(self.graph.outputs))
+        self.engine = StreamingIndicators(self.graph, history=self.store.capacity)
+        self.seen = 0  # 엔진에 반영한 캔들 누적 개수
 
     def load_data(self):
-        with open(self.data_file, 'r') as f:
-            data = json.load(f)
-        return pd.DataFrame(data)
+        candles = {name: values.copy() for name, values in self.store.last().items()}
+        candles['timestamp'] = [epoch_ms_to_kst(ms) for ms in candles['timestamp'].tolist()]
+        return pd.DataFrame(candles)
 
     def get_sma(self, data, window=14):
         return data['close'].astype(float).rolling(window=window).mean()
 
     def get_wma(self, data, window=14):
-        weights = np.arange(1, window + 1)
-        return data['close'].astype(float).rolling(window=window).apply(lambda prices: np.dot(prices, weights) / weights.sum(), raw=True)
+        # 행마다 파이썬 함수를 부르는 rolling.apply 대신 합성곱 한 번으로 계산
+        close = data['close'].to_numpy(dtype=np.float64)
+        weights = np.arange(1, window + 1, dtype=np.float64)
+        wma = np.full(len(close), np.nan)
+        if len(close) >= window:
+            wma[window - 1:] = np.convolve(close, weights[::-1], mode='valid') / weights.sum()
+        return pd.Series(wma, index=data.index)
 
     def get_ema(self, data, window=14):
         return data['close'].astype(float).ewm(span=window, adjust=False).mean()
@@ -58,52 +670,82 @@ class TradingIndicators:
         return vwap
 
     def save_indicators(self, data):
-        # 지표 계산
-        sma = self.get_sma(data)
-        wma = self.get_wma(data)
-        ema = self.get_ema(data)
-        rsi = self.get_rsi(data)
-        macd = self.get_macd(data)
-        upper_band, sma_bb, lower_band = self.get_bb(data)
-        vwap = self.get_vwap(data)
+        # 요구된 지표만 그래프로 계산 (필요한 캔들 열만 한 번 변환하고, 겹치는 중간값은 한 번만 계산)
+        with metrics.span("indicators_compute_seconds", symbol=self.symbol):
+            indicators = self.graph.compute({name: data[name].to_numpy() for name in self.graph.sources})
+        self.write_indicators({key: values[-15:].tolist() for key, values in indicators.items()})
 
+    def write_indicators(self, indicators):
+        """ 계산된 지표(최근 15개)와 최근 캔들을 공유 메모리에 기록 (dump_json 이면 JSON 파일에도 저장) """
         # 현재 UTC 시간을 가져오기  
         timestamp = datetime.now(timezone.utc)
         kst_time = timestamp + timedelta(hours=9)  # 한국시간으로 변환
         formatted_timestamp = kst_time.strftime('%Y-%m-%d %H:%M:%S')
 
+        # 매매 프로세스는 공유 메모리에서 지표/가격을 한 스냅샷으로 읽음
+        candles = self.store.last(self.shared.tail)
+        closes = candles['close'][-2:].tolist()
+        prices = (closes[-1], closes[-2]) if len(closes) == 2 else (float('nan'), float('nan'))
+        self.shared.write(indicators, candles, prices, int(timestamp.timestamp() * 1000))
 
+        # 지표 데이터 저장 (version 은 공유 메모리 스냅샷 번호와 같음)
+        indicators = {"timestamp": formatted_timestamp, "version": self.shared.version, **indicators}
 
-        # 지표 데이터 저장
-        indicators = {
-            "timestamp": formatted_timestamp,
-            "sma": sma.tail(15).tolist(),
-            "wma": wma.tail(15).tolist(),
-            "ema": ema.tail(15).tolist(),
-            "rsi": rsi.tail(15).tolist(),
-            "macd": macd.tail(15).tolist(),
-            "bb_upper": upper_band.tail(15).tolist(),
-            "bb_sma": sma_bb.tail(15).tolist(),
-            "bb_lower": lower_band.tail(15).tolist(),
-            "vwap": vwap.tail(15).tolist()
-        }
+        if self.dump_json:
+            if not os.path.exists(self.output_file):
+                print("File not found. Creating new file...")
+            # 임시 파일에 다 쓴 뒤 rename 해서 읽는 쪽이 반쯤 쓴 파일을 보지 않도록 함
+            temp_file = f"{self.output_file}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(indicators, f, indent=4)
+            os.replace(temp_file, self.output_file)
 
-        if not os.path.exists('Technical_indicators.json'):
-            print("File not found. Creating new file...")
-        # JSON 파일에 저장
-        with open('Technical_indicators.json', 'w') as f:
-            json.dump(indicators, f, indent=4)
+        print(f"Technical indicators saved to {self.shared.path}")
+        return indicators
 
-        print("Technical indicators saved to Technical_indijscators.json")
+    def update(self):
+        """ 캔들 저장소의 누적 개수로 새로 닫힌 캔들만 골라 엔진에 반영하고 지표를 저장
 
-    def run(self):
-        while True:
-            # 데이터 로드
-            data = self.load_data()
+        새 캔들이 있으면 INDICATORS_UPDATED 이벤트 payload 를, 없으면 None 을 반환한다.
+        """
+        total = self.store.count
+        new = min(total - self.seen, self.store.capacity)
+        if new <= 0:
+            return None
+        with metrics.span("indicators_update_seconds", symbol=self.symbol):
+            candles = self.store.last(new)
+            sources = self.engine.sources
+            for row in zip(*(candles[name].tolist() for name in sources)):
+                self.engine.update(dict(zip(sources, row)))
+            self.seen = total
 
-            # 지표 저장
-            self.save_indicators(data)
+            indicators = self.engine.snapshot()
+            if self.engine.batch_outputs:
+                # 단계 객체가 없는 지표는 캔들 저장소 구간 전체로 배치 계산
+                window = self.store.last()
+                computed = self.graph.compute({name: window[name] for name in self.graph.sources},
+                                              self.engine.batch_outputs)
+                indicators.update({name: values[-self.engine.tail:].tolist() for name, values in computed.items()})
+            indicators = self.write_indicators(indicators)
+        heartbeats.beat(f"indicators:{self.symbol}")
+        closes = self.store.last(2)['close'].tolist()
+        if len(closes) < 2:
+            return None
+        return {"symbol": self.symbol, "indicators": indicators, "prices": (closes[-1], closes[-2]),
+                "candle_ms": int(candles['timestamp'][-1])}
 
-            # 1분 대기
-            time.sleep(10)
+    def run(self):
+        # 새로 닫힌 캔들만 엔진에 반영 (파일 재파싱/전체 재계산 없음)
+        # 슈퍼바이저가 이 스레드를 다시 띄울 때마다 새로 구독하므로 끝날 때 구독을 닫음 (안 닫으면 큐가 계속 쌓임)
+        candle_events = bus.subscribe(CANDLE_CLOSED)
+        try:
+            while True:
+                payload = self.update()
+                # 지표 저장 후 매매 루프에 메모리 상의 값으로 바로 알림
+                if payload is not None:
+                    bus.publish(INDICATORS_UPDATED, payload)
 
+                # 캔들 마감 이벤트를 기다림 (다른 프로세스가 저장소를 쓰는 경우를 위해 최대 10초마다 확인)
+                candle_events.get(timeout=10)
+        finally:
+            candle_events.close()
@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+
+import websocket
+
+from endpoints import STREAM_URL
+
+
+class BinanceUserStream:
+    """ 선물 user-data 스트림으로 포지션/잔고를 로컬에 캐시
+
+    시작할 때와 재연결 직후에만 REST 로 전체 상태를 맞추고(reconcile),
+    그 사이에는 ACCOUNT_UPDATE / ORDER_TRADE_UPDATE 이벤트로 캐시를 갱신한다 (ALGO_UPDATE 는 콜백으로만 넘김).
+    포지션 dict 는 futures_position_information 과 같은 키(symbol, positionAmt, entryPrice, unRealizedProfit)를 쓴다.
+    """
+    KEEPALIVE_INTERVAL = 30 * 60  # listenKey 는 60분 유효, 30분마다 연장
+    RECONNECT_DELAY = 5
+
+    def __init__(self, client, stream_base=f"{STREAM_URL}/ws/"):
+        self.client = client
+        self.stream_base = stream_base
+        self.lock = threading.Lock()
+
+        self.balances = {}   # asset -> 지갑 잔고
+        self.positions = {}  # symbol -> 포지션 dict
+        self.orders = {}     # clientOrderId -> 마지막 주문 상태 dict
+
+        self.listen_key = None
+        self.ws = None
+        self.synced = False  # 스트림이 살아 있고 REST 로 맞춘 이후에만 True
+        self.running = False
+        self.keepalive_timer = None
+        self.listeners = []  # ORDER_TRADE_UPDATE 를 받을 콜백 목록
+        self.config_listeners = []  # ACCOUNT_CONFIG_UPDATE 의 (symbol, leverage) 를 받을 콜백 목록
+        self.algo_listeners = []  # ALGO_UPDATE (조건부 주문) 를 받을 콜백 목록
+
+    # ---------- 캐시 조회 ----------
+    def get_balance(self, asset='USDT'):
+        with self.lock:
+            return self.balances.get(asset)
+
+    def get_position(self, symbol='BTCUSDT'):
+        with self.lock:
+            position = self.positions.get(symbol)
+            return dict(position) if position else None
+
+    def get_order(self, client_order_id):
+        with self.lock:
+            order = self.orders.get(client_order_id)
+            return dict(order) if order else None
+
+    def add_listener(self, callback):
+        """ ORDER_TRADE_UPDATE 의 주문 dict('o')를 받을 콜백 등록 """
+        self.listeners.append(callback)
+
+    def add_config_listener(self, callback):
+        """ 레버리지 변경(ACCOUNT_CONFIG_UPDATE)을 (symbol, leverage) 로 받을 콜백 등록 """
+        self.config_listeners.append(callback)
+
+    def add_algo_listener(self, callback):
+        """ 조건부(algo) 주문 상태 변경(ALGO_UPDATE)의 주문 dict('o')를 받을 콜백 등록 """
+        self.algo_listeners.append(callback)
+
+    # ---------- REST 동기화 ----------
+    def reconcile(self):
+        """ REST 로 잔고/포지션 전체를 다시 읽어 캐시를 맞춤 (시작, 재연결 때만 호출) """
+        balances = self.client.futures_account_balance()
+        positions = self.client.futures_position_information()
+        with self.lock:
+            self.balances = {x['asset']: float(x['balance']) for x in balances}
+            self.positions = {
+                pos['symbol']: {
+                    "symbol": pos['symbol'],
+                    "positionAmt": pos['positionAmt'],
+                    "entryPrice": pos['entryPrice'],
+                    "unRealizedProfit": pos['unRealizedProfit'],
+                }
+                for pos in positions
+            }
+        print("✅ 잔고/포지션 REST 동기화 완료")
+
+    # ---------- 스트림 이벤트 ----------
+    def on_message(self, ws, message):
+        data = json.loads(message)
+        event = data.get('e')
+
+        if event == 'ACCOUNT_UPDATE':
+            update = data['a']
+            with self.lock:
+                for balance in update.get('B', []):
+                    self.balances[balance['a']] = float(balance['wb'])
+                for pos in update.get('P', []):
+                    # 단방향 모드만 사용 (positionSide BOTH)
+                    if pos.get('ps', 'BOTH') != 'BOTH':
+                        continue
+                    self.positions[pos['s']] = {
+                        "symbol": pos['s'],
+                        "positionAmt": pos['pa'],
+                        "entryPrice": pos['ep'],
+                        "unRealizedProfit": pos['up'],
+                    }
+
+        elif event == 'ORDER_TRADE_UPDATE':
+            order = data['o']
+            with self.lock:
+                self.orders[order['c']] = order
+            for callback in self.listeners:
+                callback(order)
+
+        elif event == 'ALGO_UPDATE':
+            for callback in self.algo_listeners:
+                callback(data['o'])
+
+        elif event == 'ACCOUNT_CONFIG_UPDATE' and 'ac' in data:
+            for callback in self.config_listeners:
+                callback(data['ac']['s'], data['ac']['l'])
+
+        elif event == 'listenKeyExpired':
+            print("⚠️ listenKey 만료, 다시 연결합니다.")
+            self.synced = False
+            ws.close()
+
+    def on_error(self, ws, error):
+        print(f"User stream error: {error}")
+
+    def on_close(self, ws, close_status_code, close_msg):
+        print("user-data 웹소켓 연결 종료")
+        self.synced = False
+
+    def on_open(self, ws):
+        print("user-data 웹소켓 연결 성공")
+        # 연결이 끊긴 사이의 변경은 스트림으로 오지 않으므로 REST 로 한 번 맞춤
+        try:
+            self.reconcile()
+            self.synced = True
+        except Exception as e:
+            print(f"⚠️ 동기화 실패: {e}")
+
+    # ---------- 연결 관리 ----------
+    def keepalive(self):
+        if not self.running:
+            return
+        try:
+            self.client.futures_stream_keepalive(listenKey=self.listen_key)
+        except Exception as e:
+            print(f"⚠️ listenKey 연장 실패: {e}")
+        self.keepalive_timer = threading.Timer(self.KEEPALIVE_INTERVAL, self.keepalive)
+        self.keepalive_timer.daemon = True
+        self.keepalive_timer.start()
+
+    def run_websocket(self):
+        """ 끊기면 새 listenKey 로 다시 연결 """
+        while self.running:
+            try:
+                self.listen_key = self.client.futures_stream_get_listen_key()
+                self.ws = websocket.WebSocketApp(
+                    self.stream_base + self.listen_key,
+                    on_message=self.on_message,
+                    on_error=self.on_error,
+                    on_close=self.on_close,
+                )
+                self.ws.on_open = self.on_open
+                self.ws.run_forever()
+            except Exception as e:
+                print(f"⚠️ user-data 스트림 오류: {e}")
+            self.synced = False
+            if self.running:
+                time.sleep(self.RECONNECT_DELAY)
+
+    def start(self):
+        """ 웹소켓을 백그라운드에서 실행 """
+        self.running = True
+        threading.Thread(target=self.run_websocket, daemon=True).start()
+        self.keepalive_timer = threading.Timer(self.KEEPALIVE_INTERVAL, self.keepalive)
+        self.keepalive_timer.daemon = True
+        self.keepalive_timer.start()
+
+    def stop(self):
+        self.running = False
+        if self.keepalive_timer:
+            self.keepalive_timer.cancel()
+        if self.ws:
+            self.ws.close()